@@ -0,0 +1,109 @@
+"""
+Per-message overhead of the Python <-> Node.js framings.
+
+Measures the Python-side encode + decode cost of each framing for small,
+medium and large messages, with and without orjson. With --node, also times
+healthCheck round trips against a real wrapper.js in each framing (requires
+Node.js and @primuslabs/zktls-core-sdk).
+
+    python benchmarks/bench_framing.py [--node] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from zktls import framing as framing_module
+from zktls.framing import FRAMINGS, get_framing
+
+SIZES = {"small": 200, "10KB": 10_000, "1MB": 1_000_000}
+
+
+def message(size: int) -> Dict[str, Any]:
+    return {"id": 1, "result": {"verified": True, "padding": "x" * size}}
+
+
+def iterations(size: int) -> int:
+    return max(20, 200_000_000 // (size * 100 + 10_000))
+
+
+async def codec_round_trip(name: str, payload: Dict[str, Any], count: int) -> float:
+    framing = get_framing(name)
+    start = time.perf_counter()
+    for _ in range(count):
+        reader = asyncio.StreamReader(limit=2 ** 26)
+        reader.feed_data(framing.encode(payload))
+        await framing.read(reader)
+    return (time.perf_counter() - start) / count
+
+
+async def bench_codecs() -> List[Dict[str, Any]]:
+    backends = ["json"] + (["orjson"] if framing_module.orjson is not None else [])
+    fast = framing_module.orjson
+    results = []
+    try:
+        for backend in backends:
+            framing_module.orjson = fast if backend == "orjson" else None
+            for label, size in SIZES.items():
+                for name in FRAMINGS:
+                    seconds = await codec_round_trip(name, message(size), iterations(size))
+                    results.append({
+                        "mode": "codec", "backend": backend, "framing": name,
+                        "size": label, "us_per_message": round(seconds * 1e6, 2),
+                    })
+    finally:
+        framing_module.orjson = fast
+    return results
+
+
+async def bench_node() -> List[Dict[str, Any]]:
+    from zktls import NodeWrapper
+
+    results = []
+    for name in FRAMINGS:
+        wrapper = await NodeWrapper.create(framing=name)
+        try:
+            await wrapper._start_node_process()
+            for label, size in SIZES.items():
+                params = {"padding": "x" * size}
+                count = iterations(size) // 20 or 1
+                start = time.perf_counter()
+                for _ in range(count):
+                    await wrapper._send_command("healthCheck", params)
+                seconds = (time.perf_counter() - start) / count
+                results.append({
+                    "mode": "node", "framing": name, "size": label,
+                    "us_per_message": round(seconds * 1e6, 2),
+                })
+        finally:
+            await wrapper.aclose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--node", action="store_true", help="also time round trips through wrapper.js"
+    )
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench_codecs())
+    if args.node:
+        results += asyncio.run(bench_node())
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for row in results:
+        backend = row.get("backend", "-")
+        print(
+            f"{row['mode']:6} {backend:7} {row['framing']:16} {row['size']:6} "
+            f"{row['us_per_message']:>10.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Offline benchmarks for NodeWrapper.
+
+Runs the real wrapper.js against the stub SDK in benchmarks/stub_sdk, so no
+network access or credentials are needed. Reports cold start, per-method
+latency percentiles, throughput versus concurrency and memory use.
+
+    python benchmarks/bench_wrapper.py [--latency-ms 0] [--payload-bytes 256]
+        [--iterations 200] [--concurrency 1,4,16,64]
+        [--json results.json] [--compare baseline.json]
+
+Save the --json output of one version and pass it as --compare to another to
+see the relative change of every metric.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+STUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_sdk")
+SDK_PACKAGE = "@primuslabs/zktls-core-sdk"
+
+REQUEST = {"url": "https://example.com/api", "header": "", "method": "GET", "body": ""}
+RESPONSE_RESOLVES = [{"keyName": "value", "parseType": "string", "parsePath": "$.value"}]
+
+
+def install_stub(root: str) -> str:
+    """Lay the stub SDK out as root/node_modules/@primuslabs/zktls-core-sdk"""
+    node_modules = os.path.join(root, "node_modules")
+    package_dir = os.path.join(node_modules, *SDK_PACKAGE.split("/"))
+    os.makedirs(os.path.join(package_dir, "dist"))
+    shutil.copy(os.path.join(STUB_DIR, "index.js"), package_dir)
+    shutil.copy(os.path.join(STUB_DIR, "utils.js"), os.path.join(package_dir, "dist", "utils.js"))
+    with open(os.path.join(package_dir, "package.json"), "w") as f:
+        json.dump({"name": SDK_PACKAGE, "version": "0.0.0-stub", "main": "index.js"}, f)
+    return node_modules
+
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a process in KiB (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(50), 3),
+        "p90_ms": round(percentile(90), 3),
+        "p99_ms": round(percentile(99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def timed(call: Callable[[], Awaitable[Any]]) -> float:
+    start = time.perf_counter()
+    await call()
+    return time.perf_counter() - start
+
+
+async def bench_cold_start(repeats: int) -> Dict[str, Any]:
+    """Construction with and without a cached environment probe, and process startup"""
+    from zktls import NodeWrapper, checks
+
+    construct_uncached, construct_cached, spawn, first_init = [], [], [], []
+    for _ in range(repeats):
+        checks._probe_results.clear()
+        checks._wrapper_scripts.clear()
+        shutil.rmtree(checks.get_cache_dir(), ignore_errors=True)
+        start = time.perf_counter()
+        NodeWrapper()
+        construct_uncached.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        wrapper = NodeWrapper()
+        construct_cached.append(time.perf_counter() - start)
+
+        spawn.append(await timed(wrapper._start_node_process))
+        first_init.append(await timed(lambda: wrapper.init("bench-app", "bench-secret")))
+        await wrapper.aclose()
+
+    return {
+        "construct_uncached": summarize(construct_uncached),
+        "construct_cached": summarize(construct_cached),
+        "spawn_to_ready": summarize(spawn),
+        "first_init": summarize(first_init),
+    }
+
+
+async def bench_latency(
+    wrapper: Any, attestation: Dict[str, Any], iterations: int
+) -> Dict[str, Any]:
+    """Sequential per-call latency of each public method"""
+    calls = {
+        "init": lambda: wrapper.init("bench-app", "bench-secret"),
+        "start_attestation": lambda: wrapper.start_attestation(REQUEST, RESPONSE_RESOLVES),
+        "verify_attestation": lambda: wrapper.verify_attestation(attestation),
+        "encode_request": lambda: wrapper.encode_request(REQUEST),
+        "encode_response": lambda: wrapper.encode_response(RESPONSE_RESOLVES),
+        "encode_attestation": lambda: wrapper.encode_attestation(attestation),
+    }
+    results = {}
+    for name, call in calls.items():
+        for _ in range(min(10, iterations)):  # Warm up
+            await call()
+        results[name] = summarize([await timed(call) for _ in range(iterations)])
+    return results
+
+
+async def bench_throughput(
+    wrapper: Any, attestation: Dict[str, Any], levels: List[int], iterations: int
+) -> Dict[str, Any]:
+    """Completed calls per second with a given number of calls in flight"""
+    calls = {
+        "start_attestation": lambda: wrapper.start_attestation(REQUEST, RESPONSE_RESOLVES),
+        "verify_attestation": lambda: wrapper.verify_attestation(attestation),
+    }
+    results: Dict[str, Any] = {}
+    for name, call in calls.items():
+        results[name] = {}
+        for concurrency in levels:
+            total = max(iterations, concurrency * 4)
+            remaining = iter(range(total))
+
+            async def worker() -> None:
+                for _ in remaining:
+                    await call()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            results[name][str(concurrency)] = round(total / elapsed, 1)
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from zktls import NodeWrapper
+
+    cold_start = await bench_cold_start(args.cold_starts)
+
+    wrapper = await NodeWrapper.create(framing=args.framing)
+    try:
+        await wrapper.init("bench-app", "bench-secret")
+        node_pid = wrapper.node_process.pid
+        memory = {"python_rss_kb_start": rss_kb(os.getpid()), "node_rss_kb_start": rss_kb(node_pid)}
+
+        attestation = await wrapper.start_attestation(REQUEST, RESPONSE_RESOLVES)
+        latency = await bench_latency(wrapper, attestation, args.iterations)
+        throughput = await bench_throughput(wrapper, attestation, args.concurrency, args.iterations)
+
+        memory.update(python_rss_kb_end=rss_kb(os.getpid()), node_rss_kb_end=rss_kb(node_pid))
+    finally:
+        await wrapper.aclose()
+
+    return {
+        "cold_start": cold_start,
+        "latency": latency,
+        "throughput_per_s": throughput,
+        "memory": memory,
+    }
+
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        sdk_version = version("zktls-py-sdk")
+    except PackageNotFoundError:
+        sdk_version = None
+    node = subprocess.run(["node", "--version"], capture_output=True, text=True)
+    return {
+        "zktls_py_sdk": sdk_version,
+        "python": platform.python_version(),
+        "node": node.stdout.strip(),
+        "platform": platform.platform(),
+        "stub_latency_ms": args.latency_ms,
+        "stub_payload_bytes": args.payload_bytes,
+        "iterations": args.iterations,
+        "framing": args.framing,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Print the relative change of every metric present in both result sets"""
+    before = flatten(baseline["results"])
+    after = flatten(current["results"])
+    meta = baseline["meta"]
+    print(f"\nCompared with {meta.get('zktls_py_sdk')} ({meta.get('timestamp')}):")
+    for name in sorted(before.keys() & after.keys()):
+        if before[name]:
+            change = (after[name] - before[name]) / before[name] * 100
+            print(f"  {name:60} {before[name]:>12} -> {after[name]:>12} ({change:+.1f}%)")
+
+
+def report(results: Dict[str, Any]) -> None:
+    print("Cold start (ms):")
+    for name, stats in results["cold_start"].items():
+        print(f"  {name:22} p50 {stats['p50_ms']:>9}  max {stats['max_ms']:>9}")
+    print("Latency (ms):")
+    for name, stats in results["latency"].items():
+        print(
+            f"  {name:22} p50 {stats['p50_ms']:>9}  p90 {stats['p90_ms']:>9}  "
+            f"p99 {stats['p99_ms']:>9}"
+        )
+    print("Throughput (calls/s) by concurrency:")
+    for name, levels in results["throughput_per_s"].items():
+        print(f"  {name:22} " + "  ".join(f"{c}: {rate}" for c, rate in levels.items()))
+    print("Memory (KiB RSS):")
+    for name, value in results["memory"].items():
+        print(f"  {name:22} {value}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Offline NodeWrapper benchmarks against a stub SDK"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0, help="stub startAttestation delay")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="stub attestation data size")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per latency measurement")
+    parser.add_argument("--cold-starts", type=int, default=3, help="cold start repetitions")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        type=lambda value: [int(level) for level in value.split(",")],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--framing", default="json-lines", help="Node.js channel framing")
+    parser.add_argument(
+        "--json", metavar="PATH", help="write machine-readable results ('-' for stdout)"
+    )
+    parser.add_argument("--compare", metavar="PATH", help="baseline results written by --json")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="zktls-bench-")
+    cwd = os.getcwd()
+    try:
+        # wrapper.js finds the stub through NODE_PATH; the probe cache stays private
+        os.environ["NODE_PATH"] = install_stub(workdir)
+        os.environ["ZKTLS_CACHE_DIR"] = os.path.join(workdir, "cache")
+        os.environ["STUB_LATENCY_MS"] = str(args.latency_ms)
+        os.environ["STUB_PAYLOAD_BYTES"] = str(args.payload_bytes)
+        os.chdir(workdir)
+        output = {"meta": metadata(args), "results": asyncio.run(run(args))}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json == "-":
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    else:
+        report(output["results"])
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == "__main__":
+    main()
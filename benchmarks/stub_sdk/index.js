@@ -0,0 +1,58 @@
+// Stand-in for @primuslabs/zktls-core-sdk used by the benchmarks. It exercises the
+// wrapper without network access or credentials; latency and payload size are set
+// through environment variables:
+//   STUB_INIT_MS       delay of init()                       (default 0)
+//   STUB_LATENCY_MS    delay of startAttestation()           (default 0)
+//   STUB_PAYLOAD_BYTES size of the attestation's data field  (default 256)
+const INIT_MS = Number(process.env.STUB_INIT_MS || 0);
+const LATENCY_MS = Number(process.env.STUB_LATENCY_MS || 0);
+const PAYLOAD_BYTES = Number(process.env.STUB_PAYLOAD_BYTES || 256);
+
+function sleep(ms) {
+    return ms > 0 ? new Promise((resolve) => setTimeout(resolve, ms)) : Promise.resolve();
+}
+
+class AttRequest {
+    constructor(request, responseResolves, userAddress) {
+        this.request = request;
+        this.responseResolves = responseResolves;
+        this.userAddress = userAddress;
+    }
+    setAttMode(attMode) { this.attMode = attMode; }
+    setAttConditions(attConditions) { this.attConditions = attConditions; }
+    setSslCipher(sslCipher) { this.sslCipher = sslCipher; }
+    setAdditionParams(additionParams) { this.additionParams = additionParams; }
+}
+
+class PrimusCoreTLS {
+    async init(appId, appSecret) {
+        await sleep(INIT_MS);
+        this.appId = appId;
+        return true;
+    }
+
+    generateRequestParams(request, responseResolves, userAddress) {
+        return new AttRequest(request, responseResolves, userAddress);
+    }
+
+    async startAttestation(attRequest) {
+        await sleep(LATENCY_MS);
+        return {
+            recipient: attRequest.userAddress,
+            request: attRequest.request,
+            reponseResolve: attRequest.responseResolves,
+            data: 'x'.repeat(PAYLOAD_BYTES),
+            attConditions: JSON.stringify(attRequest.attConditions || {}),
+            timestamp: Date.now(),
+            additionParams: JSON.stringify(attRequest.additionParams || ''),
+            attestors: [],
+            signatures: ['0x' + '00'.repeat(65)]
+        };
+    }
+
+    verifyAttestation(attestation) {
+        return Array.isArray(attestation.signatures) && attestation.signatures.length > 0;
+    }
+}
+
+module.exports = { PrimusCoreTLS };
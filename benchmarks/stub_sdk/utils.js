@@ -0,0 +1,12 @@
+// dist/utils of the stub SDK; the benchmarks only need the functions to exist
+const { createHash } = require('crypto');
+
+function digest(value) {
+    return '0x' + createHash('sha256').update(JSON.stringify(value)).digest('hex');
+}
+
+module.exports = {
+    encodeRequest: digest,
+    encodeResponse: digest,
+    encodeAttestation: digest
+};
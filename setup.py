@@ -131,6 +131,8 @@ setup(
         "web3>=6.0.0",
         "eth-account>=0.8.0",
         "eth-typing>=3.0.0",
+        "eth-utils>=2.0.0",
+        "eth-keys>=0.4.0",
         "aiohttp>=3.8.0",
         "pydantic>=2.0.0",
         "asyncio>=3.4.3",
@@ -146,6 +148,10 @@ setup(
             "isort>=5.10.0",
             "flake8>=4.0.0",
         ],
+        "fast": [
+            "coincurve>=17.0.0",
+            "orjson>=3.6.0",
+        ],
     },
     package_data={
         "zktls": ["node_scripts/*.js"],
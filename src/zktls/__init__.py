@@ -1,6 +1,28 @@
 """ZK TLS Python SDK"""
-from .node_wrapper import NodeWrapper
+from .node_wrapper import CommandTimeoutError, NodeWrapper
+from .pool import NodeWorkerPool
+from .encoding import EncodingError, encode_attestation, encode_request, encode_response
+from .metrics import WrapperMetrics
+from .store import AttestationRef, AttestationStore
+from .template import AttestationTemplate
+from .tenant import Tenant
+from .verifier import verify_attestation, verify_attestations
 
 __version__ = "0.1.2"
 
-__all__ = ["NodeWrapper"]
+__all__ = [
+    "NodeWrapper",
+    "CommandTimeoutError",
+    "NodeWorkerPool",
+    "AttestationTemplate",
+    "Tenant",
+    "AttestationStore",
+    "AttestationRef",
+    "WrapperMetrics",
+    "EncodingError",
+    "encode_attestation",
+    "encode_request",
+    "encode_response",
+    "verify_attestation",
+    "verify_attestations",
+]
@@ -2,8 +2,61 @@
 import os
 import sys
 import json
+import hashlib
+import shutil
 import subprocess
-from typing import Tuple, Optional
+import tempfile
+from typing import Any, Dict, Tuple, Optional
+
+SDK_PACKAGE = "@primuslabs/zktls-core-sdk"
+
+# wrapper.js as shipped inside the package
+WRAPPER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "node_scripts", "wrapper.js"
+)
+
+# Single Node.js run covering the Node.js, npm and SDK checks
+PROBE_SCRIPT = """
+const fs = require('fs');
+const path = require('path');
+const result = {
+    node: process.version, npm: null, sdk: false, sdkError: null, wasmThreadsFlag: false
+};
+
+// Read npm's version from its install next to node instead of spawning npm
+const nodeDir = path.dirname(process.execPath);
+for (const candidate of [
+    path.join(nodeDir, '..', 'lib', 'node_modules', 'npm', 'package.json'),
+    path.join(nodeDir, 'node_modules', 'npm', 'package.json')
+]) {
+    try {
+        result.npm = JSON.parse(fs.readFileSync(candidate, 'utf8')).version;
+        break;
+    } catch (e) {}
+}
+
+try {
+    const { PrimusCoreTLS } = require('@primuslabs/zktls-core-sdk');
+    new PrimusCoreTLS();
+    result.sdk = true;
+} catch (e) {
+    result.sdkError = String((e && e.stack) || e);
+}
+
+// Newer Node.js releases enable WASM threads by default and reject the flag
+result.wasmThreadsFlag = require('child_process').spawnSync(
+    process.execPath, ['--experimental-wasm-threads', '-e', '0']
+).status === 0;
+
+process.stdout.write(JSON.stringify(result));
+process.exit(0);
+"""
+
+# Probe results for this process, keyed by the probe cache key
+_probe_results: Dict[Optional[str], Dict[str, Any]] = {}
+
+# Materialized wrapper script paths for this process, keyed by cache directory
+_wrapper_scripts: Dict[str, str] = {}
 
 class InstallationError(Exception):
     """Raised when installation requirements are not met"""
@@ -85,74 +138,220 @@ setTimeout(() => {
     except Exception as e:
         return False, str(e)
 
-def check_node_scripts() -> Tuple[bool, Optional[str]]:
-    """Check if Node.js wrapper scripts are present"""
-    script_path = os.path.join(os.getcwd(), "node_scripts", "wrapper.js")
-    if not os.path.exists(script_path):
-        return False, "Node.js wrapper script is missing"
-    return True, None
+def get_cache_dir() -> str:
+    """Directory for files the SDK caches between runs ($ZKTLS_CACHE_DIR overrides it)"""
+    cache_dir = os.environ.get("ZKTLS_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "zktls")
 
-def verify_installation() -> None:
-    """Verify all installation requirements are met"""
-    # Check Node.js
-    node_ok, node_msg = check_node_version()
-    if not node_ok:
+def find_sdk_package(cwd: Optional[str] = None) -> Optional[str]:
+    """Find the SDK's package.json the way Node.js resolves it from cwd"""
+    directory = os.path.abspath(cwd or os.getcwd())
+    candidates = []
+    while True:
+        candidates.append(os.path.join(directory, "node_modules"))
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    candidates.extend(path for path in os.environ.get("NODE_PATH", "").split(os.pathsep) if path)
+
+    for node_modules in candidates:
+        package_json = os.path.join(node_modules, *SDK_PACKAGE.split("/"), "package.json")
+        if os.path.isfile(package_json):
+            return package_json
+    return None
+
+def _probe_cache_key() -> Optional[str]:
+    """Key identifying the node binary and installed SDK, or None if either is not found"""
+    node = shutil.which("node")
+    sdk_package = find_sdk_package()
+    if node is None or sdk_package is None:
+        return None
+    try:
+        node = os.path.realpath(node)
+        with open(sdk_package, "r", encoding="utf-8") as f:
+            sdk_version = json.load(f).get("version")
+        parts = [node, os.stat(node).st_mtime_ns, sdk_package, sdk_version]
+    except (OSError, ValueError):
+        return None
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()[:32]
+
+def _run_probe() -> Dict[str, Any]:
+    """Run the probe script with Node.js"""
+    try:
+        result = subprocess.run(
+            ["node", "-e", PROBE_SCRIPT],
+            cwd=os.getcwd(),
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": "Environment probe timed out"}
+    except OSError:
+        return {"error": "Node.js not found"}
+
+    if result.returncode != 0:
+        return {"error": result.stderr.strip() or "Node.js not found"}
+    try:
+        info: Dict[str, Any] = json.loads(result.stdout)
+    except ValueError:
+        return {"error": f"Unexpected probe output: {result.stdout.strip()}"}
+    return info
+
+def _probe_passed(info: Dict[str, Any]) -> bool:
+    return "error" not in info and info.get("sdk") is True
+
+def _write_cache_file(path: str, info: Dict[str, Any]) -> None:
+    """Atomically write a probe result, ignoring read-only cache directories"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def probe_environment(use_cache: bool = True) -> Dict[str, Any]:
+    """Probe Node.js, npm and the SDK in one Node.js run
+
+    Successful results are memoized per process and persisted in the cache
+    directory, keyed by the node binary path/mtime and the installed SDK version.
+    """
+    key = _probe_cache_key()
+    cache_file = None
+    if key is not None:
+        cache_file = os.path.join(get_cache_dir(), f"probe-{key}.json")
+
+    if use_cache:
+        if key in _probe_results:
+            return _probe_results[key]
+        if cache_file is not None:
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    info: Dict[str, Any] = json.load(f)
+                if _probe_passed(info):
+                    _probe_results[key] = info
+                    return info
+            except (OSError, ValueError):
+                pass
+
+    info = _run_probe()
+    if "error" not in info and not info.get("npm"):
+        # npm is not installed next to node; fall back to asking it directly
+        npm_ok, npm_msg = check_npm_version()
+        info["npm"] = npm_msg.split()[1] if npm_ok else None
+
+    if _probe_passed(info):
+        _probe_results[key] = info
+        if cache_file is not None:
+            _write_cache_file(cache_file, info)
+    return info
+
+def ensure_environment(use_cache: bool = True) -> Dict[str, Any]:
+    """Verify Node.js, npm and the SDK, raising InstallationError on failure"""
+    info = probe_environment(use_cache=use_cache)
+
+    if "error" in info:
+        raise InstallationError(
+            f"Node.js check failed: {info['error']}\n"
+            "Please install Node.js 14+ from https://nodejs.org/"
+        )
+
+    node_version = info["node"]
+    if int(node_version.lstrip("v").split(".")[0]) < 14:
         raise InstallationError(
-            f"Node.js check failed: {node_msg}\n"
+            f"Node.js check failed: Node.js version {node_version} is too old (need >= 14)\n"
             "Please install Node.js 14+ from https://nodejs.org/"
         )
 
-    # Check npm
-    npm_ok, npm_msg = check_npm_version()
-    if not npm_ok:
+    npm_version = info.get("npm")
+    if not npm_version:
+        raise InstallationError(
+            "npm check failed: npm not found\n"
+            "Please install npm 6+ by updating Node.js"
+        )
+    if int(npm_version.split(".")[0]) < 6:
         raise InstallationError(
-            f"npm check failed: {npm_msg}\n"
+            f"npm check failed: npm version {npm_version} is too old (need >= 6)\n"
             "Please install npm 6+ by updating Node.js"
         )
 
-    # Check SDK installation
-    sdk_ok, sdk_msg = check_sdk_installation()
-    if not sdk_ok:
+    if not info.get("sdk"):
         raise InstallationError(
-            f"SDK check failed: {sdk_msg}\n"
+            f"SDK check failed: Node.js SDK is not installed correctly: {info.get('sdkError')}\n"
             "Please run: npm install @primuslabs/zktls-core-sdk"
         )
 
-def check_runtime_environment() -> None:
+    return info
+
+def materialize_wrapper_script(cache_dir: Optional[str] = None) -> str:
+    """Path of a wrapper.js copy in the cache directory, written only if missing
+
+    The copy is named after the script's content hash, so an up-to-date copy
+    is never rewritten, an upgraded package gets a fresh one, and concurrent
+    writers (replaced atomically) cannot leave a partial script behind. Falls
+    back to the packaged script when the cache directory is not writable.
+    """
+    cache_dir = cache_dir or get_cache_dir()
+    if cache_dir in _wrapper_scripts:
+        return _wrapper_scripts[cache_dir]
+
+    try:
+        with open(WRAPPER_SCRIPT, "rb") as f:
+            script = f.read()
+    except OSError:
+        return WRAPPER_SCRIPT  # Reported as missing by check_node_scripts
+
+    digest = hashlib.sha256(script).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"wrapper-{digest}.js")
+    try:
+        with open(path, "rb") as f:
+            up_to_date = f.read() == script
+    except OSError:
+        up_to_date = False
+
+    if not up_to_date:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(script)
+            os.replace(tmp_path, path)
+        except OSError:
+            path = WRAPPER_SCRIPT
+
+    _wrapper_scripts[cache_dir] = path
+    return path
+
+def check_node_scripts(script_path: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    """Check if Node.js wrapper scripts are present"""
+    if script_path is None:
+        script_path = materialize_wrapper_script()
+    if not os.path.exists(script_path):
+        return False, "Node.js wrapper script is missing"
+    return True, None
+
+def verify_installation() -> None:
+    """Verify all installation requirements are met"""
+    ensure_environment(use_cache=False)
+
+def check_runtime_environment(script_path: Optional[str] = None) -> None:
     """Check runtime environment before executing commands"""
     # Check wrapper scripts first
-    scripts_ok, scripts_msg = check_node_scripts()
+    scripts_ok, scripts_msg = check_node_scripts(script_path)
     if not scripts_ok:
         raise InstallationError(
             f"Wrapper script check failed: {scripts_msg}\n"
             "Please reinstall the package"
         )
-        
-    # Verify Node.js process can be started
-    try:
-        process = subprocess.Popen(
-            ["node", "-e", "process.exit(0)"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        process.wait(timeout=5)
-        if process.returncode != 0:
-            raise InstallationError("Failed to start Node.js process")
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-        raise InstallationError(f"Node.js process check failed: {str(e)}")
 
-    # Verify SDK can be loaded
-    try:
-        process = subprocess.Popen(
-            ["node", "-e", "const sdk = require('@primuslabs/zktls-core-sdk'); process.exit(0)"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        process.wait(timeout=5)
-        if process.returncode != 0:
-            raise InstallationError("Failed to load Node.js SDK")
-    except (subprocess.TimeoutExpired, subprocess.SubprocessError) as e:
-        raise InstallationError(f"SDK load check failed: {str(e)}")
+    # Node.js and the SDK were verified by the (cached) environment probe
+    ensure_environment()
 
 def print_environment_info() -> None:
     """Print information about the environment"""
@@ -0,0 +1,467 @@
+"""Command-line interface: python -m zktls verify ARCHIVE | daemon --socket PATH"""
+import argparse
+import asyncio
+import collections
+import gzip
+import io
+import os
+import signal
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    IO, Any, Awaitable, Callable, Deque, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple,
+    cast
+)
+
+from .framing import DEFAULT_OOB_THRESHOLD, RawJSON, dumps, loads
+from .verifier import DEVELOPMENT_ATTESTOR, VERIFY_CHUNK_SIZE, _normalize_attestors, _verify
+
+# Verdict of one input line: True/False, or None when it is not an attestation
+Verdict = Optional[bool]
+
+PROGRESS_INTERVAL = 5.0
+
+# A crashed daemon is restarted after RESTART_DELAY seconds, doubling up to
+# MAX_RESTART_DELAY while it keeps crashing within STABLE_UPTIME seconds
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+STABLE_UPTIME = 60.0
+# wrapper.js exit status when another daemon already listens on the socket
+SOCKET_IN_USE = 98
+
+
+def _verify_lines(lines: Sequence[bytes], attestors: FrozenSet[str]) -> List[Verdict]:
+    """Parse and verify a chunk of JSON lines (runs in the worker processes)"""
+    verdicts: List[Verdict] = []
+    for line in lines:
+        try:
+            attestation = loads(line)
+        except ValueError:
+            verdicts.append(None)
+            continue
+        verdicts.append(_verify(attestation, attestors) if isinstance(attestation, dict) else None)
+    return verdicts
+
+
+class _Chunk:
+    """Lines read together, and where the input stands after them"""
+
+    __slots__ = ("numbers", "lines", "end_offset")
+
+    def __init__(self) -> None:
+        self.numbers: List[int] = []  # Line numbers, blank lines skipped
+        self.lines: List[bytes] = []
+        self.end_offset = 0
+
+
+def _open_input(path: str) -> io.BufferedIOBase:
+    """Open a JSONL archive, decompressing it if it is gzipped"""
+    stream = cast(io.BufferedReader, sys.stdin.buffer) if path == "-" else open(path, "rb")
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _read_chunks(
+    stream: io.BufferedIOBase, offset: int, line: int, chunk_size: int
+) -> Iterator[_Chunk]:
+    """Group the lines of stream, starting at offset (uncompressed), into chunks"""
+    chunk = _Chunk()
+    for raw in stream:
+        offset += len(raw)
+        line += 1
+        stripped = raw.strip()
+        if stripped:
+            chunk.numbers.append(line)
+            chunk.lines.append(stripped)
+        if len(chunk.lines) >= chunk_size:
+            chunk.end_offset = offset
+            yield chunk
+            chunk = _Chunk()
+    if chunk.lines:
+        chunk.end_offset = offset
+        yield chunk
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumps(data) + b"\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class _Run:
+    """Progress of a verify run: counts, position in the input and output size
+
+    Saved as the summary file, which a resumed run starts from.
+    """
+
+    def __init__(self, input_path: str, summary: Optional[Dict[str, Any]] = None):
+        summary = summary or {}
+        self.input = input_path
+        self.offset: int = summary.get("offset", 0)  # Uncompressed input bytes done
+        self.lines: int = summary.get("lines", 0)  # Input lines done
+        self.valid: int = summary.get("valid", 0)
+        self.invalid: int = summary.get("invalid", 0)
+        self.malformed: int = summary.get("malformed", 0)  # Lines that are not attestations
+        self.output_size: int = summary.get("output_size", 0)
+        # Of earlier, interrupted runs
+        self.previous_elapsed: float = summary.get("elapsed", 0.0)
+        self.started = time.monotonic()
+        self.resumed_at = self.valid + self.invalid + self.malformed
+
+    @property
+    def verified(self) -> int:
+        return self.valid + self.invalid + self.malformed
+
+    @property
+    def elapsed(self) -> float:
+        return self.previous_elapsed + time.monotonic() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Attestations per second in this run"""
+        elapsed = time.monotonic() - self.started
+        return (self.verified - self.resumed_at) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self, finished: bool = False) -> Dict[str, Any]:
+        return {
+            "input": self.input,
+            "offset": self.offset,
+            "lines": self.lines,
+            "verified": self.verified,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "malformed": self.malformed,
+            "output_size": self.output_size,
+            "elapsed": round(self.elapsed, 3),
+            "rate": round(self.rate, 1),
+            "finished": finished,
+        }
+
+    def progress(self) -> str:
+        return (
+            f"{self.lines:,} lines, {self.valid:,} valid, {self.invalid:,} invalid, "
+            f"{self.malformed:,} malformed, {self.rate:,.0f}/s"
+        )
+
+
+def _python_backend(
+    workers: int, attestors: FrozenSet[str]
+) -> Tuple[Callable[[List[bytes]], Awaitable[List[Verdict]]], Callable[[], Awaitable[None]]]:
+    """verify(lines) on a pool of worker processes (in-process with no workers)"""
+    if workers == 0:
+        async def verify_here(lines: List[bytes]) -> List[Verdict]:
+            return _verify_lines(lines, attestors)
+
+        async def nothing() -> None:
+            pass
+
+        return verify_here, nothing
+
+    executor = ProcessPoolExecutor(workers)
+
+    async def verify(lines: List[bytes]) -> List[Verdict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, _verify_lines, lines, attestors)
+
+    async def close() -> None:
+        executor.shutdown(wait=True)
+
+    return verify, close
+
+
+async def _node_backend(
+    workers: int, app_id: Optional[str], app_secret: Optional[str]
+) -> Tuple[Callable[[List[bytes]], Awaitable[List[Verdict]]], Callable[[], Awaitable[None]]]:
+    """verify(lines) on a NodeWorkerPool, sending the lines unparsed"""
+    from .pool import NodeWorkerPool
+
+    if not app_id or not app_secret:
+        raise SystemExit(
+            "The node backend needs --app-id and --app-secret (or PRIMUS_APP_ID/PRIMUS_APP_SECRET)"
+        )
+    loop = asyncio.get_running_loop()
+    pool = await loop.run_in_executor(None, NodeWorkerPool, max(workers, 1))
+    await pool.init(app_id, app_secret)
+
+    async def verify(lines: List[bytes]) -> List[Verdict]:
+        verdicts: List[Verdict] = []
+        attestations = []
+        for line in lines:
+            # Parsed only to keep a broken line from failing its whole chunk
+            try:
+                parsed = isinstance(loads(line), dict)
+            except ValueError:
+                parsed = False
+            verdicts.append(False if parsed else None)
+            if parsed:
+                attestations.append(RawJSON(line))
+        results = iter(await pool.verify_attestations(attestations, chunk_size=len(lines)))
+        return [next(results) if verdict is not None else None for verdict in verdicts]
+
+    return verify, pool.aclose
+
+
+async def _verify_archive(args: argparse.Namespace) -> int:
+    summary_path = args.summary or (
+        f"{args.output}.summary.json" if args.output != "-" else None
+    )
+    previous = None
+    if args.resume:
+        if args.input == "-" or summary_path is None:
+            raise SystemExit("--resume needs an input file and a summary file")
+        try:
+            with open(summary_path, "rb") as f:
+                previous = loads(f.read())
+        except FileNotFoundError:
+            previous = None  # Nothing to resume from; start over
+        if previous is not None and previous.get("input") != args.input:
+            raise SystemExit(
+                f"{summary_path} is the summary of {previous.get('input')}, not {args.input}"
+            )
+
+    stream = _open_input(args.input)
+    if args.output == "-":
+        output: IO[bytes] = sys.stdout.buffer
+    else:
+        try:
+            output = open(args.output, "r+b" if previous is not None else "wb")
+        except FileNotFoundError:
+            if previous is None:
+                raise
+            # The earlier run's results are gone, so its progress is worthless
+            previous = None
+            output = open(args.output, "wb")
+
+    run = _Run(args.input, previous)
+    if run.offset:
+        stream.seek(run.offset)  # gzip streams decompress up to the offset
+    if output is not sys.stdout.buffer:
+        # Results written after the last saved summary are written again
+        output.truncate(run.output_size)
+        output.seek(run.output_size)
+
+    attestors = _normalize_attestors(args.attestor or None)
+    if args.dev_attestor:
+        attestors |= {DEVELOPMENT_ATTESTOR}
+    if args.backend == "node":
+        verify, close = await _node_backend(args.workers, args.app_id, args.app_secret)
+    else:
+        verify, close = _python_backend(args.workers, attestors)
+
+    def save(finished: bool = False) -> None:
+        output.flush()
+        if output is not sys.stdout.buffer:
+            os.fsync(output.fileno())
+            run.output_size = output.tell()
+        if summary_path is not None:
+            _write_json_atomic(summary_path, run.summary(finished))
+
+    def record(chunk: _Chunk, verdicts: List[Verdict]) -> None:
+        results = []
+        for number, verdict in zip(chunk.numbers, verdicts):
+            if verdict is True:
+                run.valid += 1
+                if args.failures_only:
+                    continue
+            elif verdict is False:
+                run.invalid += 1
+            else:
+                run.malformed += 1
+            result: Dict[str, Any] = {"line": number, "valid": bool(verdict)}
+            if verdict is None:
+                result["error"] = "not an attestation"
+            results.append(dumps(result))
+        if results:
+            output.write(b"\n".join(results) + b"\n")
+        run.offset = chunk.end_offset
+        run.lines = chunk.numbers[-1]
+
+    # Chunks in flight, oldest first; results are written in input order
+    window = max(args.workers, 1) * 2
+    in_flight: Deque[Tuple[_Chunk, asyncio.Future]] = collections.deque()
+    last_report = time.monotonic()
+    try:
+        for chunk in _read_chunks(stream, run.offset, run.lines, args.chunk_size):
+            in_flight.append((chunk, asyncio.ensure_future(verify(chunk.lines))))
+            while in_flight and (len(in_flight) >= window or in_flight[0][1].done()):
+                done, future = in_flight.popleft()
+                record(done, await future)
+            if time.monotonic() - last_report >= args.progress_interval:
+                last_report = time.monotonic()
+                save()
+                print(run.progress(), file=sys.stderr, flush=True)
+        while in_flight:
+            done, future = in_flight.popleft()
+            record(done, await future)
+        save(finished=True)
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        await close()
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    print(f"Done: {run.progress()} in {run.elapsed:.1f}s", file=sys.stderr, flush=True)
+    return 0 if run.invalid == 0 and run.malformed == 0 else 1
+
+
+async def _run_daemon(args: argparse.Namespace) -> int:
+    """Run wrapper.js on a Unix socket, restarting it if it dies, until SIGTERM or SIGINT
+
+    With --workers N, wrapper.js serves the socket from N processes itself.
+    """
+    from .node_wrapper import NodeWrapper
+
+    wrapper = await NodeWrapper.create(
+        max_old_space_size=args.max_old_space_size,
+        max_tenants=args.max_tenants,
+        oob_threshold=args.oob_threshold or None,
+    )
+    command = wrapper.node_command(
+        f"--socket={os.path.abspath(args.socket)}", f"--workers={args.workers}"
+    )
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+    stop = asyncio.ensure_future(stopping.wait())
+
+    delay = RESTART_DELAY
+    try:
+        while True:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(*command)
+            exited = asyncio.ensure_future(process.wait())
+            await asyncio.wait([exited, stop], return_when=asyncio.FIRST_COMPLETED)
+            if stopping.is_set():
+                process.terminate()
+                await exited
+                return 0
+            if process.returncode == SOCKET_IN_USE:
+                return 1  # wrapper.js said why on stderr
+
+            if time.monotonic() - started >= STABLE_UPTIME:
+                delay = RESTART_DELAY
+            print(
+                f"wrapper.js exited with status {process.returncode}; restarting in {delay:g}s",
+                file=sys.stderr, flush=True,
+            )
+            await asyncio.wait([stop], timeout=delay)
+            if stopping.is_set():
+                return 0
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+    finally:
+        stop.cancel()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m zktls", description="ZK TLS SDK tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify = commands.add_parser(
+        "verify",
+        help="verify an archive of attestations",
+        description=(
+            "Verify a JSONL archive of attestations (gzipped or not), one per line. "
+            "Writes one result per line and keeps a summary that --resume continues from. "
+            "Exits with 1 if any attestation is invalid."
+        ),
+    )
+    verify.add_argument("input", help="JSONL or gzipped JSONL file, or - for stdin")
+    verify.add_argument(
+        "-o", "--output", default="-", help="per-line results (JSONL; default stdout)"
+    )
+    verify.add_argument(
+        "--summary",
+        help=(
+            "progress and summary file "
+            "(JSON; default OUTPUT.summary.json unless OUTPUT is stdout)"
+        ),
+    )
+    verify.add_argument("--resume", action="store_true", help="continue from the summary file")
+    verify.add_argument(
+        "--backend", choices=("python", "node"), default="python",
+        help="verify in Python worker processes (default) or in a pool of Node.js processes",
+    )
+    verify.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1,
+        help="worker processes (default: CPU count; 0 verifies in-process with the python backend)",
+    )
+    verify.add_argument(
+        "--chunk-size", type=int, default=VERIFY_CHUNK_SIZE, help="attestations per worker task"
+    )
+    verify.add_argument(
+        "--attestor", action="append",
+        help="trusted attestor address (repeatable; default: the SDK's attestor; python backend)",
+    )
+    verify.add_argument(
+        "--dev-attestor", action="store_true",
+        help="also trust the SDK's development attestor (python backend)",
+    )
+    verify.add_argument(
+        "--failures-only", action="store_true", help="write results of failed lines only"
+    )
+    verify.add_argument(
+        "--progress-interval", type=float, default=PROGRESS_INTERVAL,
+        help="seconds between progress reports and summary saves",
+    )
+    verify.add_argument(
+        "--app-id", default=os.environ.get("PRIMUS_APP_ID"), help="node backend app id"
+    )
+    verify.add_argument(
+        "--app-secret", default=os.environ.get("PRIMUS_APP_SECRET"), help="node backend app secret"
+    )
+
+    daemon = commands.add_parser(
+        "daemon",
+        help="serve NodeWrapper(socket_path=...) clients from shared Node.js processes",
+        description=(
+            "Run wrapper.js as a daemon on a Unix domain socket, restarting it if it dies. "
+            "Clients that init with the same credentials on the same worker share one "
+            "initialized instance."
+        ),
+    )
+    daemon.add_argument("--socket", required=True, help="path of the Unix domain socket")
+    daemon.add_argument(
+        "-j", "--workers", type=int, default=1,
+        help="Node.js processes serving the socket (default: 1)",
+    )
+    daemon.add_argument("--max-tenants", type=int, default=64, help="tenant instances to keep")
+    daemon.add_argument("--max-old-space-size", type=int, help="V8 heap cap in MiB")
+    daemon.add_argument(
+        "--oob-threshold", type=int, default=DEFAULT_OOB_THRESHOLD,
+        help="bytes above which replies go through payload files (0 disables)",
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "verify":
+        if args.workers < 0:
+            parser.error("--workers must not be negative")
+        if args.chunk_size < 1:
+            parser.error("--chunk-size must be at least 1")
+        return asyncio.run(_verify_archive(args))
+    if args.command == "daemon":
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        if args.max_tenants < 1:
+            parser.error("--max-tenants must be at least 1")
+        if args.oob_threshold < 0:
+            parser.error("--oob-threshold must not be negative")
+        return asyncio.run(_run_daemon(args))
+    return 2
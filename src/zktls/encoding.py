@@ -0,0 +1,111 @@
+"""Pure-Python encodings matching @primuslabs/zktls-core-sdk/dist/utils"""
+from typing import Any, Dict, List, Sequence
+
+from eth_utils import keccak
+
+UINT64_MAX = 2 ** 64 - 1
+
+
+class EncodingError(ValueError):
+    """Raised when data does not have the shape the SDK encodes"""
+    pass
+
+
+def _field(data: Dict[str, Any], name: str, owner: str) -> Any:
+    try:
+        return data[name]
+    except (KeyError, TypeError):
+        raise EncodingError(f"{owner} is missing field '{name}'")
+
+
+def _pack_string(value: Any, name: str) -> bytes:
+    if not isinstance(value, str):
+        raise EncodingError(f"'{name}' must be a string, got {type(value).__name__}")
+    return value.encode("utf-8")
+
+
+def _pack_address(value: Any, name: str) -> bytes:
+    if not isinstance(value, str) or not value.startswith(("0x", "0X")):
+        raise EncodingError(f"'{name}' must be a 0x-prefixed address")
+    try:
+        address = bytes.fromhex(value[2:])
+    except ValueError:
+        raise EncodingError(f"'{name}' is not valid hex: {value}")
+    if len(address) != 20:
+        raise EncodingError(f"'{name}' must be 20 bytes, got {len(address)}")
+    return address
+
+
+def _pack_uint64(value: Any, name: str) -> bytes:
+    if isinstance(value, bool):
+        raise EncodingError(f"'{name}' must be an integer")
+    if isinstance(value, str):
+        try:
+            value = int(value, 16) if value.lower().startswith("0x") else int(value)
+        except ValueError:
+            raise EncodingError(f"'{name}' must be an integer, got {value!r}")
+    if not isinstance(value, int) or not 0 <= value <= UINT64_MAX:
+        raise EncodingError(f"'{name}' must be an unsigned 64-bit integer, got {value!r}")
+    return value.to_bytes(8, "big")
+
+
+# Each encoding is keccak256 over the Solidity packed encoding of the structure,
+# as the SDK computes it with ethers' solidityPack
+
+def _request_digest(request: Dict[str, Any]) -> bytes:
+    return keccak(b"".join(
+        _pack_string(_field(request, name, "request"), name)
+        for name in ("url", "header", "method", "body")
+    ))
+
+
+def _response_digest(response: Sequence[Dict[str, Any]]) -> bytes:
+    packed = b"".join(
+        _pack_string(_field(resolve, name, "response resolve"), name)
+        for resolve in response
+        for name in ("keyName", "parseType", "parsePath")
+    )
+    return keccak(packed)
+
+
+def _attestation_digest(attestation: Dict[str, Any]) -> bytes:
+    # The SDK spells the response field "reponseResolve"
+    return keccak(b"".join([
+        _pack_address(_field(attestation, "recipient", "attestation"), "recipient"),
+        _request_digest(_field(attestation, "request", "attestation")),
+        _response_digest(_field(attestation, "reponseResolve", "attestation")),
+        _pack_string(_field(attestation, "data", "attestation"), "data"),
+        _pack_string(_field(attestation, "attConditions", "attestation"), "attConditions"),
+        _pack_uint64(_field(attestation, "timestamp", "attestation"), "timestamp"),
+        _pack_string(_field(attestation, "additionParams", "attestation"), "additionParams"),
+    ]))
+
+
+def encode_request(request: Dict[str, Any]) -> str:
+    """Encode request data (url, header, method and body strings)"""
+    return "0x" + _request_digest(request).hex()
+
+
+def encode_response(response: Sequence[Dict[str, Any]]) -> str:
+    """Encode a list of response resolves (keyName, parseType and parsePath strings)"""
+    return "0x" + _response_digest(response).hex()
+
+
+def encode_attestation(attestation: Dict[str, Any]) -> str:
+    """Encode attestation data"""
+    return "0x" + _attestation_digest(attestation).hex()
+
+
+def encode_requests(requests: Sequence[Dict[str, Any]]) -> List[str]:
+    """Encode a list of requests"""
+    return [encode_request(request) for request in requests]
+
+
+def encode_responses(responses: Sequence[Sequence[Dict[str, Any]]]) -> List[str]:
+    """Encode a list of response resolve lists"""
+    return [encode_response(response) for response in responses]
+
+
+def encode_attestations(attestations: Sequence[Dict[str, Any]]) -> List[str]:
+    """Encode a list of attestations"""
+    return [encode_attestation(attestation) for attestation in attestations]
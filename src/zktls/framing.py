@@ -0,0 +1,220 @@
+"""Message framing for the Python <-> Node.js channel"""
+import asyncio
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # Optional fast JSON backend (the "fast" extra)
+    orjson = None  # type: ignore[assignment]
+
+JSON_LINES = "json-lines"
+LENGTH_PREFIXED = "length-prefixed"
+FRAMINGS = (JSON_LINES, LENGTH_PREFIXED)
+
+# Encoded messages larger than this go through a payload file instead of the pipe
+DEFAULT_OOB_THRESHOLD = 1024 * 1024
+
+# Payload files are opened without following symlinks where the platform allows
+_O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+
+class RawJSON:
+    """Already serialized JSON, spliced into a message as is by dumps()
+
+    Lets stored documents go to Node.js without a round trip through Python
+    objects. The bytes must be a single compact JSON value (no raw newlines).
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+# Stands in for RawJSON values while the rest of a message is serialized
+_RAW_MARKER = "\0raw-" + os.urandom(8).hex() + ":"
+
+
+def dumps(message: Any) -> bytes:
+    """Serialize a message to compact JSON bytes, splicing in RawJSON values"""
+    fragments: List[bytes] = []
+
+    def default(value: Any) -> str:
+        if isinstance(value, RawJSON):
+            fragments.append(value.data)
+            return f"{_RAW_MARKER}{len(fragments) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(message, default=default)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the json module handles
+            fragments.clear()
+    if data is None:
+        data = json.dumps(
+            message, separators=(",", ":"), ensure_ascii=False, default=default
+        ).encode("utf-8")
+    if not fragments:
+        return data
+
+    # Both backends escape the marker's NUL as \u0000
+    marker = b'"' + _RAW_MARKER.replace("\0", "\\u0000").encode()
+    head, *parts = data.split(marker)
+    spliced = [head]
+    for part in parts:
+        index, rest = part.split(b'"', 1)
+        spliced.append(fragments[int(index)])
+        spliced.append(rest)
+    return b"".join(spliced)
+
+
+def loads(data: Union[bytes, memoryview]) -> Any:
+    """Deserialize JSON bytes, or a memoryview of them"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data if isinstance(data, bytes) else data.tobytes())
+
+
+def default_payload_dir() -> str:
+    """Directory for out-of-band payload files: /dev/shm if usable, else the temp dir
+
+    /dev/shm is a tmpfs, so a payload file there never touches the disk.
+    """
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK | os.X_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def write_payload_file(directory: str, data: bytes) -> str:
+    """Write an encoded message to a new payload file, readable by its owner only"""
+    fd, path = tempfile.mkstemp(prefix=f"zktls-py{os.getpid()}-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+    except BaseException:
+        remove_payload_file(directory, path)
+        raise
+    return path
+
+
+def _check_payload_path(directory: str, path: str) -> None:
+    """Refuse a path the peer named unless it is a payload file directly in directory"""
+    name = os.path.basename(path)
+    if (
+        os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory)
+        or not name.startswith("zktls-")
+        or not name.endswith(".json")
+    ):
+        raise ValueError(f"Not a payload file in {directory}: {path}")
+
+
+def read_payload_file(directory: str, path: str) -> Tuple[Any, int]:
+    """Load and remove a payload file, returning the message and its size in bytes
+
+    Paths outside directory are refused before anything is read or removed,
+    and the file itself may not be a symlink.
+    """
+    _check_payload_path(directory, path)
+    try:
+        with os.fdopen(os.open(path, os.O_RDONLY | _O_NOFOLLOW), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                raise ValueError(f"Empty payload file: {path}")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                # orjson parses straight from the mapping; the json module needs bytes
+                data = memoryview(mapped) if orjson is not None else mapped[:]
+                try:
+                    return loads(data), size
+                finally:
+                    if isinstance(data, memoryview):
+                        data.release()
+    finally:
+        remove_payload_file(directory, path)
+
+
+def remove_payload_file(directory: str, path: str) -> None:
+    """Remove a payload file in directory if it is still there"""
+    _check_payload_path(directory, path)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_payload_files(directory: str, pid: int) -> None:
+    """Remove the payload files a (dead) wrapper.js process left behind"""
+    for path in glob.glob(os.path.join(directory, f"zktls-{pid}-*.json")):
+        remove_payload_file(directory, path)
+
+
+class LineFraming:
+    """One JSON document per newline-terminated line (the handshake framing)"""
+
+    name = JSON_LINES
+    last_size = 0  # Encoded size of the last message read
+
+    def encode(self, message: Any) -> bytes:
+        return self.frame(dumps(message))
+
+    def frame(self, body: bytes) -> bytes:
+        """Frame an already encoded message"""
+        return body + b"\n"
+
+    async def read(self, reader: asyncio.StreamReader) -> Optional[Any]:
+        """Read the next message, or None at end of stream"""
+        line = await reader.readline()
+        if not line:
+            return None
+        self.last_size = len(line)
+        return loads(line)
+
+
+class LengthPrefixedFraming:
+    """JSON bytes preceded by a 4-byte big-endian length
+
+    Neither side has to scan for delimiters, and the reader is not bound by
+    the StreamReader line limit.
+    """
+
+    name = LENGTH_PREFIXED
+    HEADER = struct.Struct(">I")
+    last_size = 0  # Encoded size of the last message read, header included
+
+    def encode(self, message: Any) -> bytes:
+        return self.frame(dumps(message))
+
+    def frame(self, body: bytes) -> bytes:
+        """Frame an already encoded message"""
+        return self.HEADER.pack(len(body)) + body
+
+    async def read(self, reader: asyncio.StreamReader) -> Optional[Any]:
+        """Read the next message, or None at end of stream"""
+        try:
+            header = await reader.readexactly(self.HEADER.size)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        (length,) = self.HEADER.unpack(header)
+        self.last_size = self.HEADER.size + length
+        return loads(await reader.readexactly(length))
+
+
+Framing = Union[LineFraming, LengthPrefixedFraming]
+
+
+def get_framing(name: str) -> Framing:
+    """Framing implementation for a framing name"""
+    if name == JSON_LINES:
+        return LineFraming()
+    if name == LENGTH_PREFIXED:
+        return LengthPrefixedFraming()
+    raise ValueError(f"Unknown framing: {name} (expected one of {', '.join(FRAMINGS)})")
@@ -0,0 +1,242 @@
+"""Instrumentation for the Node.js wrapper"""
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds and bytes; a final +Inf bucket is implicit
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# Called with (metric name, labels, value) for every observation
+Listener = Callable[[str, Dict[str, str], float], None]
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics"""
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, observations at or below it) pairs, ending with +Inf"""
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            pairs.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return pairs
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": self.sum, "buckets": dict(self.cumulative())}
+
+
+class Timer:
+    """Splits the time since creation into named phases"""
+
+    __slots__ = ("started", "last", "phases")
+
+    def __init__(self) -> None:
+        self.started = self.last = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        """Record the time since the previous mark as phase"""
+        now = time.perf_counter()
+        self.phases[phase] = now - self.last
+        self.last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class WrapperMetrics:
+    """Registry of NodeWrapper metrics
+
+    Records per-method command latency split into phases ("serialize",
+    "write", "pipe", "node" and "total"), process startup phases, request and
+    response sizes, in-flight commands, errors and process lifecycle events.
+    One registry may be shared by several wrappers, e.g. the workers of a pool.
+    """
+
+    def __init__(
+        self,
+        latency_buckets: Sequence[float] = LATENCY_BUCKETS,
+        size_buckets: Sequence[float] = SIZE_BUCKETS
+    ):
+        self.latency_buckets = tuple(latency_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.command_seconds: Dict[Tuple[str, str], Histogram] = {}  # By (method, phase)
+        self.startup_seconds: Dict[str, Histogram] = {}  # By phase
+        self.request_bytes: Dict[str, Histogram] = {}  # By method
+        self.response_bytes: Dict[str, Histogram] = {}  # By method
+        self.in_flight: Dict[str, int] = {}  # By method
+        self.errors: Dict[Tuple[str, str], int] = {}  # By (method, kind)
+        self.events: Dict[str, int] = {}  # "spawn", "respawn", "process_failure"
+        self._listeners: List[Listener] = []
+
+    def add_listener(self, listener: Listener) -> None:
+        """Also pass every observation to listener, e.g. to forward it to StatsD"""
+        self._listeners.append(listener)
+
+    def _emit(self, name: str, labels: Dict[str, str], value: float) -> None:
+        for listener in self._listeners:
+            listener(name, labels, value)
+
+    def _histogram(
+        self, histograms: Dict[Any, Histogram], key: Any, buckets: Sequence[float]
+    ) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def command_started(self, method: str, request_bytes: int) -> None:
+        self.in_flight[method] = self.in_flight.get(method, 0) + 1
+        self._histogram(self.request_bytes, method, self.size_buckets).observe(request_bytes)
+        if self._listeners:
+            self._emit("command_request_bytes", {"method": method}, request_bytes)
+
+    def command_finished(
+        self,
+        method: str,
+        timer: Timer,
+        response_bytes: Optional[int] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Record a finished command; error is the failure kind, if it failed"""
+        self.in_flight[method] -= 1
+        phases = dict(timer.phases, total=timer.elapsed())
+        for phase, seconds in phases.items():
+            histogram = self._histogram(
+                self.command_seconds, (method, phase), self.latency_buckets
+            )
+            histogram.observe(seconds)
+        if response_bytes is not None:
+            self._histogram(self.response_bytes, method, self.size_buckets).observe(response_bytes)
+        if error is not None:
+            self.record_error(method, error)
+
+        if self._listeners:
+            for phase, seconds in phases.items():
+                self._emit("command_duration_seconds", {"method": method, "phase": phase}, seconds)
+            if response_bytes is not None:
+                self._emit("command_response_bytes", {"method": method}, response_bytes)
+
+    def record_error(self, method: str, kind: str) -> None:
+        key = (method, kind)
+        self.errors[key] = self.errors.get(key, 0) + 1
+        if self._listeners:
+            self._emit("command_errors", {"method": method, "kind": kind}, 1)
+
+    def startup_finished(self, timer: Timer) -> None:
+        for phase, seconds in dict(timer.phases, total=timer.elapsed()).items():
+            self._histogram(self.startup_seconds, phase, self.latency_buckets).observe(seconds)
+            if self._listeners:
+                self._emit("startup_duration_seconds", {"phase": phase}, seconds)
+
+    def record_event(self, event: str) -> None:
+        self.events[event] = self.events.get(event, 0) + 1
+        if self._listeners:
+            self._emit("process_events", {"event": event}, 1)
+
+    def reset(self) -> None:
+        """Drop all recorded values (in-flight counts are kept)"""
+        self.command_seconds.clear()
+        self.startup_seconds.clear()
+        self.request_bytes.clear()
+        self.response_bytes.clear()
+        self.errors.clear()
+        self.events.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """All metrics as plain dicts, suitable for JSON"""
+        commands: Dict[str, Any] = {}
+        for (method, phase), histogram in self.command_seconds.items():
+            commands.setdefault(method, {}).setdefault("seconds", {})[phase] = histogram.snapshot()
+        for method, histogram in self.request_bytes.items():
+            commands.setdefault(method, {})["request_bytes"] = histogram.snapshot()
+        for method, histogram in self.response_bytes.items():
+            commands.setdefault(method, {})["response_bytes"] = histogram.snapshot()
+        for method, count in self.in_flight.items():
+            commands.setdefault(method, {})["in_flight"] = count
+        for (method, kind), count in self.errors.items():
+            commands.setdefault(method, {}).setdefault("errors", {})[kind] = count
+
+        return {
+            "commands": commands,
+            "startup_seconds": {phase: h.snapshot() for phase, h in self.startup_seconds.items()},
+            "events": dict(self.events),
+        }
+
+    def to_prometheus(self, prefix: str = "zktls") -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def histograms(
+            name: str, help_text: str, items: Dict[Any, Histogram], label_names: Tuple[str, ...]
+        ) -> None:
+            if not items:
+                return
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in sorted(items.items()):
+                values = key if isinstance(key, tuple) else (key,)
+                labels = ",".join(
+                    f'{label}="{_escape(value)}"' for label, value in zip(label_names, values)
+                )
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        def scalars(
+            name: str,
+            kind: str,
+            help_text: str,
+            items: Dict[Any, int],
+            label_names: Tuple[str, ...]
+        ) -> None:
+            if not items:
+                return
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for key, value in sorted(items.items()):
+                values = key if isinstance(key, tuple) else (key,)
+                labels = ",".join(
+                    f'{label}="{_escape(value)}"' for label, value in zip(label_names, values)
+                )
+                lines.append(f"{metric}{{{labels}}} {value}")
+
+        histograms("command_duration_seconds", "Node.js command latency by phase",
+                   self.command_seconds, ("method", "phase"))
+        histograms("startup_duration_seconds", "Node.js process startup latency by phase",
+                   self.startup_seconds, ("phase",))
+        histograms("command_request_bytes", "Encoded command size",
+                   self.request_bytes, ("method",))
+        histograms("command_response_bytes", "Encoded response size",
+                   self.response_bytes, ("method",))
+        scalars("commands_in_flight", "gauge", "Commands awaiting a response",
+                self.in_flight, ("method",))
+        scalars("command_errors_total", "counter", "Failed commands by kind",
+                self.errors, ("method", "kind"))
+        scalars("process_events_total", "counter", "Node.js process lifecycle events",
+                self.events, ("event",))
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
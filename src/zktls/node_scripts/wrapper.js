@@ -0,0 +1,663 @@
+// Messages are JSON documents tagged with the request id. They start out one per
+// line ('json-lines'); Python may switch both directions to a 4-byte big-endian
+// length prefix per message ('length-prefixed') with a setFraming command.
+const FRAMINGS = ['json-lines', 'length-prefixed'];
+const NEWLINE = Buffer.from('\n');
+
+// Value of a --name=value command line option, or null
+function option(name) {
+    const arg = process.argv.find((value) => value.startsWith(`--${name}=`));
+    return arg ? arg.slice(name.length + 3) : null;
+}
+
+// With --socket=PATH this runs as a daemon serving any number of Python clients
+// on a Unix domain socket, each connection a channel of its own. Without it, the
+// one channel is stdin/stdout.
+const socketPath = option('socket');
+if (socketPath === null) {
+    // Ensure stdout is set to unbuffered mode
+    process.stdout._handle.setBlocking(true);
+
+    // Send ready signal immediately, offering the supported framings
+    process.stdout.write(JSON.stringify({ ready: true, framings: FRAMINGS }) + '\n');
+}
+
+// This script runs from the SDK's cache directory, so resolve the SDK the way a
+// script in the working directory would (node_modules up from cwd, then NODE_PATH)
+const cluster = require('cluster');
+const fs = require('fs');
+const net = require('net');
+const path = require('path');
+const requireFromCwd = require('module').createRequire(path.join(process.cwd(), 'index.js'));
+const { PrimusCoreTLS } = requireFromCwd('@primuslabs/zktls-core-sdk');
+const { encodeRequest, encodeResponse, encodeAttestation } = requireFromCwd('@primuslabs/zktls-core-sdk/dist/utils');
+
+// Instances created by init, by app id. Channels that init with the same
+// credentials share one, so daemon clients after the first find it warm.
+const sessions = new Map();  // appId -> { appSecret, ready: Promise of { tls, result } }
+
+function openSession(appId, appSecret) {
+    let session = sessions.get(appId);
+    if (!session || session.appSecret !== appSecret) {
+        session = { appSecret, ready: null };
+        session.ready = (async () => {
+            const tls = new PrimusCoreTLS();
+            return { tls, result: await tls.init(appId, appSecret) };
+        })();
+        sessions.set(appId, session);
+        session.ready.catch(() => {
+            if (sessions.get(appId) === session) {
+                sessions.delete(appId);  // Let the next init try again
+            }
+        });
+    }
+    return session;
+}
+
+// Further app ids ('tenants') get an instance each, kept in least recently used
+// order. A command for a tenant names its app id and, unless Python knows the
+// tenant to be live, its secret, so the instance can be created on the spot. A
+// secret that differs from the one the instance was created with is refused,
+// and a command without one is only taken from a channel that has already given
+// the right secret for that instance. Past --max-tenants=N, the tenants idle
+// longest are evicted; a command for an evicted tenant without the secret fails
+// with code UNKNOWN_TENANT.
+const maxTenants = option('max-tenants') ? Number(option('max-tenants')) : 64;
+const tenants = new Map();  // appId -> { appSecret, ready: Promise of the instance, busy }
+
+async function createInstance(appId, appSecret) {
+    const tls = new PrimusCoreTLS();
+    await tls.init(appId, appSecret);
+    return tls;
+}
+
+function evictTenants() {
+    for (const [appId, tenant] of tenants) {
+        if (tenants.size <= maxTenants) {
+            break;
+        }
+        if (tenant.busy === 0) {
+            tenants.delete(appId);
+        }
+    }
+}
+
+// Run use with the instance of params.tenant, or the channel's init one without a tenant
+async function withInstance(channel, params, use) {
+    if (!params.tenant) {
+        if (!channel.session) throw new Error('Not initialized');
+        return await use((await channel.session.ready).tls);
+    }
+    let tenant = tenants.get(params.tenant);
+    if (!params.tenantSecret) {
+        if (!tenant || channel.tenants.get(params.tenant) !== tenant) {
+            const error = new Error(`Unknown tenant: ${params.tenant}`);
+            error.code = 'UNKNOWN_TENANT';
+            throw error;
+        }
+    } else if (!tenant) {
+        tenant = {
+            appSecret: params.tenantSecret,
+            ready: createInstance(params.tenant, params.tenantSecret),
+            busy: 0
+        };
+    } else if (tenant.appSecret !== params.tenantSecret) {
+        const error = new Error(`Wrong secret for tenant: ${params.tenant}`);
+        error.code = 'TENANT_SECRET_MISMATCH';
+        throw error;
+    }
+    channel.tenants.set(params.tenant, tenant);
+    // Most recently used goes last; a busy tenant is never evicted
+    tenants.delete(params.tenant);
+    tenants.set(params.tenant, tenant);
+    tenant.busy++;
+    try {
+        evictTenants();
+        let tls;
+        try {
+            tls = await tenant.ready;
+        } catch (error) {
+            if (tenants.get(params.tenant) === tenant) {
+                tenants.delete(params.tenant);  // Let the next command try again
+            }
+            throw error;
+        }
+        return await use(tls);
+    } finally {
+        tenant.busy--;
+    }
+}
+
+async function startAttestation(tls, params) {
+    // Generate request params
+    const attRequest = tls.generateRequestParams(
+        params.request,
+        params.responseResolves || [],
+        params.userAddress
+    );
+
+    // Set attestation mode if provided
+    if (params.attMode) {
+        attRequest.setAttMode(params.attMode);
+    }
+
+    // Set attestation conditions if provided
+    if (params.attConditions) {
+        attRequest.setAttConditions(params.attConditions);
+
+        // Set SSL cipher if provided in conditions
+        if (params.attConditions.sslCipher) {
+            attRequest.setSslCipher(params.attConditions.sslCipher);
+        }
+    }
+
+    // Set additional params if provided
+    if (params.additionParams) {
+        attRequest.setAdditionParams(params.additionParams);
+    }
+
+    return await tls.startAttestation(attRequest);
+}
+
+// Fill {name} placeholders in a template URL
+function fillUrl(url, urlParams) {
+    return url.replace(/\{(\w+)\}/g, (placeholder, name) => {
+        if (!Object.prototype.hasOwnProperty.call(urlParams, name)) {
+            throw new Error(`Missing URL parameter: ${name}`);
+        }
+        return encodeURIComponent(String(urlParams[name]));
+    });
+}
+
+// Build startAttestation params from a registered template and a call's deltas,
+// filling in the per-call conditions the way Python does for plain calls
+function expandTemplate(templates, params) {
+    const template = templates.get(params.template);
+    if (!template) {
+        throw new Error(`Unknown template: ${params.template}`);
+    }
+
+    const request = Object.assign({}, template.request, params.request);
+    if (params.urlParams) {
+        request.url = fillUrl(request.url, params.urlParams);
+    }
+
+    const now = Date.now();
+    const attConditions = Object.assign({}, template.attConditions, {
+        requestid: params.requestId || template.attConditions.requestid || `test-${Math.floor(now / 1000)}`,
+        getdatatime: template.attConditions.getdatatime || String(now)
+    });
+    const userAddress = params.userAddress || template.userAddress;
+    if (params.userAddress && attConditions.user) {
+        attConditions.user = Object.assign({}, attConditions.user, { address: userAddress });
+    }
+
+    return {
+        request,
+        responseResolves: template.responseResolves,
+        userAddress,
+        attMode: template.attMode,
+        attConditions,
+        additionParams: template.additionParams
+    };
+}
+
+async function dispatch(channel, method, params) {
+    switch (method) {
+        case 'init': {
+            const session = openSession(params.appId, params.appSecret);
+            const { result } = await session.ready;
+            channel.session = session;
+            return result;
+        }
+
+        case 'startAttestation':
+            return await withInstance(channel, params, (tls) => startAttestation(tls, params));
+
+        case 'registerTemplate':
+            channel.templates.set(params.id, params);
+            return true;
+
+        case 'startTemplateAttestation':
+            return await withInstance(channel, params, (tls) => startAttestation(tls, expandTemplate(channel.templates, params)));
+
+        case 'verifyAttestation':
+            return await withInstance(channel, params, (tls) => tls.verifyAttestation(params.attestation));
+
+        case 'verifyAttestations':
+            // A malformed attestation fails its own entry, not the whole chunk
+            return await withInstance(channel, params, (tls) => params.attestations.map((attestation) => {
+                try {
+                    return tls.verifyAttestation(attestation) === true;
+                } catch (error) {
+                    return false;
+                }
+            }));
+
+        case 'encodeRequest':
+            return encodeRequest(params.request);
+
+        case 'encodeResponse':
+            return encodeResponse(params.response);
+
+        case 'encodeAttestation':
+            return encodeAttestation(params.attestation);
+
+        case 'healthCheck':
+            return true;
+
+        case 'stats':
+            return {
+                ...process.memoryUsage(),
+                pid: process.pid,
+                uptime: process.uptime(),
+                tenants: tenants.size,
+                clients: channels.size
+            };
+
+        default:
+            throw new Error(`Unknown method: ${method}`);
+    }
+}
+
+// Messages larger than --oob-threshold=N bytes travel in a payload file in
+// --oob-dir=PATH; the frame on the pipe is just { id, messageFile }. Whoever reads
+// a payload file removes it. Without the options every reply goes over the pipe.
+const oobThreshold = option('oob-threshold') ? Number(option('oob-threshold')) : null;
+const oobDir = option('oob-dir');
+let payloadFiles = 0;
+
+// Only a payload file directly in --oob-dir is read (never through a symlink) and
+// removed; any other path a message names is refused untouched
+async function readPayloadFile(file) {
+    const name = path.basename(file);
+    if (oobDir === null || path.dirname(path.resolve(file)) !== path.resolve(oobDir) ||
+            !name.startsWith('zktls-') || !name.endsWith('.json')) {
+        throw new Error(`Not a payload file in ${oobDir}: ${file}`);
+    }
+    try {
+        const flags = fs.constants.O_RDONLY | (fs.constants.O_NOFOLLOW || 0);
+        return JSON.parse(await fs.promises.readFile(file, { encoding: 'utf8', flag: flags }));
+    } finally {
+        fs.promises.unlink(file).catch(() => {});
+    }
+}
+
+// Open channels; templates, cancellation and framing are per channel, while
+// init sessions and tenants are shared by all of them
+const channels = new Set();
+
+// A channel speaks the protocol over write and the chunks passed to receive
+function createChannel(write) {
+    const channel = {
+        framing: 'json-lines',
+        session: null,  // The init session
+        templates: new Map(),  // startAttestation params registered by registerTemplate, by id
+        tenants: new Map(),  // appId -> the tenant entry this channel gave the right secret for
+        active: new Set(),  // Ids of requests still running; cancelling one removes it here
+        closed: false
+    };
+    channels.add(channel);
+
+    function send(message) {
+        sendBody(Buffer.from(JSON.stringify(message), 'utf8'));
+    }
+
+    // Write one encoded message in the current framing
+    function sendBody(body) {
+        if (channel.closed) {
+            return;
+        }
+        if (channel.framing === 'length-prefixed') {
+            const header = Buffer.alloc(4);
+            header.writeUInt32BE(body.length, 0);
+            // Writes are queued in order, so the two cannot interleave with another message
+            write(header);
+            write(body);
+        } else {
+            write(Buffer.concat([body, NEWLINE]));
+        }
+    }
+
+    async function sendReply(reply) {
+        const body = Buffer.from(JSON.stringify(reply), 'utf8');
+        if (oobThreshold === null || oobDir === null || body.length <= oobThreshold) {
+            sendBody(body);
+            return;
+        }
+        // Named after this process so Python can clean up after it if it dies
+        const file = path.join(oobDir, `zktls-${process.pid}-${++payloadFiles}.json`);
+        try {
+            await fs.promises.writeFile(file, body, { flag: 'wx', mode: 0o600 });
+        } catch (error) {
+            sendBody(body);  // e.g. the directory is full; the pipe still works
+            return;
+        }
+        if (channel.closed) {
+            fs.promises.unlink(file).catch(() => {});
+            return;
+        }
+        send({ id: reply.id, messageFile: file });
+    }
+
+    // Handle one request; requests run concurrently and reply in completion order.
+    // With "timing" set, the reply carries the time spent here in elapsedMs.
+    async function handleMessage(message) {
+        const id = message.id !== undefined ? message.id : null;
+        const started = process.hrtime.bigint();
+        channel.active.add(id);
+        let reply;
+        try {
+            if (message.messageFile) {
+                message = await readPayloadFile(message.messageFile);
+            }
+            reply = { id, result: await dispatch(channel, message.method, message.params || {}) };
+        } catch (error) {
+            reply = {
+                id,
+                error: error.message,
+                code: error.code,
+                stack: error.stack
+            };
+        }
+        if (!channel.active.delete(id)) {
+            return;  // Cancelled: Python has stopped waiting, so skip the reply
+        }
+        if (message.timing) {
+            reply.elapsedMs = Number(process.hrtime.bigint() - started) / 1e6;
+        }
+        await sendReply(reply);
+    }
+
+    // Switch framing; the reply still goes out in the old framing. Python sends nothing
+    // else until it has the reply, so no frame is in flight across the switch.
+    function handleSetFraming(message) {
+        const requested = message.params && message.params.framing;
+        if (!FRAMINGS.includes(requested)) {
+            send({ id: message.id, error: `Unknown framing: ${requested}` });
+            return;
+        }
+        send({ id: message.id, result: requested });
+        channel.framing = requested;
+    }
+
+    // Abandon a request. The SDK cannot interrupt the work itself, but its reply is
+    // dropped instead of being serialized and written to a caller that has gone away.
+    function handleCancel(message) {
+        channel.active.delete(message.params && message.params.id);
+    }
+
+    function handleFrame(frame) {
+        const text = frame.toString('utf8');
+        if (!text.trim()) {
+            return;
+        }
+
+        let message;
+        try {
+            message = JSON.parse(text);
+        } catch (error) {
+            send({ id: null, error: error.message, stack: error.stack });
+            return;
+        }
+
+        // Handled synchronously so the next frame is already split with the new framing
+        if (message.method === 'setFraming') {
+            handleSetFraming(message);
+        } else if (message.method === 'cancel') {
+            handleCancel(message);
+        } else {
+            handleMessage(message).catch((error) => {
+                // The reply itself failed, e.g. a result JSON cannot hold (a BigInt, a cycle)
+                const id = message.id !== undefined ? message.id : null;
+                send({ id, error: `Failed to send reply: ${error.message}`, stack: error.stack });
+            });
+        }
+    }
+
+    // Split input into frames; a chunk may hold several frames or part of one. Chunks are
+    // only concatenated once a whole frame has arrived, so large messages are copied once.
+    let chunks = [];
+    let chunkBytes = 0;
+    let nextFrameBytes = -1;
+
+    function frameComplete(chunk) {
+        if (channel.framing !== 'length-prefixed') {
+            return chunk.indexOf(10) !== -1;
+        }
+        if (nextFrameBytes < 0) {
+            if (chunkBytes < 4) {
+                return false;
+            }
+            nextFrameBytes = 4 + Buffer.concat(chunks, 4).readUInt32BE(0);
+        }
+        return chunkBytes >= nextFrameBytes;
+    }
+
+    function receive(chunk) {
+        chunks.push(chunk);
+        chunkBytes += chunk.length;
+        if (!frameComplete(chunk)) {
+            return;
+        }
+
+        let buffered = chunks.length === 1 ? chunks[0] : Buffer.concat(chunks, chunkBytes);
+        while (buffered.length > 0) {
+            let frame;
+            if (channel.framing === 'length-prefixed') {
+                if (buffered.length < 4) {
+                    break;
+                }
+                const length = buffered.readUInt32BE(0);
+                if (buffered.length < 4 + length) {
+                    break;
+                }
+                frame = buffered.subarray(4, 4 + length);
+                buffered = buffered.subarray(4 + length);
+            } else {
+                const newline = buffered.indexOf(10);
+                if (newline === -1) {
+                    break;
+                }
+                frame = buffered.subarray(0, newline);
+                buffered = buffered.subarray(newline + 1);
+            }
+            handleFrame(frame);
+        }
+
+        chunks = buffered.length > 0 ? [buffered] : [];
+        chunkBytes = buffered.length;
+        nextFrameBytes = -1;
+    }
+
+    // The client is gone: drop its in-flight replies along with the channel
+    function close() {
+        channel.closed = true;
+        channel.active.clear();
+        channels.delete(channel);
+    }
+
+    return { send, receive, close };
+}
+
+// Exit status telling python -m zktls daemon that another daemon has the socket
+const SOCKET_IN_USE = 98;
+// With --workers=N the daemon is N processes serving the one socket
+const daemonWorkers = option('workers') ? Number(option('workers')) : 1;
+
+// Serve clients on a Unix domain socket until SIGTERM or SIGINT. A socket file
+// left behind by a daemon that died is replaced; a live daemon is not.
+function serve() {
+    const server = net.createServer((socket) => {
+        const channel = createChannel((data) => socket.write(data));
+        socket.on('data', channel.receive);
+        socket.on('close', channel.close);
+        socket.on('error', () => {});  // 'close' follows
+        // Clients are not started with this process's options, so tell them where
+        // payload files go and above what size
+        const oob = oobThreshold !== null && oobDir !== null
+            ? { threshold: oobThreshold, dir: path.resolve(oobDir) }
+            : null;
+        channel.send({ ready: true, framings: FRAMINGS, oob });
+    });
+
+    server.on('listening', () => {
+        process.umask(umask);
+        if (!cluster.isWorker) {
+            process.stdout.write(JSON.stringify({ listening: socketPath }) + '\n');
+        }
+    });
+    server.on('error', (error) => {
+        if (error.code !== 'EADDRINUSE') {
+            process.stderr.write(`Cannot listen on ${socketPath}: ${error.message}\n`);
+            process.exit(1);
+        }
+        const probe = net.connect(socketPath);
+        probe.once('connect', () => {
+            process.stderr.write(`Another daemon is listening on ${socketPath}\n`);
+            process.exit(SOCKET_IN_USE);  // Tells python -m zktls daemon not to restart this
+        });
+        probe.once('error', () => {
+            fs.unlinkSync(socketPath);
+            server.listen(socketPath);
+        });
+    });
+
+    // Clients carry app secrets, so only this user may connect
+    const umask = process.umask(0o177);
+    server.listen(socketPath);
+
+    for (const signal of ['SIGTERM', 'SIGINT']) {
+        process.on(signal, () => {
+            server.close();
+            if (!cluster.isWorker) {  // A worker's socket belongs to the primary
+                removeSocket();
+            }
+            process.exit(0);
+        });
+    }
+}
+
+function removeSocket() {
+    try {
+        fs.unlinkSync(socketPath);
+    } catch (error) {
+        // Already gone
+    }
+}
+
+// Remove the payload files a dead worker left behind
+function removePayloadFiles(pid) {
+    if (oobDir === null) {
+        return;
+    }
+    const prefix = `zktls-${pid}-`;
+    try {
+        for (const name of fs.readdirSync(oobDir)) {
+            if (name.startsWith(prefix) && name.endsWith('.json')) {
+                fs.promises.unlink(path.join(oobDir, name)).catch(() => {});
+            }
+        }
+    } catch (error) {
+        // The directory is gone, and the files with it
+    }
+}
+
+// The primary of a --workers=N daemon: it binds the socket, cluster hands each
+// accepted connection to a worker, and a worker that dies once serving is
+// replaced. Sessions, tenants and templates live in the worker a client lands on.
+function supervise() {
+    let stopping = null;  // Exit status once stopping
+    let listening = false;
+    const serving = new Set();  // Ids of workers that got as far as listening
+
+    // Stop the workers, then exit once they are gone
+    function stop(code) {
+        if (stopping !== null) {
+            return;
+        }
+        stopping = code;
+        removeSocket();
+        const workers = Object.values(cluster.workers);
+        if (workers.length === 0) {
+            process.exit(code);
+        }
+        for (const worker of workers) {
+            worker.process.kill('SIGTERM');
+        }
+        setTimeout(() => process.exit(code), 5000).unref();
+    }
+
+    cluster.on('listening', (worker) => {
+        serving.add(worker.id);
+        if (!listening) {
+            listening = true;
+            process.stdout.write(
+                JSON.stringify({ listening: socketPath, workers: daemonWorkers }) + '\n'
+            );
+        }
+    });
+    cluster.on('exit', (worker, code, signal) => {
+        removePayloadFiles(worker.process.pid);
+        if (stopping !== null) {
+            if (Object.keys(cluster.workers).length === 0) {
+                process.exit(stopping);
+            }
+            return;
+        }
+        if (code === SOCKET_IN_USE || !serving.has(worker.id)) {
+            // Replacing a worker that never served would only fail the same way
+            stop(code === SOCKET_IN_USE ? SOCKET_IN_USE : 1);
+            return;
+        }
+        serving.delete(worker.id);
+        process.stderr.write(
+            `Worker ${worker.process.pid} exited with ${signal || `status ${code}`}; replacing it\n`
+        );
+        cluster.fork();
+    });
+    for (const signal of ['SIGTERM', 'SIGINT']) {
+        process.on(signal, () => stop(0));
+    }
+
+    // Check for a live daemon here, so workers never race to replace a stale socket
+    const probe = net.connect(socketPath);
+    probe.once('connect', () => {
+        process.stderr.write(`Another daemon is listening on ${socketPath}\n`);
+        process.exit(SOCKET_IN_USE);
+    });
+    probe.once('error', (error) => {
+        if (error.code !== 'ENOENT') {
+            removeSocket();
+        }
+        process.umask(0o177);  // The socket is created here, on the workers' behalf
+        for (let i = 0; i < daemonWorkers; i++) {
+            cluster.fork();
+        }
+    });
+}
+
+let stdio = null;
+if (socketPath === null) {
+    stdio = createChannel((data) => process.stdout.write(data));
+    process.stdin.on('data', stdio.receive);
+} else if (daemonWorkers > 1 && !cluster.isWorker) {
+    supervise();
+} else {
+    serve();
+}
+
+// Errors outside any request. Python takes an error without an id to mean the
+// process state is unknown and restarts it; the daemon, serving clients that
+// are not affected, logs the error and carries on.
+function reportError(error) {
+    const message = error instanceof Error ? error.message : String(error);
+    if (stdio !== null) {
+        stdio.send({ error: message });
+    } else {
+        process.stderr.write(`Unhandled error: ${(error && error.stack) || message}\n`);
+    }
+}
+
+process.on('uncaughtException', reportError);
+process.on('unhandledRejection', reportError);
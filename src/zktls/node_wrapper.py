@@ -1,296 +1,1028 @@
 """Node.js wrapper for ZK TLS SDK"""
+import asyncio
+import collections
+import functools
+import itertools
 import json
-import subprocess
 import os
 import time
-from typing import Dict, Any, Optional, List
+from typing import (
+    Dict, Any, AsyncGenerator, AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, Hashable,
+    Iterable, Optional, List, Protocol, Sequence, Set, Tuple, TypeVar, Union, cast
+)
+from urllib.parse import urlparse
+
+from . import encoding
+from .cache import LRUCache, SingleFlight, canonical_digest
+from .checks import (
+    check_runtime_environment,
+    ensure_environment,
+    materialize_wrapper_script,
+)
+from .framing import (
+    DEFAULT_OOB_THRESHOLD,
+    JSON_LINES,
+    Framing,
+    LineFraming,
+    RawJSON,
+    default_payload_dir,
+    dumps,
+    get_framing,
+    loads,
+    read_payload_file,
+    remove_payload_file,
+    remove_payload_files,
+    write_payload_file,
+)
+from .metrics import Timer, WrapperMetrics
+from .stderr import StderrDrain
+from .store import AttestationRef
+from .template import AttestationTemplate
+from .tenant import Tenant
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# An attestation to verify, a reference to one in an AttestationStore, or one
+# already serialized
+VerifiableAttestation = Union[Dict[str, Any], AttestationRef, RawJSON]
+
+# A start_attestations item: (request, response_resolves[, start_attestation kwargs])
+AttestationItem = Union[
+    Tuple[Dict[str, Any], List[Dict[str, Any]]],
+    Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]
+]
+
+DEFAULT_BATCH_CONCURRENCY = 16
+# Attestations per verifyAttestations message, and such messages in flight at once
+VERIFY_CHUNK_SIZE = 256
+VERIFY_CHUNK_CONCURRENCY = 4
+
+DEFAULT_ATT_MODE = {"algorithmType": "proxytls", "resultType": "web"}
+
+# Attestation conditions that differ between otherwise identical calls
+PER_CALL_CONDITIONS = ("requestid", "getdatatime")
+
+def attestation_key(params: Dict[str, Any]) -> str:
+    """Single-flight key of startAttestation or startTemplateAttestation params
+
+    A canonical digest of the params without the per-call request id and
+    request time, so concurrent calls that differ only in those coalesce.
+    """
+    params = dict(params)
+    params.pop("requestId", None)
+    conditions = params.get("attConditions")
+    if conditions:
+        params["attConditions"] = {
+            name: value for name, value in conditions.items() if name not in PER_CALL_CONDITIONS
+        }
+    return canonical_digest(params)
+
+def _template_call_params(
+    template: AttestationTemplate,
+    url_params: Optional[Dict[str, Any]],
+    user_address: Optional[str],
+    request_id: Optional[str],
+    request: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Build the startTemplateAttestation command parameters: the template id and deltas"""
+    params: Dict[str, Any] = {"template": template.id}
+    if url_params:
+        params["urlParams"] = url_params
+    if user_address is not None:
+        params["userAddress"] = user_address
+    if request_id is not None:
+        params["requestId"] = request_id
+    if request:
+        params["request"] = request
+    return params
+
+def _verify_payload(attestation: VerifiableAttestation) -> Any:
+    """An attestation as sent to Node.js; stored ones go as their stored bytes"""
+    if isinstance(attestation, AttestationRef):
+        return attestation.raw()
+    return attestation
+
+def _verify_cache_key(attestation: VerifiableAttestation) -> str:
+    """Verification cache key, the same for an attestation, a ref to it and its JSON"""
+    if isinstance(attestation, AttestationRef):
+        return attestation.digest()
+    if isinstance(attestation, RawJSON):
+        return canonical_digest(loads(attestation.data))
+    return canonical_digest(attestation)
+
+def _unpack_attestation_item(
+    item: AttestationItem
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]:
+    """Split a start_attestations item into request, response_resolves and options"""
+    if len(item) == 2:
+        request, response_resolves = item
+        return request, response_resolves, {}
+    request, response_resolves, options = item
+    return request, response_resolves, dict(options or {})
+
+async def run_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    max_concurrency: int
+) -> List[Union[R, BaseException]]:
+    """Run func over items with at most max_concurrency calls in flight
+
+    Returns results in input order, with the exception in place of each
+    failed item's result.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    results: List[Any] = [None] * len(items)  # Each slot is filled with R or the exception
+    indexes = iter(range(len(items)))
+
+    async def worker() -> None:
+        for index in indexes:
+            try:
+                results[index] = await func(items[index])
+            except Exception as e:
+                results[index] = e
+
+    await asyncio.gather(*(worker() for _ in range(min(max_concurrency, len(items)))))
+    return results
+
+async def _iterate(items: Union[AsyncIterable[T], Iterable[T]]) -> AsyncGenerator[T, None]:
+    """Iterate an async or a plain iterable asynchronously"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore[union-attr]
+            yield item
+    else:
+        for item in items:  # type: ignore[union-attr]
+            yield item
+
+async def stream_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Union[AsyncIterable[T], Iterable[T]],
+    max_concurrency: int,
+    ordered: bool = False
+) -> AsyncIterator[Tuple[T, Union[R, BaseException]]]:
+    """Run func over a stream of items with at most max_concurrency calls in flight
+
+    Yields ``(item, result)`` pairs as calls complete, or in input order if
+    ordered, with the exception in place of a failed item's result. Items are
+    pulled from the stream only when there is room, so memory stays bounded by
+    max_concurrency however long the stream is. Closing the generator early
+    cancels the calls still in flight.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    source = _iterate(items)
+    tasks: Dict[asyncio.Future, T] = {}  # Started and not yet yielded, with their input
+    # The same tasks in input order (ordered only)
+    queue: Deque[asyncio.Future] = collections.deque()
+    fetch: Optional[asyncio.Future] = None  # Pulls the next item while calls run
+    exhausted = False
+    try:
+        while True:
+            if fetch is None and not exhausted and len(tasks) < max_concurrency:
+                fetch = asyncio.ensure_future(source.__anext__())
+            waiting: Set["asyncio.Future[Any]"] = set(tasks)
+            if fetch is not None:
+                waiting.add(fetch)
+            if not waiting:
+                return
+
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if fetch is not None and fetch in done:
+                try:
+                    item = fetch.result()
+                except StopAsyncIteration:
+                    exhausted = True
+                else:
+                    call = asyncio.ensure_future(func(item))
+                    tasks[call] = item
+                    if ordered:
+                        queue.append(call)
+                fetch = None
+
+            ready: List["asyncio.Future[Any]"] = []
+            if ordered:
+                while queue and queue[0].done():
+                    ready.append(queue.popleft())
+            else:
+                ready = [task for task in done if task in tasks]
+            for task in ready:
+                item = tasks.pop(task)
+                yield item, _outcome(task)
+    finally:
+        if tasks:
+            for task in tasks:
+                task.cancel()
+            await asyncio.wait(tasks)
+            for task in tasks:
+                _consume_result(task)
+        if fetch is not None:
+            # The source cannot be closed while the fetch is still running it
+            fetch.cancel()
+            await asyncio.wait([fetch])
+            _consume_result(fetch)
+        await source.aclose()
+
+async def _verify_in_chunks(
+    verify_chunk: Callable[[Sequence[T]], Awaitable[List[bool]]],
+    attestations: Sequence[T],
+    chunk_size: int,
+    max_concurrency: int
+) -> List[bool]:
+    """Verify attestations chunk by chunk, raising the first chunk failure"""
+    chunks = [attestations[i:i + chunk_size] for i in range(0, len(attestations), chunk_size)]
+    results = await run_bounded(verify_chunk, chunks, max_concurrency)
+
+    verified: List[bool] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        verified.extend(result)
+    return verified
+
+class CommandTimeoutError(RuntimeError, asyncio.TimeoutError):
+    """Raised when a Node.js command does not complete within its timeout"""
+    pass
+
+class TenantEvictedError(RuntimeError):
+    """Raised when Node.js no longer holds the instance of a command's tenant"""
+    pass
+
+def _outcome(task: "asyncio.Future[R]") -> Union[R, BaseException]:
+    """A finished task's result, or the exception it raised or was cancelled with"""
+    if task.cancelled():
+        return asyncio.CancelledError()
+    return task.exception() or task.result()
+
+def _consume_result(task: "asyncio.Future[Any]") -> None:
+    """Mark a task's exception as retrieved so asyncio does not warn about it"""
+    if not task.cancelled():
+        task.exception()
+
+class _NodeProcess(Protocol):
+    """What NodeWrapper uses of a Node.js subprocess or of a daemon connection"""
+
+    @property
+    def pid(self) -> Optional[int]: ...
+    @property
+    def returncode(self) -> Optional[int]: ...
+    @property
+    def stdin(self) -> asyncio.StreamWriter: ...
+    @property
+    def stdout(self) -> asyncio.StreamReader: ...
+    @property
+    def stderr(self) -> Optional[asyncio.StreamReader]: ...
+    def terminate(self) -> None: ...
+    def kill(self) -> None: ...
+    async def wait(self) -> Optional[int]: ...
+
+class _SocketConnection:
+    """A connection to a wrapper.js daemon, standing in for a Node.js subprocess
+
+    stdin and stdout are the two halves of the socket; terminate() closes it,
+    which is all a client may do to a process it shares with others.
+    """
+
+    pid = None
+    stderr = None
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stdout = reader
+        self.stdin = writer
+        self.returncode: Optional[int] = None
+
+    def terminate(self) -> None:
+        if self.returncode is None:
+            self.returncode = 0
+            self.stdin.close()
+
+    kill = terminate
+
+    async def wait(self) -> Optional[int]:
+        return self.returncode
 
-from .checks import check_runtime_environment, InstallationError, check_node_version, check_npm_version, check_sdk_installation
 
 class NodeWrapper:
     """Wrapper for Node.js ZK TLS SDK"""
 
     CRED_VERSION = "1.0.5"
+    # asyncio's default 64 KiB line limit is far too small for attestation payloads
+    STREAM_LIMIT = 64 * 1024 * 1024
+    STDERR_READ_TIMEOUT = 1.0
+    SHUTDOWN_TIMEOUT = 5.0
+    # How long the healthCheck run after a command timeout may take before the
+    # process is considered hung and replaced
+    HEALTH_CHECK_TIMEOUT = 10.0
+    # Commands that look after the process rather than serve a request
+    SERVICE_METHODS = frozenset({"healthCheck", "stats"})
+    # Connecting to a daemon is retried this many times, backing off from the
+    # delay in seconds, so a daemon that is restarting is waited for
+    CONNECT_ATTEMPTS = 6
+    CONNECT_RETRY_DELAY = 0.1
+
+    def __init__(
+        self,
+        verify_cache_size: int = 0,
+        verify_cache_ttl: Optional[float] = None,
+        framing: str = JSON_LINES,
+        metrics: Optional[WrapperMetrics] = None,
+        command_timeout: Optional[float] = None,
+        max_old_space_size: Optional[int] = None,
+        single_flight: bool = False,
+        single_flight_key: Callable[[Dict[str, Any]], Hashable] = attestation_key,
+        max_tenants: int = 64,
+        oob_threshold: Optional[int] = DEFAULT_OOB_THRESHOLD,
+        oob_dir: Optional[str] = None,
+        socket_path: Optional[str] = None
+    ):
+        """Initialize wrapper and verify installation
+
+        A verify_cache_size above zero enables an LRU cache of verification
+        results keyed by a canonical hash of the attestation, with entries
+        expiring after verify_cache_ttl seconds if given.
+
+        framing selects the message framing on the Node.js pipes: "json-lines"
+        or the more compact "length-prefixed", negotiated when the process starts.
+
+        metrics, if given, records command and startup latencies, payload sizes,
+        in-flight commands, errors and respawns; without it nothing is measured.
+
+        command_timeout is the default number of seconds a command may take
+        (None waits indefinitely); methods also take a per-call timeout.
 
-    def __init__(self):
-        """Initialize wrapper and verify installation"""
-        self.node_process = None  # Initialize node_process first
-        self.app_id = None  # Store app_id for attestation conditions
-        self.app_secret = None  # Store app_secret for attestation conditions
+        max_old_space_size caps the V8 heap of the Node.js process in MiB
+        (Node.js' --max-old-space-size); None keeps the Node.js default.
+
+        single_flight makes concurrent attestations with the same
+        single_flight_key(params) share one in-flight attestation; the default
+        key ignores the per-call request id and request time conditions.
+
+        max_tenants caps the Tenant instances the Node.js process keeps besides
+        the init() one; past it, the tenants idle longest are evicted and
+        initialized again on their next call.
+
+        Messages that encode to more than oob_threshold bytes, either way, are
+        written to a payload file in oob_dir (/dev/shm if usable, else the temp
+        directory) and only its path goes over the pipe; None sends everything
+        through the pipe.
+
+        socket_path connects to a wrapper.js daemon listening on that Unix
+        domain socket (see python -m zktls daemon) instead of spawning Node.js.
+        The daemon is shared with every other client on the host; clients that
+        init with the same credentials share its instance. The connection is
+        kept for all commands and made again, with init and templates replayed,
+        if it drops. Process options (max_old_space_size, max_tenants) are then
+        the daemon's, as are oob_threshold and oob_dir, which it announces on
+        each connection; installation checks are left to it.
+        """
+        if command_timeout is not None and command_timeout <= 0:
+            raise ValueError("command_timeout must be positive")
+        if max_old_space_size is not None and max_old_space_size < 1:
+            raise ValueError("max_old_space_size must be at least 1")
+        if max_tenants < 1:
+            raise ValueError("max_tenants must be at least 1")
+        if oob_threshold is not None and oob_threshold < 1:
+            raise ValueError("oob_threshold must be at least 1")
+        get_framing(framing)  # Validate the name early
+        self.node_process: Optional[_NodeProcess] = None  # Initialize node_process first
+        self.app_id: Optional[str] = None  # Store app_id for attestation conditions
+        self.app_secret: Optional[str] = None  # Store app_secret for attestation conditions
+        self._init_params: Optional[Dict[str, Any]] = None  # Replayed when Node.js respawns
+        self._start_task: Optional[asyncio.Future] = None  # Startup shared by concurrent callers
+        self._process_ready = False  # The running process finished startup
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._reader_task: Optional[asyncio.Future] = None
+        # In-flight commands by request id
+        self._pending: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._request_ids = itertools.count(1)
+        self.framing = framing
+        self._framing: Framing = LineFraming()  # Framing currently in use on the pipes
+        self.metrics = metrics
+        self.command_timeout = command_timeout
+        self._health_task: Optional[asyncio.Future] = None  # healthCheck after a timeout
+        # Response sizes awaiting their command (metrics only)
+        self._response_sizes: Dict[int, int] = {}
+        self.requests_served = 0  # Commands sent to the current process, service commands aside
+        self._stderr: Optional[StderrDrain] = None  # Reads the current process's stderr
+        self._templates: Dict[str, AttestationTemplate] = {}  # Replayed when Node.js respawns
+        self._registered_templates: Set[str] = set()  # Template ids known to the current process
+        self.single_flight_key = single_flight_key
+        self._single_flight = SingleFlight() if single_flight else None
+        self.max_tenants = max_tenants
+        self._ready_tenants: Set[str] = set()  # Tenant app ids live in the current process
+        self.oob_threshold = oob_threshold
+        self.oob_dir = oob_dir if oob_dir is not None else default_payload_dir()
+        self.verify_cache: Optional[LRUCache] = None
+        if verify_cache_size > 0:
+            self.verify_cache = LRUCache(verify_cache_size, ttl=verify_cache_ttl)
         
-        # First check Node.js, npm and SDK installation
-        node_ok, node_msg = check_node_version()
-        if not node_ok:
-            raise InstallationError(
-                f"Node.js check failed: {node_msg}\n"
-                "Please install Node.js 14+ from https://nodejs.org/"
-            )
+        self.socket_path = socket_path
+        self._node_args: List[str] = []
+        self._script_path: Optional[str] = None
+        self._script_args = [f"--max-tenants={max_tenants}"]
+        if oob_threshold is not None:
+            self._script_args += [f"--oob-threshold={oob_threshold}", f"--oob-dir={self.oob_dir}"]
+        if socket_path is not None:
+            self.oob_threshold = None  # Until the daemon announces its own
+            return  # Node.js runs in the daemon
 
-        npm_ok, npm_msg = check_npm_version()
-        if not npm_ok:
-            raise InstallationError(
-                f"npm check failed: {npm_msg}\n"
-                "Please install npm 6+ by updating Node.js"
-            )
+        # Check Node.js, npm and SDK installation with a single cached probe
+        self._environment = ensure_environment()
+        if self._environment.get("wasmThreadsFlag"):
+            self._node_args.append("--experimental-wasm-threads")
+        if max_old_space_size is not None:
+            self._node_args.append(f"--max-old-space-size={max_old_space_size}")
 
-        sdk_ok, sdk_msg = check_sdk_installation()
-        if not sdk_ok:
-            raise InstallationError(
-                f"SDK check failed: {sdk_msg}\n"
-                "Please run: npm install @primuslabs/zktls-core-sdk"
-            )
-            
         # Setup environment before checking wrapper script
         self._setup_node_environment()
-        
+
         # Now check runtime environment
-        check_runtime_environment()
-        
-    def _setup_node_environment(self):
-        """Setup Node.js environment"""
-        # Create node script directory if not exists
-        script_dir = os.path.join(os.getcwd(), "node_scripts")
-        os.makedirs(script_dir, exist_ok=True)
-        
-        # Write wrapper script
-        wrapper_script = """
-// Ensure stdout is set to unbuffered mode
-process.stdout._handle.setBlocking(true);
-
-// Send ready signal immediately
-process.stdout.write(JSON.stringify({ ready: true }) + '\\n');
-process.stdout._handle.setBlocking(true);
-
-const { PrimusCoreTLS } = require('@primuslabs/zktls-core-sdk');
-const { encodeRequest, encodeResponse, encodeAttestation } = require('@primuslabs/zktls-core-sdk/dist/utils');
-
-// Create global instance
-let zkTLS = null;
-
-// Handle errors
-process.on('uncaughtException', (error) => {
-    process.stdout.write(JSON.stringify({ error: error.message }) + '\\n');
-    process.stdout._handle.setBlocking(true);
-});
-
-process.on('unhandledRejection', (error) => {
-    process.stdout.write(JSON.stringify({ error: error.message }) + '\\n');
-    process.stdout._handle.setBlocking(true);
-});
-
-// Handle messages from Python
-process.stdin.on('data', async (data) => {
-    try {
-        const message = JSON.parse(data.toString());
-        const { method, params } = message;
-        
-        switch (method) {
-            case 'init':
-                zkTLS = new PrimusCoreTLS();
-                const initResult = await zkTLS.init(params.appId, params.appSecret);
-                process.stdout.write(JSON.stringify({ result: initResult }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'startAttestation':
-                if (!zkTLS) throw new Error('Not initialized');
-                
-                // Generate request params
-                const attRequest = zkTLS.generateRequestParams(
-                    params.request,
-                    params.responseResolves || [],
-                    params.userAddress
-                );
-                
-                // Set attestation mode if provided
-                if (params.attMode) {
-                    attRequest.setAttMode(params.attMode);
-                }
-                
-                // Set attestation conditions if provided
-                if (params.attConditions) {
-                    attRequest.setAttConditions(params.attConditions);
-                    
-                    // Set SSL cipher if provided in conditions
-                    if (params.attConditions.sslCipher) {
-                        attRequest.setSslCipher(params.attConditions.sslCipher);
-                    }
-                }
-                
-                // Set additional params if provided
-                if (params.additionParams) {
-                    attRequest.setAdditionParams(params.additionParams);
-                }
-                
-                const attestation = await zkTLS.startAttestation(attRequest);
-                process.stdout.write(JSON.stringify({ result: attestation }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'verifyAttestation':
-                if (!zkTLS) throw new Error('Not initialized');
-                const verified = zkTLS.verifyAttestation(params.attestation);
-                process.stdout.write(JSON.stringify({ result: verified }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'encodeRequest':
-                const encodedRequest = encodeRequest(params.request);
-                process.stdout.write(JSON.stringify({ result: encodedRequest }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'encodeResponse':
-                const encodedResponse = encodeResponse(params.response);
-                process.stdout.write(JSON.stringify({ result: encodedResponse }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'encodeAttestation':
-                const encodedAttestation = encodeAttestation(params.attestation);
-                process.stdout.write(JSON.stringify({ result: encodedAttestation }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            case 'healthCheck':
-                process.stdout.write(JSON.stringify({ result: true }) + '\\n');
-                process.stdout._handle.setBlocking(true);
-                break;
-                
-            default:
-                throw new Error(`Unknown method: ${method}`);
-        }
-    } catch (error) {
-        process.stdout.write(JSON.stringify({ 
-            error: error.message,
-            stack: error.stack
-        }) + '\\n');
-        process.stdout._handle.setBlocking(true);
-    }
-});
-"""
-        with open(os.path.join(script_dir, "wrapper.js"), "w") as f:
-            f.write(wrapper_script)
-            
-    async def _start_node_process(self):
-        """Start Node.js process"""
-        if not self.node_process or self.node_process.poll() is not None:
+        check_runtime_environment(self._script_path)
+
+    @classmethod
+    async def create(cls, **kwargs: Any) -> "NodeWrapper":
+        """Create a wrapper without blocking the event loop on installation checks"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(cls, **kwargs))
+
+    def node_command(self, *script_args: str) -> List[str]:
+        """Command line starting wrapper.js with this wrapper's options, plus script_args"""
+        if self._script_path is None:
+            raise RuntimeError("A wrapper connected to a daemon does not start Node.js")
+        return ["node", *self._node_args, self._script_path, *self._script_args, *script_args]
+
+    def _setup_node_environment(self) -> None:
+        """Locate the wrapper script, materializing it in the cache directory if needed"""
+        self._script_path = materialize_wrapper_script()
+
+    def _get_write_lock(self) -> asyncio.Lock:
+        """Lock keeping concurrent writers from interleaving drain() calls on stdin"""
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    async def _read_stderr(self) -> str:
+        """Recent stderr of the (stopping) Node.js process, waiting briefly for its last lines"""
+        if self._stderr is None:
+            return ""
+        return await self._stderr.finish(self.STDERR_READ_TIMEOUT)
+
+    def _with_stderr(self, reason: str) -> str:
+        """reason followed by the recent stderr of the Node.js process, if any"""
+        tail = self._stderr.tail() if self._stderr is not None else ""
+        return f"{reason}\nstderr: {tail}" if tail else reason
+
+    def _fail_pending(self, reason: str) -> None:
+        """Fail every in-flight command with the given reason"""
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"Command failed: {reason}"))
+
+    def _discard_process(
+        self, reason: str = "Node.js process was stopped"
+    ) -> Optional[_NodeProcess]:
+        """Terminate the Node.js process, fail its in-flight commands and forget it"""
+        process = self.node_process
+        self.node_process = None
+        self._process_ready = False
+        self._registered_templates.clear()
+        self._ready_tenants.clear()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._fail_pending(reason)
+        if process is not None and process.returncode is None:
             try:
-                script_dir = os.path.join(os.getcwd(), "node_scripts")
-                self.node_process = subprocess.Popen(
-                    ["node", "--experimental-wasm-threads", os.path.join(script_dir, "wrapper.js")],
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1  # Line buffered
+                process.terminate()
+            except ProcessLookupError:
+                pass
+        if process is not None and process.pid is not None and self.oob_threshold is not None:
+            # Replies the process wrote out but nobody will read any more
+            remove_payload_files(self.oob_dir, process.pid)
+        return process
+
+    async def _read_responses(self, process: _NodeProcess) -> None:
+        """Route each response line from Node.js to the future waiting on its id"""
+        reason = "Node.js process exited unexpectedly"
+        framing = self._framing
+        try:
+            while True:
+                response = await framing.read(process.stdout)
+                if response is None:
+                    break
+                size = framing.last_size
+                if "messageFile" in response:
+                    # A large reply: the frame only names the payload file holding it
+                    if response.get("id") not in self._pending:
+                        try:
+                            remove_payload_file(self.oob_dir, response["messageFile"])
+                        except ValueError:
+                            pass  # Not a payload file, so not ours to remove
+                        continue
+                    try:
+                        response, size = read_payload_file(self.oob_dir, response["messageFile"])
+                    except (OSError, ValueError) as e:
+                        response = {"id": response.get("id"), "error": f"Lost reply: {str(e)}"}
+                request_id = response.get("id")
+                if request_id is None:
+                    if "error" in response:
+                        # Not tied to any request, so the process state is unknown
+                        reason = f"Node.js process reported an error: {response['error']}"
+                        break
+                    continue
+                future = self._pending.pop(request_id, None)
+                # No future means the caller already gave up on this request
+                if future is not None and not future.done():
+                    if self.metrics is not None:
+                        self._response_sizes[request_id] = size
+                    future.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            reason = f"Failed to read from Node.js process: {str(e)}"
+
+        if self.node_process is process:
+            self._reader_task = None
+            self._handle_process_failure(reason)
+
+    def _handle_process_failure(self, reason: str) -> None:
+        """Discard a crashed process and, if a session was set up, respawn in the background
+
+        Commands that were in flight fail, but the replacement (with init replayed)
+        is usually ready or well under way by the time the next command arrives.
+        """
+        respawn = self._process_ready and self._init_params is not None
+        if self._start_task is not None and not self._start_task.done():
+            respawn = False  # A caller noticed the exit first and is already starting one
+        self._discard_process(self._with_stderr(reason))
+        if self.metrics is not None:
+            self.metrics.record_event("process_failure")
+            if respawn:
+                self.metrics.record_event("respawn")
+        if respawn:
+            self._start_task = asyncio.ensure_future(self._spawn_node_process())
+            # Nobody may be waiting on a background respawn; the next command retries
+            self._start_task.add_done_callback(_consume_result)
+
+    async def _negotiate_framing(
+        self, process: _NodeProcess, ready_signal: Dict[str, Any]
+    ) -> None:
+        """Switch the channel to the requested framing if wrapper.js offers it"""
+        if self.framing not in ready_signal.get("framings", []):
+            return
+
+        line_framing = LineFraming()
+        request_id = next(self._request_ids)
+        process.stdin.write(line_framing.encode({
+            "id": request_id,
+            "method": "setFraming",
+            "params": {"framing": self.framing}
+        }))
+        await process.stdin.drain()
+
+        response = await line_framing.read(process.stdout)
+        if response is None or response.get("result") != self.framing:
+            raise RuntimeError(f"Framing negotiation failed: {response}")
+        self._framing = get_framing(self.framing)
+
+    async def _start_node_process(self) -> None:
+        """Start the Node.js process if it is not running
+
+        Concurrent callers share a single startup, which also replays init() so
+        a respawned process carries on with the same session.
+        """
+        task = self._start_task
+        if task is None or task.done():
+            if self.node_process is not None and self.node_process.returncode is None:
+                return
+            task = self._start_task = asyncio.ensure_future(self._spawn_node_process())
+        # Shielded so a caller giving up does not cancel the startup for the others
+        await asyncio.shield(task)
+
+    async def _spawn_node_process(self) -> None:
+        """Spawn Node.js, negotiate framing, health check and restore the session"""
+        metrics = self.metrics
+        timer = Timer()
+        try:
+            if self.socket_path is not None:
+                self.node_process = await self._connect()
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *self.node_command(),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    limit=self.STREAM_LIMIT
                 )
-                
-                # Wait for ready signal
-                ready_signal = json.loads(self.node_process.stdout.readline())
-                if not ready_signal.get("ready"):
-                    stderr = self.node_process.stderr.read()
-                    raise RuntimeError(f"Node.js process failed to start: {stderr}")
-                
-                # Perform health check
-                health_check = await self._send_command("healthCheck", {}, skip_start=True)
-                if not health_check:
-                    raise RuntimeError("Node.js process health check failed")
-                    
-            except Exception as e:
-                stderr = ""
-                if self.node_process and self.node_process.stderr:
-                    stderr = self.node_process.stderr.read()
-                raise RuntimeError(f"Failed to start Node.js process: {str(e)}\nstderr: {stderr}")
-            
-    async def _send_command(self, method: str, params: Dict[str, Any], skip_start: bool = False) -> Any:
-        """Send command to Node.js process"""
+                # Spawned with all three pipes, so stdin and stdout are never None
+                self.node_process = cast(_NodeProcess, process)
+                self._stderr = StderrDrain(self.node_process.pid)
+                if self.node_process.stderr is not None:
+                    self._stderr.start(self.node_process.stderr)
+            self.requests_served = 0
+            timer.mark("spawn")
+
+            # Wait for ready signal
+            line = await self.node_process.stdout.readline()
+            ready_signal = json.loads(line) if line else {}
+            if not ready_signal.get("ready"):
+                self._discard_process()
+                stderr = await self._read_stderr()
+                raise RuntimeError(f"Node.js process failed to start: {stderr}")
+            timer.mark("ready")
+            if self.socket_path is not None:
+                # The daemon only reads payload files in its own directory; one
+                # that does not say where sends everything over the socket
+                oob = ready_signal.get("oob")
+                self.oob_threshold = oob["threshold"] if oob else None
+                if oob:
+                    self.oob_dir = oob["dir"]
+
+            self._framing = LineFraming()
+            if self.framing != JSON_LINES:
+                await self._negotiate_framing(self.node_process, ready_signal)
+                timer.mark("framing")
+
+            # From here on a single reader task owns stdout
+            self._reader_task = asyncio.ensure_future(self._read_responses(self.node_process))
+
+            # Perform health check
+            health_check = await self._send_command("healthCheck", {}, skip_start=True)
+            if not health_check:
+                raise RuntimeError("Node.js process health check failed")
+            timer.mark("health_check")
+
+            # A respawned process starts without a PrimusCoreTLS instance
+            if self._init_params is not None:
+                await self._send_command("init", self._init_params, skip_start=True)
+                timer.mark("init_replay")
+
+            if self._templates:
+                for template in list(self._templates.values()):
+                    await self._send_command(
+                        "registerTemplate", self._get_template_params(template), skip_start=True
+                    )
+                    self._registered_templates.add(template.id)
+                timer.mark("template_replay")
+
+            self._process_ready = True
+            if metrics is not None:
+                metrics.record_event("spawn")
+                metrics.startup_finished(timer)
+
+        except asyncio.CancelledError:
+            self._discard_process()
+            raise
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_event("spawn_failure")
+            stderr = ""
+            if self._discard_process() is not None:
+                stderr = await self._read_stderr()
+            raise RuntimeError(f"Failed to start Node.js process: {str(e)}\nstderr: {stderr}")
+
+    async def _connect(self) -> _SocketConnection:
+        """Connect to the daemon, retrying with backoff while it is (re)starting"""
+        delay = self.CONNECT_RETRY_DELAY
+        for _ in range(self.CONNECT_ATTEMPTS - 1):
+            try:
+                return await self._open_connection()
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(delay)
+                delay *= 2
+        return await self._open_connection()
+
+    async def _open_connection(self) -> _SocketConnection:
+        reader, writer = await asyncio.open_unix_connection(
+            self.socket_path, limit=self.STREAM_LIMIT
+        )
+        return _SocketConnection(reader, writer)
+
+    async def _send_command(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        skip_start: bool = False,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Send command to Node.js process
+
+        Waits at most timeout seconds (command_timeout if None). A command that
+        times out or is cancelled is abandoned without stopping the process.
+        """
+        if timeout is None:
+            timeout = self.command_timeout
         if not skip_start:
             await self._start_node_process()
-            
+
+        process = self.node_process
+        if process is None:
+            raise RuntimeError("Command failed: Node.js process is not running")
+        if method not in self.SERVICE_METHODS:
+            self.requests_served += 1
+
+        metrics = self.metrics
+        if metrics is not None:
+            return await self._send_instrumented(process, method, params, timeout, metrics)
+
+        request_id = next(self._request_ids)
         try:
-            # Send command
-            command = json.dumps({"method": method, "params": params}) + "\n"
-            self.node_process.stdin.write(command)
-            self.node_process.stdin.flush()
-            
-            # Read response
-            response = json.loads(self.node_process.stdout.readline())
-            
-            if "error" in response:
-                if "stack" in response:
-                    raise RuntimeError(f"{response['error']}\nStack: {response['stack']}")
-                raise RuntimeError(response["error"])
-                
-            return response["result"]
-            
-        except Exception as e:
-            # Kill process on error
-            if self.node_process:
-                self.node_process.terminate()
-                self.node_process = None
+            command, payload_file = self._encode_command(
+                {"id": request_id, "method": method, "params": params}
+            )
+        except (TypeError, ValueError) as e:
+            raise RuntimeError(f"Command failed: {str(e)}")
+
+        return self._unwrap_response(
+            await self._exchange(
+                process, request_id, method, command, timeout, payload_file=payload_file
+            )
+        )
+
+    def _encode_command(self, message: Dict[str, Any]) -> Tuple[bytes, Optional[str]]:
+        """Encode a command, moving it to a payload file if it exceeds oob_threshold
+
+        Returns the frame to write and the payload file to remove once the
+        command is done, if any. wrapper.js removes the file when it reads it.
+        """
+        body = dumps(message)
+        if self.oob_threshold is None or len(body) <= self.oob_threshold:
+            return self._framing.frame(body), None
+        try:
+            path = write_payload_file(self.oob_dir, body)
+        except OSError:
+            return self._framing.frame(body), None  # e.g. /dev/shm is full; the pipe still works
+        return self._framing.encode({"id": message["id"], "messageFile": path}), path
+
+    async def _send_instrumented(
+        self,
+        process: _NodeProcess,
+        method: str,
+        params: Dict[str, Any],
+        timeout: Optional[float],
+        metrics: WrapperMetrics
+    ) -> Any:
+        """_send_command, recording phase latencies, payload sizes and errors"""
+        timer = Timer()
+        request_id = next(self._request_ids)
+        try:
+            # "timing" asks wrapper.js to report how long the command ran in Node.js
+            command, payload_file = self._encode_command({
+                "id": request_id, "method": method, "params": params, "timing": True
+            })
+        except (TypeError, ValueError) as e:
+            metrics.record_error(method, "serialize")
             raise RuntimeError(f"Command failed: {str(e)}")
-            
-    async def init(self, app_id: str, app_secret: str) -> Dict[str, Any]:
-        """Initialize the SDK"""
+        timer.mark("serialize")
+
+        size = len(command) if payload_file is None else os.path.getsize(payload_file)
+        metrics.command_started(method, size)
+        error: Optional[str] = "transport"
+        try:
+            response = await self._exchange(
+                process, request_id, method, command, timeout, timer, payload_file
+            )
+            timer.mark("pipe")
+            node_ms = response.get("elapsedMs")
+            if node_ms is not None:
+                # What is left of the round trip is time spent in the pipes and event loops
+                timer.phases["node"] = node_ms / 1000
+                timer.phases["pipe"] = max(0.0, timer.phases["pipe"] - timer.phases["node"])
+            error = "reply" if "error" in response else None
+        except CommandTimeoutError:
+            error = "timeout"
+            raise
+        except asyncio.CancelledError:
+            error = "cancelled"
+            raise
+        finally:
+            metrics.command_finished(
+                method, timer, self._response_sizes.pop(request_id, None), error
+            )
+        return self._unwrap_response(response)
+
+    async def _exchange(
+        self,
+        process: _NodeProcess,
+        request_id: int,
+        method: str,
+        command: bytes,
+        timeout: Optional[float],
+        timer: Optional[Timer] = None,
+        payload_file: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Write an encoded command and wait for the response with its id"""
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            try:
+                async with self._get_write_lock():
+                    process.stdin.write(command)
+                    await process.stdin.drain()
+            except (OSError, RuntimeError) as e:
+                # The pipe is broken, so every other in-flight command is lost too
+                if self.node_process is process:
+                    self._handle_process_failure(str(e))
+                raise RuntimeError(f"Command failed: {str(e)}")
+            if timer is not None:
+                timer.mark("write")
+
+            try:
+                if timeout is None:
+                    return await future
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                self._abandon(process, request_id)
+                self._check_health(process)
+                raise CommandTimeoutError(
+                    f"Command failed: {method} timed out after {timeout} seconds"
+                )
+            except asyncio.CancelledError:
+                self._abandon(process, request_id)
+                raise
+        finally:
+            # Late replies to cancelled commands are dropped by the reader
+            self._pending.pop(request_id, None)
+            if payload_file is not None:
+                # Normally gone already, unless the process never got to read it
+                remove_payload_file(self.oob_dir, payload_file)
+
+    def _abandon(self, process: _NodeProcess, request_id: int) -> None:
+        """Tell wrapper.js to drop the reply of a command nobody waits for any more"""
+        if self.node_process is not process or process.stdin.is_closing():
+            return
+        try:
+            # A single synchronous write cannot interleave with other frames
+            process.stdin.write(self._framing.encode({
+                "method": "cancel", "params": {"id": request_id}
+            }))
+        except (OSError, RuntimeError):
+            pass  # A broken pipe is noticed by the next command or the reader
+
+    def _check_health(self, process: _NodeProcess) -> None:
+        """After a timeout, make sure the process still responds in the background"""
+        if self._health_task is not None and not self._health_task.done():
+            return
+        self._health_task = asyncio.ensure_future(self._probe_health(process))
+        self._health_task.add_done_callback(_consume_result)
+
+    async def _probe_health(self, process: _NodeProcess) -> None:
+        """Replace the process if it does not answer a healthCheck in time
+
+        A slow attestation only costs its own caller; a process whose event loop
+        is stuck would otherwise time out every command sent to it.
+        """
+        if self.node_process is not process:
+            return
+        try:
+            await self._send_command(
+                "healthCheck", {}, skip_start=True, timeout=self.HEALTH_CHECK_TIMEOUT
+            )
+        except CommandTimeoutError:
+            if self.node_process is process:
+                self._handle_process_failure("Node.js process stopped responding")
+
+    @staticmethod
+    def _unwrap_response(response: Dict[str, Any]) -> Any:
+        """Return a response's result, raising its error if it has one"""
+        if "error" in response:
+            if response.get("code") == "UNKNOWN_TENANT":
+                raise TenantEvictedError(f"Command failed: {response['error']}")
+            if "stack" in response:
+                raise RuntimeError(
+                    f"Command failed: {response['error']}\nStack: {response['stack']}"
+                )
+            raise RuntimeError(f"Command failed: {response['error']}")
+
+        return response["result"]
+
+    async def aclose(self) -> None:
+        """Shut down the Node.js process"""
+        for task in (self._start_task, self._health_task):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.wait([task])
+                _consume_result(task)
+        self._start_task = self._health_task = None
+
+        process = self._discard_process("Node.js process was closed")
+        if process is not None and process.returncode is None:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=self.SHUTDOWN_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+
+        if self._stderr is not None:
+            await self._stderr.aclose(self.STDERR_READ_TIMEOUT)
+
+    async def close(self) -> None:
+        """Alias of aclose()"""
+        await self.aclose()
+
+    async def __aenter__(self) -> "NodeWrapper":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def init(
+        self, app_id: str, app_secret: str, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Initialize the SDK
+
+        The parameters are remembered and replayed whenever the Node.js process
+        has to be respawned, so the session survives a crash.
+        """
         self.app_id = app_id
         self.app_secret = app_secret
-        return await self._send_command("init", {
-            "appId": app_id,
-            "appSecret": app_secret
-        })
+        params = {"appId": app_id, "appSecret": app_secret}
+        # A process started by this call must not first restore an older session
+        self._init_params = None
+        result: Dict[str, Any] = await self._send_command("init", params, timeout=timeout)
+        self._init_params = params
+        # Registered templates carry the old credentials; re-register on next use
+        self._registered_templates.clear()
+        return result
         
     async def encode_request(self, request: Dict[str, Any]) -> str:
-        """Encode request data"""
-        return await self._send_command("encodeRequest", {"request": request})
-        
-    async def encode_response(self, response: Dict[str, Any]) -> str:
-        """Encode response data"""
-        return await self._send_command("encodeResponse", {"response": response})
-        
+        """Encode request data (computed in Python, no Node.js round trip)"""
+        return encoding.encode_request(request)
+
+    async def encode_response(self, response: List[Dict[str, Any]]) -> str:
+        """Encode response data (computed in Python, no Node.js round trip)"""
+        return encoding.encode_response(response)
+
     async def encode_attestation(self, attestation: Dict[str, Any]) -> str:
-        """Encode attestation data"""
-        return await self._send_command("encodeAttestation", {"attestation": attestation})
-        
-    def _get_default_conditions(self, request: Dict[str, Any], user_address: str, template_id: str) -> Dict[str, Any]:
-        """Get default attestation conditions"""
-        if not self.app_id or not self.app_secret:
+        """Encode attestation data (computed in Python, no Node.js round trip)"""
+        return encoding.encode_attestation(attestation)
+
+    def _get_base_conditions(self, tenant: Optional[Tenant] = None) -> Dict[str, Any]:
+        """Get the default attestation conditions that don't depend on the request
+
+        They carry the credentials of tenant if given, else those of init().
+        """
+        if tenant is not None:
+            app_id, app_secret = tenant.app_id, tenant.app_secret
+        elif not self.app_id or not self.app_secret:
             raise RuntimeError("SDK not initialized. Call init() first.")
-            
-        # Extract host from URL
-        from urllib.parse import urlparse
-        host = urlparse(request["url"]).netloc
-        
+        else:
+            app_id, app_secret = self.app_id, self.app_secret
+
         return {
             "source": "source",
-            "requestid": f"test-{int(time.time())}",
+            "requestid": None,
             "padoUrl": "wss://api-dev.padolabs.org/algorithm-proxyV2",
             "proxyUrl": "wss://api-dev.padolabs.org/algoproxyV2",
             "basePort": "443",
-            "getdatatime": str(int(time.time() * 1000)),
+            "getdatatime": None,
             "credVersion": self.CRED_VERSION,
             "modelType": "proxytls",
-            "user": {
-                "userid": "test-user",
-                "address": user_address,
-                "token": "test-token"
-            },
+            "user": None,
             "authUseridHash": "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
             "appParameters": {
-                "appId": self.app_id,
+                "appId": app_id,
                 "appSignParameters": "{}",
-                "appSignature": self.app_secret,
+                "appSignature": app_secret,
                 "additionParams": ""
             },
             "reqType": "web",
-            "host": host,
-            "templateId": template_id,
+            "host": None,
+            "templateId": None,
             "PADOSERVERURL": "https://api-dev.padolabs.org",
             "padoExtensionVersion": "0.3.19",
             "sslCipher": "ECDHE-ECDSA-AES128-GCM-SHA256"
         }
-        
-    async def start_attestation(
+
+    def _get_default_conditions(
+        self,
+        request: Dict[str, Any],
+        user_address: str,
+        template_id: str,
+        base_conditions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Get default attestation conditions"""
+        if base_conditions is None:
+            base_conditions = self._get_base_conditions()
+
+        now = time.time()
+        conditions = dict(base_conditions)
+        conditions["requestid"] = f"test-{int(now)}"
+        conditions["getdatatime"] = str(int(now * 1000))
+        conditions["user"] = {
+            "userid": "test-user",
+            "address": user_address,
+            "token": "test-token"
+        }
+        # Extract host from URL
+        conditions["host"] = urlparse(request["url"]).netloc
+        conditions["templateId"] = template_id
+        return conditions
+
+    def _get_attestation_params(
         self,
         request: Dict[str, Any],
         response_resolves: List[Dict[str, Any]],
@@ -298,36 +1030,380 @@ process.stdin.on('data', async (data) => {
         att_mode: Optional[Dict[str, Any]] = None,
         att_conditions: Optional[Dict[str, Any]] = None,
         addition_params: Optional[Dict[str, Any]] = None,
-        template_id: str = "test-template"
+        template_id: str = "test-template",
+        base_conditions: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Start attestation process"""
+        """Build the startAttestation command parameters"""
         # Set default attestation mode if not provided
         if att_mode is None:
-            att_mode = {
-                "algorithmType": "proxytls",
-                "resultType": "web"
-            }
-            
+            att_mode = dict(DEFAULT_ATT_MODE)
+
         # Get default conditions and merge with provided conditions
-        default_conditions = self._get_default_conditions(request, user_address, template_id)
+        default_conditions = self._get_default_conditions(
+            request, user_address, template_id, base_conditions
+        )
         if att_conditions:
             default_conditions.update(att_conditions)
-            
-        return await self._send_command("startAttestation", {
+
+        return {
             "request": request,
             "responseResolves": response_resolves,
             "userAddress": user_address,
             "attMode": att_mode,
             "attConditions": default_conditions,
             "additionParams": addition_params
-        })
-        
-    async def verify_attestation(self, attestation: Dict[str, Any]) -> bool:
-        """Verify attestation"""
-        return await self._send_command("verifyAttestation", {"attestation": attestation})
-        
-    def __del__(self):
-        """Cleanup Node.js process"""
-        if self.node_process:
-            self.node_process.terminate()
-            self.node_process = None
+        }
+
+    async def start_attestation(
+        self,
+        request: Dict[str, Any],
+        response_resolves: List[Dict[str, Any]],
+        user_address: str = "0x0000000000000000000000000000000000000000",
+        att_mode: Optional[Dict[str, Any]] = None,
+        att_conditions: Optional[Dict[str, Any]] = None,
+        addition_params: Optional[Dict[str, Any]] = None,
+        template_id: str = "test-template",
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Start attestation process
+
+        timeout overrides the wrapper's command_timeout for this call. With a
+        tenant, the attestation runs under the tenant's app id instead of init()'s.
+        """
+        params = self.attestation_params(
+            request,
+            response_resolves,
+            user_address=user_address,
+            att_mode=att_mode,
+            att_conditions=att_conditions,
+            addition_params=addition_params,
+            template_id=template_id,
+            tenant=tenant
+        )
+        return await self.start_prepared_attestation(params, timeout=timeout, tenant=tenant)
+
+    def attestation_params(
+        self,
+        request: Dict[str, Any],
+        response_resolves: List[Dict[str, Any]],
+        user_address: str = "0x0000000000000000000000000000000000000000",
+        att_mode: Optional[Dict[str, Any]] = None,
+        att_conditions: Optional[Dict[str, Any]] = None,
+        addition_params: Optional[Dict[str, Any]] = None,
+        template_id: str = "test-template",
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """The startAttestation params start_attestation would send for these arguments
+
+        Lets a caller key or share an attestation before choosing who runs it;
+        start_prepared_attestation then sends them as they are.
+        """
+        return self._get_attestation_params(
+            request,
+            response_resolves,
+            user_address=user_address,
+            att_mode=att_mode,
+            att_conditions=att_conditions,
+            addition_params=addition_params,
+            template_id=template_id,
+            base_conditions=self._get_base_conditions(tenant)
+        )
+
+    async def start_prepared_attestation(
+        self,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Start an attestation from params built by attestation_params"""
+        return await self._attest("startAttestation", params, timeout, tenant)
+
+    async def _attest_item(
+        self, item: AttestationItem, base_conditions: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Start the attestation for a start_attestations item"""
+        request, response_resolves, options = _unpack_attestation_item(item)
+        timeout = options.pop("timeout", None)
+        tenant = options.pop("tenant", None)
+        if tenant is not None or base_conditions is None:
+            base_conditions = self._get_base_conditions(tenant)
+        params = self._get_attestation_params(
+            request, response_resolves, base_conditions=base_conditions, **options
+        )
+        return await self._attest("startAttestation", params, timeout, tenant)
+
+    def _batch_base_conditions(self) -> Optional[Dict[str, Any]]:
+        """Base conditions shared by a batch's items, None if init() was not called
+
+        Without init(), items without a tenant fail individually.
+        """
+        if not self.app_id or not self.app_secret:
+            return None
+        return self._get_base_conditions()
+
+    async def start_attestations(
+        self,
+        items: Sequence[AttestationItem],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """Start many attestations with at most max_concurrency in flight
+
+        Each item is a ``(request, response_resolves)`` or
+        ``(request, response_resolves, options)`` tuple, where options holds
+        start_attestation keyword arguments. Results come back in input order;
+        a failed item yields its exception instead of failing the batch.
+        """
+        base_conditions = self._batch_base_conditions()
+        if not items:
+            return []
+        await self._start_node_process()
+
+        attest = functools.partial(self._attest_item, base_conditions=base_conditions)
+        return await run_bounded(attest, items, max_concurrency)
+
+    async def stream_attestations(
+        self,
+        items: Union[AsyncIterable[AttestationItem], Iterable[AttestationItem]],
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        ordered: bool = False
+    ) -> AsyncIterator[Tuple[AttestationItem, Union[Dict[str, Any], BaseException]]]:
+        """Start attestations for a stream of items, yielding ``(item, result)`` pairs
+
+        Items are start_attestations items, pulled from an async (or plain)
+        iterable only while fewer than concurrency attestations are running.
+        Pairs come in completion order, or in input order if ordered; a failed
+        item yields its exception. Stopping early cancels the running attestations.
+        """
+        base_conditions = self._batch_base_conditions()
+        attest = functools.partial(self._attest_item, base_conditions=base_conditions)
+        async for pair in stream_bounded(attest, items, concurrency, ordered):
+            yield pair
+
+    @staticmethod
+    def _template_key(template: AttestationTemplate, tenant: Optional[Tenant]) -> str:
+        """The id a template is registered under, one registration per tenant"""
+        return template.id if tenant is None else f"{template.id}@{tenant.app_id}"
+
+    def _get_template_params(
+        self, template: AttestationTemplate, tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Build the registerTemplate command parameters
+
+        Everything but the per-call requestid and getdatatime conditions (and
+        user address, if a call overrides it) is resolved here, once.
+        """
+        conditions = self._get_base_conditions(tenant)
+        conditions["user"] = {
+            "userid": "test-user",
+            "address": template.user_address,
+            "token": "test-token"
+        }
+        conditions["host"] = template.host
+        conditions["templateId"] = template.template_id
+        if template.att_conditions:
+            conditions.update(template.att_conditions)
+
+        return {
+            "id": self._template_key(template, tenant),
+            "request": template.request,
+            "responseResolves": template.response_resolves,
+            "userAddress": template.user_address,
+            "attMode": (
+                template.att_mode if template.att_mode is not None else dict(DEFAULT_ATT_MODE)
+            ),
+            "attConditions": conditions,
+            "additionParams": template.addition_params
+        }
+
+    async def register_template(
+        self,
+        template: AttestationTemplate,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> None:
+        """Register a template with Node.js ahead of its first use
+
+        Optional, as start_template_attestation registers templates as needed.
+        Templates are registered again whenever the Node.js process respawns;
+        those of a tenant on the tenant's next use of them.
+        """
+        key = self._template_key(template, tenant)
+        params = self._get_template_params(template, tenant)
+        await self._send_command("registerTemplate", params, timeout=timeout)
+        if tenant is None:
+            self._templates[key] = template
+        self._registered_templates.add(key)
+
+    async def start_template_attestation(
+        self,
+        template: AttestationTemplate,
+        url_params: Optional[Dict[str, Any]] = None,
+        user_address: Optional[str] = None,
+        request_id: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Start an attestation from a template, sending only the per-call deltas
+
+        url_params fills the template URL's placeholders, user_address and
+        request_id override the template's, and request entries (e.g. a body)
+        replace the template request's. The getdatatime condition and, unless
+        given, the request id are set by Node.js as start_attestation would.
+        """
+        key = self._template_key(template, tenant)
+        if key not in self._registered_templates:
+            await self.register_template(template, timeout=timeout, tenant=tenant)
+
+        params = _template_call_params(template, url_params, user_address, request_id, request)
+        params["template"] = key
+        return await self._attest("startTemplateAttestation", params, timeout, tenant)
+
+    async def _attest(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        timeout: Optional[float],
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Send an attestation command, joining an identical one in flight if single_flight is on"""
+        attestation: Dict[str, Any]
+        if self._single_flight is None:
+            attestation = await self._send_as(tenant, method, params, timeout)
+        else:
+            tenant_id = tenant.app_id if tenant is not None else None
+            attestation = await self._single_flight.run(
+                (method, tenant_id, self.single_flight_key(params)),
+                functools.partial(self._send_as, tenant, method, params, timeout)
+            )
+        return attestation
+
+    async def _send_as(
+        self,
+        tenant: Optional[Tenant],
+        method: str,
+        params: Dict[str, Any],
+        timeout: Optional[float]
+    ) -> Any:
+        """_send_command on the instance of tenant, or the init() one without a tenant
+
+        Until the tenant is known to be live in Node.js, commands carry its
+        secret so Node.js can initialize it along the way. Once it is, they carry
+        only the app id, and a command for a tenant Node.js has since evicted is
+        sent again with the secret.
+        """
+        if tenant is None:
+            return await self._send_command(method, params, timeout=timeout)
+
+        params = dict(params, tenant=tenant.app_id)
+        if tenant.app_id in self._ready_tenants:
+            try:
+                return await self._send_command(method, params, timeout=timeout)
+            except TenantEvictedError:
+                self._ready_tenants.discard(tenant.app_id)
+                if self.metrics is not None:
+                    self.metrics.record_event("tenant_reinit")
+
+        result = await self._send_command(
+            method, dict(params, tenantSecret=tenant.app_secret), timeout=timeout
+        )
+        self._ready_tenants.add(tenant.app_id)
+        return result
+
+    async def verify_attestation(
+        self,
+        attestation: VerifiableAttestation,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> bool:
+        """Verify attestation, with the tenant's instance if given
+
+        attestation may be an AttestationRef, whose stored bytes are sent as is.
+        """
+        params = {"attestation": _verify_payload(attestation)}
+        if self.verify_cache is None:
+            result: bool = await self._send_as(tenant, "verifyAttestation", params, timeout)
+            return result
+
+        key = _verify_cache_key(attestation)
+        verified: Optional[bool] = self.verify_cache.get(key)
+        if verified is None:
+            verified = await self._send_as(tenant, "verifyAttestation", params, timeout)
+            self.verify_cache.put(key, verified)
+        return verified
+
+    async def verify_attestations(
+        self,
+        attestations: Sequence[VerifiableAttestation],
+        chunk_size: int = VERIFY_CHUNK_SIZE,
+        max_concurrency: int = VERIFY_CHUNK_CONCURRENCY,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> List[bool]:
+        """Verify many attestations, sending chunk_size of them per Node.js message
+
+        Malformed attestations verify as False instead of raising. timeout
+        applies to each chunk. Attestations may be AttestationRefs or RawJSON.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if not attestations:
+            return []
+
+        async def verify_chunk(chunk: Sequence[VerifiableAttestation]) -> List[bool]:
+            payload = [_verify_payload(attestation) for attestation in chunk]
+            verified: List[bool] = await self._send_as(
+                tenant, "verifyAttestations", {"attestations": payload}, timeout
+            )
+            return verified
+
+        if self.verify_cache is None:
+            await self._start_node_process()
+            return await _verify_in_chunks(verify_chunk, attestations, chunk_size, max_concurrency)
+
+        # Only the cache misses go to Node.js
+        keys = [_verify_cache_key(attestation) for attestation in attestations]
+        cached: List[Optional[bool]] = [self.verify_cache.get(key) for key in keys]
+        misses = [index for index, verified in enumerate(cached) if verified is None]
+        verified_misses: List[bool] = []
+        if misses:
+            await self._start_node_process()
+            verified_misses = await _verify_in_chunks(
+                verify_chunk, [attestations[index] for index in misses], chunk_size, max_concurrency
+            )
+            for index, verified in zip(misses, verified_misses):
+                self.verify_cache.put(keys[index], verified)
+        # Every miss has its result now, so the list holds no None
+        filled = iter(verified_misses)
+        return [next(filled) if verified is None else verified for verified in cached]
+
+    @property
+    def verify_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Verification cache hit/miss/eviction counters, or None if the cache is off"""
+        if self.verify_cache is None:
+            return None
+        return self.verify_cache.stats()
+
+    @property
+    def single_flight_stats(self) -> Optional[Dict[str, Any]]:
+        """Started/shared attestation counters, or None if single_flight is off"""
+        if self._single_flight is None:
+            return None
+        return self._single_flight.stats()
+
+    async def stats(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Resource use of the Node.js process
+
+        Returns Node.js' process.memoryUsage() figures in bytes (rss, heapTotal,
+        heapUsed, external, arrayBuffers), uptime in seconds and the number of
+        Tenant instances held (tenants) and clients connected (clients, 1 unless
+        it is a daemon), plus the pid and requests_served since the process
+        started, or since connecting to a daemon. Answering also shows the
+        process is responsive, so this doubles as a health check.
+        """
+        result = await self._send_command("stats", {}, timeout=timeout)
+        process = self.node_process
+        if process is not None and process.pid is not None:
+            result["pid"] = process.pid
+        return dict(result, requests_served=self.requests_served)
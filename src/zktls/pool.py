@@ -0,0 +1,462 @@
+"""Pool of Node.js wrapper processes for ZK TLS SDK"""
+import asyncio
+import functools
+import os
+import time
+from typing import (
+    Any, AsyncIterable, AsyncIterator, Callable, Dict, Hashable, Iterable, List, Optional, Sequence,
+    Set, Tuple, Union
+)
+
+from . import encoding
+from .cache import SingleFlight
+from .metrics import WrapperMetrics
+from .template import AttestationTemplate
+from .tenant import Tenant
+from .node_wrapper import (
+    DEFAULT_BATCH_CONCURRENCY,
+    DEFAULT_OOB_THRESHOLD,
+    VERIFY_CHUNK_SIZE,
+    AttestationItem,
+    CommandTimeoutError,
+    NodeWrapper,
+    VerifiableAttestation,
+    _template_call_params,
+    _unpack_attestation_item,
+    attestation_key,
+    _verify_in_chunks,
+    run_bounded,
+    stream_bounded,
+)
+
+
+def _tenant_id(tenant: Optional[Tenant]) -> Optional[str]:
+    """The app id of tenant, distinguishing single-flight keys of different tenants"""
+    return tenant.app_id if tenant is not None else None
+
+
+class _PoolWorker:
+    """A pooled NodeWrapper and its dispatch bookkeeping"""
+
+    __slots__ = ("wrapper", "load", "unhealthy_until", "recycling", "stats")
+
+    def __init__(self, wrapper: NodeWrapper):
+        self.wrapper = wrapper
+        self.load = 0  # Commands dispatched and not yet finished
+        self.unhealthy_until = 0.0  # Monotonic time before which the worker is skipped
+        self.recycling = False  # A replacement is being started
+        self.stats: Optional[Dict[str, Any]] = None  # Result of the last supervisor probe
+
+    def is_healthy(self, now: float) -> bool:
+        return self.unhealthy_until <= now
+
+
+class NodeWorkerPool:
+    """Pool of NodeWrapper workers, each owning its own Node.js process
+
+    Optionally supervised: workers are probed periodically and recycled after
+    serving a number of requests, when their memory grows past a threshold or
+    when they stop responding while idle. A recycled worker's replacement is
+    started and initialized before it takes the old worker's place, and the
+    old process is shut down once its in-flight commands have finished, so
+    capacity never drops.
+    """
+
+    # How long a worker whose process died is kept out of rotation
+    UNHEALTHY_COOLDOWN = 5.0
+    # How long the supervisor's probe of a worker may take
+    HEALTH_CHECK_TIMEOUT = 10.0
+    # How long a replaced worker may take to finish its in-flight commands
+    DRAIN_TIMEOUT = 60.0
+    DRAIN_POLL_INTERVAL = 0.05
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        metrics: Optional[WrapperMetrics] = None,
+        command_timeout: Optional[float] = None,
+        max_requests: Optional[int] = None,
+        max_memory_mb: Optional[float] = None,
+        health_check_interval: Optional[float] = None,
+        max_old_space_size: Optional[int] = None,
+        single_flight: bool = False,
+        single_flight_key: Callable[[Dict[str, Any]], Hashable] = attestation_key,
+        max_tenants: int = 64,
+        oob_threshold: Optional[int] = DEFAULT_OOB_THRESHOLD
+    ):
+        """Create the workers and verify installation
+
+        A metrics registry, if given, is shared by all workers; command_timeout
+        is each worker's default command timeout.
+
+        max_requests recycles a worker's process after it has served that many
+        requests. With health_check_interval, every that many seconds after
+        init() each worker is probed for its resource use (see worker_stats());
+        one whose RSS exceeds max_memory_mb MiB, or that does not answer while
+        idle, is recycled. max_old_space_size caps each worker's V8 heap in MiB.
+
+        single_flight coalesces concurrent identical attestations across all
+        workers (see NodeWrapper). max_tenants caps the Tenant instances each
+        worker's process keeps; a tenant is initialized on each worker it uses.
+        oob_threshold is each worker's payload file threshold (see NodeWrapper).
+        """
+        if size is None:
+            size = os.cpu_count() or 1
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        if max_requests is not None and max_requests < 1:
+            raise ValueError("max_requests must be at least 1")
+        if health_check_interval is not None and health_check_interval <= 0:
+            raise ValueError("health_check_interval must be positive")
+        if max_memory_mb is not None and health_check_interval is None:
+            raise ValueError("max_memory_mb needs a health_check_interval")
+
+        self.size = size
+        self.app_id: Optional[str] = None
+        self.app_secret: Optional[str] = None
+        self.metrics = metrics
+        self.max_requests = max_requests
+        self.max_memory_mb = max_memory_mb
+        self.health_check_interval = health_check_interval
+        self.single_flight_key = single_flight_key
+        self._single_flight = SingleFlight() if single_flight else None
+        self._wrapper_options: Dict[str, Any] = {
+            "metrics": metrics,
+            "command_timeout": command_timeout,
+            "max_old_space_size": max_old_space_size,
+            "max_tenants": max_tenants,
+            "oob_threshold": oob_threshold,
+        }
+        self._workers: List[_PoolWorker] = [
+            _PoolWorker(NodeWrapper(**self._wrapper_options)) for _ in range(size)
+        ]
+        self._next = 0  # Rotates tie-breaking between equally loaded workers
+        self._supervisor_task: Optional[asyncio.Future] = None
+        self._recycle_tasks: Set[asyncio.Future] = set()
+
+    @property
+    def workers(self) -> List[NodeWrapper]:
+        """The pooled NodeWrapper instances"""
+        return [worker.wrapper for worker in self._workers]
+
+    def _pick_worker(self) -> _PoolWorker:
+        """Pick the least-loaded healthy worker"""
+        now = time.monotonic()
+        count = len(self._workers)
+        order = [self._workers[(self._next + i) % count] for i in range(count)]
+        self._next = (self._next + 1) % count
+
+        candidates = [worker for worker in order if worker.is_healthy(now)] or order
+        return min(candidates, key=lambda worker: worker.load)
+
+    async def _dispatch(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Run a NodeWrapper method on the least-loaded healthy worker"""
+        worker = self._pick_worker()
+        worker.load += 1
+        try:
+            return await getattr(worker.wrapper, method)(*args, **kwargs)
+        except RuntimeError:
+            # A lost process (as opposed to an error reply) takes the worker out of rotation
+            if worker.wrapper.node_process is None:
+                worker.unhealthy_until = time.monotonic() + self.UNHEALTHY_COOLDOWN
+            raise
+        finally:
+            worker.load -= 1
+            if (
+                self.max_requests is not None
+                and worker.wrapper.requests_served >= self.max_requests
+            ):
+                self._schedule_recycle(worker)
+
+    def _schedule_recycle(self, worker: _PoolWorker) -> None:
+        """Recycle a worker in the background unless that is already under way"""
+        if worker.recycling or worker not in self._workers:
+            return
+        worker.recycling = True
+        task = asyncio.ensure_future(self._recycle(worker))
+        self._recycle_tasks.add(task)
+        task.add_done_callback(self._recycle_tasks.discard)
+
+    async def _recycle(self, worker: _PoolWorker) -> None:
+        """Replace a worker with a freshly started one, then retire the old process"""
+        wrapper: Optional[NodeWrapper] = None
+        try:
+            wrapper = await NodeWrapper.create(**self._wrapper_options)
+            if self.app_id is not None and self.app_secret is not None:
+                await wrapper.init(self.app_id, self.app_secret)
+            else:
+                await wrapper._start_node_process()
+        except BaseException as e:
+            # Keep the old worker; the next trigger tries again
+            worker.recycling = False
+            if wrapper is not None:
+                await wrapper.aclose()
+            if not isinstance(e, Exception):
+                raise
+            if self.metrics is not None:
+                self.metrics.record_event("recycle_failure")
+            return
+
+        self._workers[self._workers.index(worker)] = _PoolWorker(wrapper)
+        if self.metrics is not None:
+            self.metrics.record_event("recycle")
+        try:
+            deadline = time.monotonic() + self.DRAIN_TIMEOUT
+            while worker.load > 0 and time.monotonic() < deadline:
+                await asyncio.sleep(self.DRAIN_POLL_INTERVAL)
+        finally:
+            await worker.wrapper.aclose()
+
+    async def _supervise(self, interval: float) -> None:
+        """Probe every worker each interval seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.gather(*(self._probe_worker(worker) for worker in list(self._workers)))
+
+    async def _probe_worker(self, worker: _PoolWorker) -> None:
+        """Record a worker's stats, recycling it if it is hung or over its memory cap"""
+        if worker.recycling:
+            return
+        idle = worker.load == 0
+        try:
+            worker.stats = await worker.wrapper.stats(timeout=self.HEALTH_CHECK_TIMEOUT)
+        except CommandTimeoutError:
+            # A busy worker may just be stuck in a long synchronous call
+            if idle:
+                self._schedule_recycle(worker)
+            return
+        except RuntimeError:
+            return  # A lost process is respawned by its wrapper
+
+        if (
+            self.max_memory_mb is not None
+            and worker.stats["rss"] > self.max_memory_mb * 1024 * 1024
+        ):
+            self._schedule_recycle(worker)
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        """Per-worker pid, requests served, load and, once probed, memory use
+
+        The memory figures are those of the supervisor's last probe (see
+        NodeWrapper.stats); without a health_check_interval they are absent.
+        """
+        stats = []
+        for worker in self._workers:
+            process = worker.wrapper.node_process
+            stats.append(dict(
+                worker.stats or {},
+                pid=process.pid if process is not None else None,
+                requests_served=worker.wrapper.requests_served,
+                load=worker.load
+            ))
+        return stats
+
+    async def init(self, app_id: str, app_secret: str) -> Any:
+        """Initialize the SDK on every worker in parallel"""
+        self.app_id = app_id
+        self.app_secret = app_secret
+        results = await asyncio.gather(
+            *(worker.wrapper.init(app_id, app_secret) for worker in self._workers),
+            return_exceptions=True
+        )
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise RuntimeError(
+                f"Failed to initialize {len(errors)} of {len(results)} workers: {str(errors[0])}"
+            )
+        if self.health_check_interval is not None and self._supervisor_task is None:
+            self._supervisor_task = asyncio.ensure_future(
+                self._supervise(self.health_check_interval)
+            )
+        return results[0]
+
+    async def encode_request(self, request: Dict[str, Any]) -> str:
+        """Encode request data (computed in Python, no worker involved)"""
+        return encoding.encode_request(request)
+
+    async def encode_response(self, response: List[Dict[str, Any]]) -> str:
+        """Encode response data (computed in Python, no worker involved)"""
+        return encoding.encode_response(response)
+
+    async def encode_attestation(self, attestation: Dict[str, Any]) -> str:
+        """Encode attestation data (computed in Python, no worker involved)"""
+        return encoding.encode_attestation(attestation)
+
+    async def start_attestation(
+        self,
+        request: Dict[str, Any],
+        response_resolves: List[Dict[str, Any]],
+        user_address: str = "0x0000000000000000000000000000000000000000",
+        att_mode: Optional[Dict[str, Any]] = None,
+        att_conditions: Optional[Dict[str, Any]] = None,
+        addition_params: Optional[Dict[str, Any]] = None,
+        template_id: str = "test-template",
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Start attestation process on the least-loaded worker"""
+        attestation: Dict[str, Any]
+        if self._single_flight is None:
+            attestation = await self._dispatch(
+                "start_attestation",
+                request,
+                response_resolves,
+                user_address=user_address,
+                att_mode=att_mode,
+                att_conditions=att_conditions,
+                addition_params=addition_params,
+                template_id=template_id,
+                timeout=timeout,
+                tenant=tenant
+            )
+            return attestation
+
+        # Workers share the credentials, so any of them builds the params all would send
+        params = self._workers[0].wrapper.attestation_params(
+            request,
+            response_resolves,
+            user_address=user_address,
+            att_mode=att_mode,
+            att_conditions=att_conditions,
+            addition_params=addition_params,
+            template_id=template_id,
+            tenant=tenant
+        )
+        attestation = await self._single_flight.run(
+            ("startAttestation", _tenant_id(tenant), self.single_flight_key(params)),
+            functools.partial(
+                self._dispatch, "start_prepared_attestation", params, timeout=timeout, tenant=tenant
+            )
+        )
+        return attestation
+
+    async def _attest_item(self, item: AttestationItem) -> Dict[str, Any]:
+        """Start the attestation for a start_attestations item on the least-loaded worker"""
+        request, response_resolves, options = _unpack_attestation_item(item)
+        return await self.start_attestation(request, response_resolves, **options)
+
+    async def start_attestations(
+        self,
+        items: Sequence[AttestationItem],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """Start many attestations across the workers (see NodeWrapper.start_attestations)"""
+        return await run_bounded(self._attest_item, items, max_concurrency)
+
+    async def stream_attestations(
+        self,
+        items: Union[AsyncIterable[AttestationItem], Iterable[AttestationItem]],
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        ordered: bool = False
+    ) -> AsyncIterator[Tuple[AttestationItem, Union[Dict[str, Any], BaseException]]]:
+        """Stream attestations across the workers (see NodeWrapper.stream_attestations)"""
+        async for pair in stream_bounded(self._attest_item, items, concurrency, ordered):
+            yield pair
+
+    async def register_template(
+        self,
+        template: AttestationTemplate,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> None:
+        """Register a template with every worker ahead of its first use"""
+        await asyncio.gather(*(
+            worker.wrapper.register_template(template, timeout=timeout, tenant=tenant)
+            for worker in self._workers
+        ))
+
+    async def start_template_attestation(
+        self,
+        template: AttestationTemplate,
+        url_params: Optional[Dict[str, Any]] = None,
+        user_address: Optional[str] = None,
+        request_id: Optional[str] = None,
+        request: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> Dict[str, Any]:
+        """Start an attestation from a template on the least-loaded worker"""
+        call = functools.partial(
+            self._dispatch,
+            "start_template_attestation",
+            template,
+            url_params=url_params,
+            user_address=user_address,
+            request_id=request_id,
+            request=request,
+            timeout=timeout,
+            tenant=tenant
+        )
+        attestation: Dict[str, Any]
+        if self._single_flight is None:
+            attestation = await call()
+        else:
+            params = _template_call_params(template, url_params, user_address, request_id, request)
+            attestation = await self._single_flight.run(
+                ("startTemplateAttestation", _tenant_id(tenant), self.single_flight_key(params)),
+                call
+            )
+        return attestation
+
+    @property
+    def single_flight_stats(self) -> Optional[Dict[str, Any]]:
+        """Started/shared attestation counters, or None if single_flight is off"""
+        if self._single_flight is None:
+            return None
+        return self._single_flight.stats()
+
+    async def verify_attestation(
+        self,
+        attestation: VerifiableAttestation,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> bool:
+        """Verify attestation on the least-loaded worker"""
+        verified: bool = await self._dispatch(
+            "verify_attestation", attestation, timeout=timeout, tenant=tenant
+        )
+        return verified
+
+    async def verify_attestations(
+        self,
+        attestations: Sequence[VerifiableAttestation],
+        chunk_size: int = VERIFY_CHUNK_SIZE,
+        timeout: Optional[float] = None,
+        tenant: Optional[Tenant] = None
+    ) -> List[bool]:
+        """Verify many attestations, spreading chunks of them over the workers"""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        async def verify_chunk(chunk: Sequence[VerifiableAttestation]) -> List[bool]:
+            verified: List[bool] = await self._dispatch(
+                "verify_attestations", chunk, chunk_size=chunk_size, timeout=timeout, tenant=tenant
+            )
+            return verified
+
+        # Keep a couple of chunks queued per worker so none sits idle between round trips
+        return await _verify_in_chunks(verify_chunk, attestations, chunk_size, 2 * self.size)
+
+    async def aclose(self) -> None:
+        """Stop supervising and shut down every worker process"""
+        tasks = list(self._recycle_tasks)
+        if self._supervisor_task is not None:
+            tasks.append(self._supervisor_task)
+            self._supervisor_task = None
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            # Cancelled recycles close the processes they started or were retiring
+            await asyncio.wait(tasks)
+        await asyncio.gather(*(worker.wrapper.aclose() for worker in self._workers))
+
+    async def close(self) -> None:
+        """Alias of aclose()"""
+        await self.aclose()
+
+    async def __aenter__(self) -> "NodeWorkerPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
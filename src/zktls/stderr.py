@@ -0,0 +1,119 @@
+"""Draining of the Node.js process stderr"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Deque, Optional
+
+logger = logging.getLogger("zktls.node")
+
+
+class StderrDrain:
+    """Reads a Node.js process's stderr for as long as the process runs
+
+    Nothing waits for the process to exit before reading, so a chatty process
+    never fills the pipe and blocks on its next write. The most recent lines are
+    kept in a ring buffer, to be attached to errors, and every line is logged to
+    the "zktls.node" logger. Logging is rate limited to rate lines per second,
+    with bursts of up to burst lines. Lines over the limit are counted and the
+    count is logged with the next line that gets through.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        pid: Optional[int] = None,
+        max_lines: int = 200,
+        max_line_length: int = 2000,
+        rate: float = 10.0,
+        burst: int = 50,
+        level: int = logging.WARNING
+    ):
+        self.pid = pid
+        self.lines: Deque[str] = collections.deque(maxlen=max_lines)
+        self.max_line_length = max_line_length
+        self.rate = rate
+        self.burst = burst
+        self.level = level
+        self.suppressed = 0  # Lines not logged since the last logged one
+        self.task: Optional[asyncio.Future] = None
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+
+    def start(self, stream: asyncio.StreamReader) -> None:
+        """Start reading stream in the background until it ends"""
+        self.task = asyncio.ensure_future(self._drain(stream))
+
+    async def _drain(self, stream: asyncio.StreamReader) -> None:
+        partial = b""
+        skipping = False  # Dropping the rest of an overlong line
+        try:
+            while True:
+                chunk = await stream.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                *complete, partial = (partial + chunk).split(b"\n")
+                if skipping and complete:
+                    complete.pop(0)
+                    skipping = False
+                for line in complete:
+                    self._add(line)
+                if skipping:
+                    partial = b""
+                elif len(partial) > self.max_line_length:
+                    # Keep the start of an overlong line rather than buffer it whole
+                    self._add(partial)
+                    partial = b""
+                    skipping = True
+        except OSError:
+            pass
+        finally:
+            if partial:
+                self._add(partial)
+
+    def _add(self, line: bytes) -> None:
+        text = line.decode(errors="replace").rstrip()
+        if not text:
+            return
+        if len(text) > self.max_line_length:
+            text = text[:self.max_line_length] + "..."
+        self.lines.append(text)
+        if logger.isEnabledFor(self.level):
+            self._log(text)
+
+    def _log(self, text: str) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens < 1:
+            self.suppressed += 1
+            return
+        self._tokens -= 1
+        if self.suppressed:
+            logger.log(self.level, "Node.js[%s] stderr: %d lines not logged (rate limited)",
+                       self.pid, self.suppressed)
+            self.suppressed = 0
+        logger.log(self.level, "Node.js[%s] stderr: %s", self.pid, text)
+
+    def tail(self, lines: int = 20) -> str:
+        """The last lines read, oldest first"""
+        recent = list(self.lines)[-lines:] if lines > 0 else []
+        return "\n".join(recent)
+
+    async def finish(self, timeout: float) -> str:
+        """Wait up to timeout seconds for the stream to end, then return the tail
+
+        Bounded, unlike reading the stream to its end, so a process that keeps
+        its stderr open cannot hang the caller.
+        """
+        if self.task is not None and not self.task.done():
+            await asyncio.wait([self.task], timeout=timeout)
+        return self.tail()
+
+    async def aclose(self, timeout: float) -> None:
+        """Let the drain finish for up to timeout seconds, then stop it"""
+        await self.finish(timeout)
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.wait([self.task])
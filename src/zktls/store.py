@@ -0,0 +1,516 @@
+"""Append-only on-disk store of attestations"""
+import array
+import asyncio
+import bisect
+import functools
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from .framing import RawJSON, dumps, loads
+
+# Index fields matched by equality; records are also indexed by time
+KEY_FIELDS = ("request_id", "host", "template_id", "user_address")
+# Index entry layout after offset and length, as saved in .idx files
+_ENTRY_FIELDS = KEY_FIELDS + ("time",)
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# A placed record awaiting its write: segment, offset, body, index keys, waiter
+_PendingRecord = Tuple[int, int, bytes, Dict[str, Any], "asyncio.Future[AttestationRef]"]
+
+
+def attestation_keys(attestation: Dict[str, Any]) -> Dict[str, Any]:
+    """The index keys of an attestation
+
+    request_id and template_id come from its attConditions (a JSON string in
+    SDK attestations), host from its request URL, user_address from its
+    recipient (lowercased) and time from its timestamp, in milliseconds.
+    Missing or malformed fields give None.
+    """
+    conditions = attestation.get("attConditions")
+    if isinstance(conditions, str):
+        try:
+            conditions = json.loads(conditions)
+        except ValueError:
+            conditions = None
+    if not isinstance(conditions, dict):
+        conditions = {}
+
+    request = attestation.get("request")
+    url = request.get("url") if isinstance(request, dict) else None
+    recipient = attestation.get("recipient")
+    try:
+        timestamp: Optional[int] = int(attestation["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        timestamp = None
+
+    return {
+        "request_id": conditions.get("requestid"),
+        "host": urlparse(url).netloc if isinstance(url, str) else None,
+        "template_id": conditions.get("templateId"),
+        "user_address": recipient.lower() if isinstance(recipient, str) else None,
+        "time": timestamp,
+    }
+
+
+def _encode(attestation: Dict[str, Any]) -> bytes:
+    # Canonical, as in cache.canonical_digest, so a record's SHA-256 is that digest
+    return json.dumps(
+        attestation, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+class AttestationRef:
+    """Location of one stored attestation
+
+    Can be passed to NodeWrapper.verify_attestation and verify_attestations
+    (and the pool's) in place of the attestation: its stored bytes are spliced
+    into the command as they are.
+    """
+
+    __slots__ = ("store", "segment", "offset", "length")
+
+    def __init__(self, store: "AttestationStore", segment: int, offset: int, length: int):
+        self.store = store
+        self.segment = segment
+        self.offset = offset  # Of the JSON body, past the record header
+        self.length = length
+
+    def read(self) -> bytes:
+        """The stored JSON bytes"""
+        return self.store.read(self)
+
+    def load(self) -> Dict[str, Any]:
+        """The stored attestation"""
+        attestation: Dict[str, Any] = loads(self.read())
+        return attestation
+
+    def raw(self) -> RawJSON:
+        """The stored bytes, to splice into a message unparsed"""
+        return RawJSON(self.read())
+
+    def digest(self) -> str:
+        """cache.canonical_digest of the attestation, computed from its bytes"""
+        return hashlib.sha256(self.read()).hexdigest()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, AttestationRef):
+            return NotImplemented
+        return (self.store, self.segment, self.offset) == (other.store, other.segment, other.offset)
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.segment, self.offset))
+
+    def __repr__(self) -> str:
+        return f"AttestationRef(segment={self.segment}, offset={self.offset}, length={self.length})"
+
+
+class AttestationStore:
+    """Append-only log of attestations, indexed for lookup
+
+    Attestations go to segment files (00000001.log, ...) in directory, each
+    record a 4-byte big-endian length followed by the attestation as compact
+    canonical JSON. A segment is closed once it reaches segment_size bytes.
+    Its index is then written next to it (.idx), so opening the store loads
+    indexes instead of scanning the logs; only records past the last index
+    written are scanned, and a torn record at the very end is cut off.
+
+    Appends are group committed: records are written and fsynced in batches,
+    with everything appended while one batch is syncing going into the next.
+    append() returns once its record is durable. flush_delay, if given, holds
+    each batch open that many seconds to gather more records.
+
+    Lookups go through in-memory indexes: a dict per key field and a sorted
+    list of times, bisected for ranges. Records are read through mmap.
+    """
+
+    HEADER = struct.Struct(">I")
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        flush_delay: float = 0.0
+    ):
+        if segment_size < 1:
+            raise ValueError("segment_size must be at least 1")
+        if flush_delay < 0:
+            raise ValueError("flush_delay must not be negative")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.flush_delay = flush_delay
+
+        # Record number -> location and time; time is -1 when unknown
+        self._segments = array.array("L")
+        self._offsets = array.array("Q")
+        self._lengths = array.array("L")
+        self._times = array.array("q")
+        self._keys: Dict[str, Dict[Any, List[int]]] = {field: {} for field in KEY_FIELDS}
+        self._time_keys: List[int] = []  # Sorted record times
+        self._time_records: List[int] = []  # Record numbers, in _time_keys order
+        # Index entries per segment not yet written to an .idx file
+        self._unsaved: Dict[int, List[List[Any]]] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+
+        self._pending: List[_PendingRecord] = []
+        self._flush_task: Optional[asyncio.Future] = None
+        self._file: Optional[BinaryIO] = None  # Append handle of the segment written last
+        self._file_segment: Optional[int] = None
+        self._failure: Optional[BaseException] = None
+        self._closed = False
+
+        self._load()
+
+    @classmethod
+    async def create(cls, directory: str, **kwargs: Any) -> "AttestationStore":
+        """Open a store without blocking the event loop on loading its indexes"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(cls, directory, **kwargs))
+
+    def _path(self, segment: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{segment:08d}{suffix}")
+
+    # Opening
+
+    def _load(self) -> None:
+        segments = sorted(
+            int(name[:-4]) for name in os.listdir(self.directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+        for segment in segments:
+            size = self._load_index(segment)
+            self._scan(segment, size, last=segment == segments[-1])
+
+        self._segment = segments[-1] if segments else 1
+        path = self._path(self._segment, ".log")
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _load_index(self, segment: int) -> int:
+        """Index a segment's records from its .idx file; returns the log size it covers"""
+        try:
+            with open(self._path(segment, ".idx"), "rb") as f:
+                saved = loads(f.read())
+        except (OSError, ValueError):
+            return 0
+        for offset, length, *keys in saved["records"]:
+            self._index(segment, offset, length, dict(zip(_ENTRY_FIELDS, keys)))
+        size: int = saved["size"]
+        return size
+
+    def _scan(self, segment: int, start: int, last: bool) -> None:
+        """Index the records of a segment past start, cutting off a torn tail"""
+        path = self._path(segment, ".log")
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        position = 0
+        while position < len(data):
+            body = position + self.HEADER.size
+            if body > len(data):
+                break
+            (length,) = self.HEADER.unpack_from(data, position)
+            if body + length > len(data):
+                break
+            try:
+                keys = attestation_keys(loads(data[body:body + length]))
+            except ValueError:
+                break
+            self._index(segment, start + body, length, keys)
+            self._unsaved.setdefault(segment, []).append(
+                self._entry(start + body, length, keys)
+            )
+            position = body + length
+
+        if position < len(data) and last:
+            # An append interrupted mid-write; its caller never got a ref
+            with open(path, "r+b") as f:
+                f.truncate(start + position)
+
+    # Indexing
+
+    @staticmethod
+    def _entry(offset: int, length: int, keys: Dict[str, Any]) -> List[Any]:
+        return [offset, length] + [keys.get(field) for field in _ENTRY_FIELDS]
+
+    def _index(self, segment: int, offset: int, length: int, keys: Dict[str, Any]) -> int:
+        record = len(self._offsets)
+        self._segments.append(segment)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        for field in KEY_FIELDS:
+            value = keys.get(field)
+            if value is not None:
+                self._keys[field].setdefault(value, []).append(record)
+
+        time = keys.get("time")
+        self._times.append(time if time is not None else -1)
+        if time is not None:
+            # Records mostly arrive in time order, making this an append
+            position = bisect.bisect_right(self._time_keys, time)
+            self._time_keys.insert(position, time)
+            self._time_records.insert(position, record)
+        return record
+
+    def _ref(self, record: int) -> AttestationRef:
+        return AttestationRef(
+            self, self._segments[record], self._offsets[record], self._lengths[record]
+        )
+
+    # Writing
+
+    async def append(
+        self, attestation: Dict[str, Any], keys: Optional[Dict[str, Any]] = None
+    ) -> AttestationRef:
+        """Store an attestation, returning its ref once it is on disk
+
+        keys overrides entries of attestation_keys(attestation), e.g. with the
+        conditions a start_attestation call was made with.
+        """
+        # Shielded: once placed, the record is written even if the caller gives up
+        return await asyncio.shield(self._place(attestation, keys))
+
+    async def append_many(self, attestations: Sequence[Dict[str, Any]]) -> List[AttestationRef]:
+        """Store several attestations, committed together"""
+        futures = [self._place(attestation, None) for attestation in attestations]
+        return list(await asyncio.shield(asyncio.gather(*futures)))
+
+    def _place(
+        self, attestation: Dict[str, Any], keys: Optional[Dict[str, Any]]
+    ) -> "asyncio.Future[AttestationRef]":
+        """Assign an attestation its place in the log and queue it for the flush task"""
+        if self._closed:
+            raise RuntimeError("Attestation store is closed")
+        if self._failure is not None:
+            raise RuntimeError(f"Attestation store failed: {self._failure}")
+
+        body = _encode(attestation)
+        index_keys = attestation_keys(attestation)
+        if keys:
+            index_keys.update(keys)
+
+        # Records are placed in append order, so the flush task only writes them out
+        record_size = self.HEADER.size + len(body)
+        if self._size and self._size + record_size > self.segment_size:
+            self._segment += 1
+            self._size = 0
+        offset = self._size + self.HEADER.size
+        self._size += record_size
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self._segment, offset, body, index_keys, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush())
+        return future
+
+    async def _flush(self) -> None:
+        """Write and fsync pending records in batches until none are left"""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            if self.flush_delay:
+                await asyncio.sleep(self.flush_delay)
+            batch, self._pending = self._pending, []
+            try:
+                await loop.run_in_executor(None, self._write_batch, batch)
+            except Exception as e:
+                # The log may now end in a torn record; refuse further appends
+                self._failure = e
+                for *_, future in batch + self._pending:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"Attestation store failed: {e}"))
+                self._pending = []
+                return
+
+            for segment, offset, body, keys, future in batch:
+                record = self._index(segment, offset, len(body), keys)
+                self._unsaved.setdefault(segment, []).append(self._entry(offset, len(body), keys))
+                if not future.done():
+                    future.set_result(self._ref(record))
+
+            # Segments before the one written last are full; persist their indexes
+            last = batch[-1][0]
+            for segment in [segment for segment in self._unsaved if segment < last]:
+                entries = self._unsaved.pop(segment)
+                await loop.run_in_executor(None, self._save_index, segment, entries)
+
+    def _write_batch(self, batch: List[_PendingRecord]) -> None:
+        """Append a batch to its segments, fsyncing each segment written"""
+        chunks: List[bytes] = []
+        segment = batch[0][0]
+        for record_segment, _, body, _, _ in batch:
+            if record_segment != segment:
+                self._write_segment(segment, chunks)
+                chunks = []
+                segment = record_segment
+            chunks.append(self.HEADER.pack(len(body)))
+            chunks.append(body)
+        self._write_segment(segment, chunks)
+
+    def _write_segment(self, segment: int, chunks: List[bytes]) -> None:
+        file = self._file
+        if file is None or self._file_segment != segment:
+            if file is not None:
+                file.close()
+            file = self._file = open(self._path(segment, ".log"), "ab")
+            self._file_segment = segment
+            _fsync_directory(self.directory)  # Make the new file's entry durable too
+        file.write(b"".join(chunks))
+        file.flush()
+        os.fsync(file.fileno())
+
+    def _save_index(self, segment: int, entries: List[List[Any]]) -> None:
+        """Add index entries to a segment's .idx file, replacing it atomically"""
+        path = self._path(segment, ".idx")
+        try:
+            with open(path, "rb") as f:
+                records = loads(f.read())["records"]
+        except (OSError, ValueError):
+            records = []
+        records.extend(entries)
+        size = entries[-1][0] + entries[-1][1]  # End of the last record covered
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".idx.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dumps({"size": size, "records": records}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # Reading
+
+    def read(self, ref: AttestationRef) -> bytes:
+        """The stored JSON bytes of ref"""
+        end = ref.offset + ref.length
+        data = self._maps.get(ref.segment)
+        if data is None or len(data) < end:
+            # First read of the segment, or it has grown since it was mapped
+            data = self._map(ref.segment)
+        return data[ref.offset:end]
+
+    def _map(self, segment: int) -> mmap.mmap:
+        old = self._maps.pop(segment, None)
+        if old is not None:
+            old.close()
+        with open(self._path(segment, ".log"), "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = data
+        return data
+
+    def get(self, ref: AttestationRef) -> Dict[str, Any]:
+        """The stored attestation at ref"""
+        attestation: Dict[str, Any] = loads(self.read(ref))
+        return attestation
+
+    def find(
+        self,
+        request_id: Optional[str] = None,
+        host: Optional[str] = None,
+        template_id: Optional[str] = None,
+        user_address: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[AttestationRef]:
+        """Refs of the attestations matching every given key, in the order stored
+
+        since and until bound the attestation time, in milliseconds: since
+        inclusive, until exclusive. user_address matches case-insensitively.
+        """
+        if user_address is not None:
+            user_address = user_address.lower()
+        values = (request_id, host, template_id, user_address)
+        matches = [
+            self._keys[field].get(value, [])
+            for field, value in zip(KEY_FIELDS, values) if value is not None
+        ]
+        timed = since is not None or until is not None
+
+        if matches:
+            # Walk the shortest list; the others are sorted, so test by bisection
+            matches.sort(key=len)
+            candidates: Iterable[int] = (
+                record for record in matches[0]
+                if all(_contains(other, record) for other in matches[1:])
+                and (not timed or self._in_range(record, since, until))
+            )
+        elif timed:
+            start = bisect.bisect_left(self._time_keys, since) if since is not None else 0
+            end = len(self._time_keys)
+            if until is not None:
+                end = bisect.bisect_left(self._time_keys, until)
+            candidates = sorted(self._time_records[start:end])
+        else:
+            candidates = range(len(self._offsets))
+
+        return [self._ref(record) for record in itertools.islice(candidates, limit)]
+
+    def _in_range(self, record: int, since: Optional[int], until: Optional[int]) -> bool:
+        time = self._times[record]
+        if time < 0:
+            return False
+        return (since is None or time >= since) and (until is None or time < until)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __iter__(self) -> Iterator[AttestationRef]:
+        """Refs of every stored attestation, in the order stored"""
+        return (self._ref(record) for record in range(len(self._offsets)))
+
+    # Closing
+
+    async def aclose(self) -> None:
+        """Finish pending appends, persist the remaining indexes and release the files"""
+        self._closed = True
+        if self._flush_task is not None:
+            await asyncio.wait([self._flush_task])
+        loop = asyncio.get_running_loop()
+        unsaved, self._unsaved = self._unsaved, {}
+        for segment, entries in unsaved.items():
+            await loop.run_in_executor(None, self._save_index, segment, entries)
+        if self._file is not None:
+            self._file.close()
+            self._file = self._file_segment = None
+        for data in self._maps.values():
+            data.close()
+        self._maps.clear()
+
+    async def close(self) -> None:
+        """Alias of aclose()"""
+        await self.aclose()
+
+    async def __aenter__(self) -> "AttestationStore":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+def _contains(records: List[int], record: int) -> bool:
+    """Whether the sorted list records holds record"""
+    position = bisect.bisect_left(records, record)
+    return position < len(records) and records[position] == record
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories cannot be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,56 @@
+"""Attestation templates for repeated request shapes"""
+import itertools
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Registration ids, unique within the process
+_template_ids = itertools.count(1)
+
+
+class AttestationTemplate:
+    """The fixed part of start_attestation calls that share a request shape
+
+    A wrapper registers the template with its Node.js process on first use;
+    from then on each call sends only its deltas (URL parameters, user address,
+    request id) and Node.js builds the attestation request from the stored
+    template. The request URL may contain ``{name}`` placeholders in its path
+    and query, which are filled from each call's url_params (URL-encoded).
+
+    The arguments are those of NodeWrapper.start_attestation; template_id is
+    the attestation's templateId condition, while id identifies the
+    registration itself.
+    """
+
+    __slots__ = (
+        "id", "request", "response_resolves", "user_address", "att_mode",
+        "att_conditions", "addition_params", "template_id", "host"
+    )
+
+    def __init__(
+        self,
+        request: Dict[str, Any],
+        response_resolves: List[Dict[str, Any]],
+        user_address: str = ZERO_ADDRESS,
+        att_mode: Optional[Dict[str, Any]] = None,
+        att_conditions: Optional[Dict[str, Any]] = None,
+        addition_params: Optional[Dict[str, Any]] = None,
+        template_id: str = "test-template"
+    ):
+        host = urlparse(request["url"]).netloc
+        if "{" in host:
+            raise ValueError("URL placeholders are only supported in the path and query")
+
+        self.id = f"template-{next(_template_ids)}"
+        self.request = dict(request)
+        self.response_resolves = list(response_resolves)
+        self.user_address = user_address
+        self.att_mode = att_mode
+        self.att_conditions = att_conditions
+        self.addition_params = addition_params
+        self.template_id = template_id
+        self.host = host  # The host condition, fixed by the template URL
+
+    def __repr__(self) -> str:
+        return f"AttestationTemplate(id={self.id!r}, url={self.request['url']!r})"
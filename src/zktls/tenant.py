@@ -0,0 +1,23 @@
+"""Tenant handles for serving several app ids from one Node.js process"""
+
+
+class Tenant:
+    """Credentials of one app id, passed as tenant= to wrapper and pool calls
+
+    Calls made with a tenant run on a PrimusCoreTLS instance of the tenant's
+    own, kept by wrapper.js next to the default (init) one. The instance is
+    created on the tenant's first call. Node.js may evict tenants that have
+    been idle longest (see NodeWrapper's max_tenants); their next call then
+    initializes them again. Any number of tenants can share one process or pool.
+    """
+
+    __slots__ = ("app_id", "app_secret")
+
+    def __init__(self, app_id: str, app_secret: str):
+        if not app_id or not app_secret:
+            raise ValueError("A tenant needs an app_id and an app_secret")
+        self.app_id = app_id
+        self.app_secret = app_secret
+
+    def __repr__(self) -> str:
+        return f"Tenant(app_id={self.app_id!r})"
@@ -0,0 +1,105 @@
+"""Pure-Python attestation verification for ZK TLS SDK"""
+from concurrent.futures import Executor
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature, ValidationError
+
+from .encoding import EncodingError, _attestation_digest
+
+# The attestor the core SDK checks signatures against in production
+PRODUCTION_ATTESTOR = "0xdb736b13e2f522dbe18b2015d0291e4b193d8ef6"
+# The one its development configuration uses instead; trusted only on request
+DEVELOPMENT_ATTESTOR = "0xe02bd7a6c8aa401189aebb5bad755c2610940a73"
+
+# Like the SDK, trust exactly one attestor unless told otherwise
+DEFAULT_ATTESTORS: FrozenSet[str] = frozenset({PRODUCTION_ATTESTOR})
+
+VERIFY_CHUNK_SIZE = 256
+
+
+def _normalize_attestors(attestors: Optional[Iterable[str]]) -> FrozenSet[str]:
+    if attestors is None:
+        return DEFAULT_ATTESTORS
+    return frozenset(address.lower() for address in attestors)
+
+
+def recover_signer(digest: bytes, signature: str) -> str:
+    """Recover the checksummed address that signed a 32-byte digest
+
+    ``signature`` is a 0x-prefixed 65-byte r || s || v hex string, with v
+    either 27/28 or 0/1.
+    """
+    try:
+        raw = bytes.fromhex(signature[2:] if signature.startswith(("0x", "0X")) else signature)
+    except (AttributeError, ValueError):
+        raise ValueError("Signature must be a hex string")
+    if len(raw) != 65:
+        raise ValueError(f"Signature must be 65 bytes, got {len(raw)}")
+
+    v = raw[64]
+    if v >= 27:
+        v -= 27
+    if v not in (0, 1):
+        raise ValueError(f"Invalid signature recovery id: {raw[64]}")
+
+    try:
+        signature_obj = keys.Signature(raw[:64] + bytes([v]))
+        public_key = signature_obj.recover_public_key_from_msg_hash(digest)
+    except (BadSignature, ValidationError) as e:
+        raise ValueError(f"Invalid signature: {str(e)}")
+    return public_key.to_checksum_address()
+
+
+def verify_attestation(
+    attestation: Dict[str, Any],
+    attestors: Optional[Iterable[str]] = None
+) -> bool:
+    """Verify an attestation without Node.js
+
+    Re-encodes the attestation, recovers the signer of its first signature and
+    checks it against ``attestors`` (DEFAULT_ATTESTORS, the production attestor,
+    if not given; add DEVELOPMENT_ATTESTOR to accept development attestations).
+    Malformed attestations and signatures verify as False.
+    """
+    return _verify(attestation, _normalize_attestors(attestors))
+
+
+def _verify(attestation: Dict[str, Any], attestors: FrozenSet[str]) -> bool:
+    try:
+        digest = _attestation_digest(attestation)
+        signature = attestation["signatures"][0]
+        signer = recover_signer(digest, signature)
+    except (EncodingError, ValueError, KeyError, IndexError, TypeError):
+        return False
+    return signer.lower() in attestors
+
+
+def _verify_chunk(attestations: Sequence[Dict[str, Any]], attestors: FrozenSet[str]) -> List[bool]:
+    return [_verify(attestation, attestors) for attestation in attestations]
+
+
+def verify_attestations(
+    attestations: Sequence[Dict[str, Any]],
+    attestors: Optional[Iterable[str]] = None,
+    executor: Optional[Executor] = None,
+    chunk_size: int = VERIFY_CHUNK_SIZE
+) -> List[bool]:
+    """Verify many attestations, optionally spreading chunks over an executor
+
+    With a ProcessPoolExecutor the signature recovery runs on several cores;
+    without an executor the attestations are verified in the calling thread.
+    """
+    allowed = _normalize_attestors(attestors)
+    if executor is None:
+        return _verify_chunk(attestations, allowed)
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    chunks = [attestations[i:i + chunk_size] for i in range(0, len(attestations), chunk_size)]
+    futures = [executor.submit(_verify_chunk, chunk, allowed) for chunk in chunks]
+
+    verified: List[bool] = []
+    for future in futures:
+        verified.extend(future.result())
+    return verified
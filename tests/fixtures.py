@@ -0,0 +1,96 @@
+"""
+Shared test fixtures: a request, its response resolves and an attestation of
+them, plus an attestation signed with a throwaway key.
+
+The SDK's own hashes of the fixtures live in sdk_vectors.json. Recording them
+needs Node.js and @primuslabs/zktls-core-sdk; from the repository root run
+
+    python -m tests.fixtures
+
+which writes the file from the SDK's dist/utils encoders.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from eth_keys import keys
+from zktls.encoding import encode_attestation
+
+REQUEST = {
+    "url": "https://catfact.ninja/fact",
+    "header": "",
+    "method": "GET",
+    "body": ""
+}
+
+RESPONSE_RESOLVES = [
+    {"keyName": "fact", "parseType": "string", "parsePath": "$.fact"},
+    {"keyName": "length", "parseType": "number", "parsePath": "$.length"}
+]
+
+ATTESTATION = {
+    "recipient": "0x7ab44DE0156925fe0c24482a2cDe48C465e47573",
+    "request": REQUEST,
+    "reponseResolve": RESPONSE_RESOLVES,
+    "data": "{\"fact\":\"Cats sleep 70% of their lives.\",\"length\":31}",
+    "attConditions": "[{\"op\":\"REVEAL_STRING\",\"field\":\"$.fact\"}]",
+    "timestamp": 1733914140221,
+    "additionParams": "",
+    "attestors": [],
+    "signatures": []
+}
+
+TEST_KEY = keys.PrivateKey(bytes.fromhex("4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318"))
+TEST_ATTESTOR = TEST_KEY.public_key.to_checksum_address()
+
+def sign(attestation, key=TEST_KEY):
+    """Return a copy of the attestation signed by key, with v as 27/28 like ethers."""
+    digest = bytes.fromhex(encode_attestation(attestation)[2:])
+    signature = key.sign_msg_hash(digest).to_bytes()
+    signature = signature[:64] + bytes([signature[64] + 27])
+    return dict(attestation, signatures=["0x" + signature.hex()])
+
+SIGNED = sign(ATTESTATION)
+
+SDK_VECTORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sdk_vectors.json")
+
+ENCODE_SCRIPT = """
+const sdk = require('@primuslabs/zktls-core-sdk/package.json');
+const { encodeRequest, encodeResponse, encodeAttestation } = require('@primuslabs/zktls-core-sdk/dist/utils');
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+process.stdout.write(JSON.stringify({
+    sdkVersion: sdk.version,
+    request: encodeRequest(input.request).toLowerCase(),
+    response: encodeResponse(input.response).toLowerCase(),
+    attestation: encodeAttestation(input.attestation).toLowerCase()
+}));
+"""
+
+def sdk_encodings():
+    """Hash the fixtures with the installed SDK's encoders."""
+    payload = {"request": REQUEST, "response": RESPONSE_RESOLVES, "attestation": ATTESTATION}
+    result = subprocess.run(
+        ["node", "-e", ENCODE_SCRIPT],
+        input=json.dumps(payload),
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=True
+    )
+    return json.loads(result.stdout)
+
+def load_sdk_vectors():
+    """The recorded SDK hashes of the fixtures, or None if they were never recorded."""
+    try:
+        with open(SDK_VECTORS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+if __name__ == "__main__":
+    vectors = sdk_encodings()
+    with open(SDK_VECTORS_FILE, "w", encoding="utf-8") as f:
+        json.dump(vectors, f, indent=2)
+        f.write("\n")
+    sys.stdout.write(f"Recorded SDK {vectors['sdkVersion']} vectors in {SDK_VECTORS_FILE}\n")
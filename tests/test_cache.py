@@ -0,0 +1,125 @@
+"""
+Unit tests for the ZK TLS SDK caching helpers.
+"""
+
+import asyncio
+import pytest
+from zktls.cache import LRUCache, SingleFlight, canonical_digest
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_canonical_digest_ignores_key_order():
+    """Test equal dicts hash the same regardless of key order."""
+    assert canonical_digest({"a": 1, "b": [1, 2]}) == canonical_digest({"b": [1, 2], "a": 1})
+    assert canonical_digest({"a": 1}) != canonical_digest({"a": 2})
+
+def test_lru_eviction_order():
+    """Test the least recently used entry is evicted first."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "hits": 3, "misses": 1, "evictions": 1, "expirations": 0, "size": 2, "maxsize": 2
+    }
+
+def test_ttl_expiry():
+    """Test entries expire after the ttl."""
+    clock = FakeClock()
+    cache = LRUCache(10, ttl=5, clock=clock)
+    cache.put("a", True)
+    clock.now = 4.9
+    assert cache.get("a") is True
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+def test_invalid_arguments():
+    """Test the cache rejects nonsensical sizes and ttls."""
+    with pytest.raises(ValueError):
+        LRUCache(0)
+    with pytest.raises(ValueError):
+        LRUCache(1, ttl=0)
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_calls():
+    """Test concurrent callers with one key share a call and later callers start a new one."""
+    flight = SingleFlight()
+    started = []
+    release = asyncio.Event()
+
+    async def call():
+        started.append(1)
+        await release.wait()
+        return {"data": [1]}
+
+    callers = [asyncio.ensure_future(flight.run("key", call)) for _ in range(3)]
+    other = asyncio.ensure_future(flight.run("other", call))
+    for _ in range(3):
+        await asyncio.sleep(0)
+    assert len(started) == 2 and len(flight) == 2
+    release.set()
+    results = await asyncio.gather(*callers)
+    await other
+
+    assert results == [{"data": [1]}] * 3
+    results[1]["data"].append(2)
+    assert results[0] == results[2] == {"data": [1]}
+    assert len(flight) == 0
+    await flight.run("key", call)
+    assert flight.stats() == {"calls": 3, "shared": 2, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    """Test every caller sees the shared call's exception."""
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0)
+        raise RuntimeError("Command failed: boom")
+
+    results = await asyncio.gather(*(flight.run("key", call) for _ in range(2)), return_exceptions=True)
+    assert [str(result) for result in results] == ["Command failed: boom"] * 2
+
+@pytest.mark.asyncio
+async def test_single_flight_cancellation():
+    """Test a cancelled caller leaves the call running for others, and the last one cancels it."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    finished = []
+
+    async def call():
+        await release.wait()
+        finished.append(1)
+        return True
+
+    first = asyncio.ensure_future(flight.run("key", call))
+    second = asyncio.ensure_future(flight.run("key", call))
+    for _ in range(3):
+        await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second is True
+    assert first.cancelled() and finished == [1]
+
+    release.clear()
+    only = asyncio.ensure_future(flight.run("key", call))
+    await asyncio.sleep(0)
+    only.cancel()
+    for _ in range(3):
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.sleep(0)
+    assert finished == [1] and len(flight) == 0
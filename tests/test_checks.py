@@ -0,0 +1,121 @@
+"""
+Unit tests for the ZK TLS SDK installation checks.
+
+The Node.js probe itself is mocked; these tests cover its caching.
+"""
+
+import os
+import sys
+import json
+import pytest
+from unittest.mock import patch
+from zktls import checks
+from zktls.checks import InstallationError, ensure_environment
+
+PROBE_OK = {"node": "v18.0.0", "npm": "9.0.0", "sdk": True, "sdkError": None, "wasmThreadsFlag": True}
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Give each test an empty probe cache."""
+    monkeypatch.setenv("ZKTLS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(checks, "_probe_results", {})
+    monkeypatch.setattr(checks, "_wrapper_scripts", {})
+    return tmp_path / "cache"
+
+def write_sdk_package(root, version):
+    package_dir = root / "node_modules" / "@primuslabs" / "zktls-core-sdk"
+    package_dir.mkdir(parents=True, exist_ok=True)
+    (package_dir / "package.json").write_text(json.dumps({"version": version}))
+
+def test_probe_memoized_per_process():
+    """Test a warm check runs no Node.js process."""
+    with patch("zktls.checks._probe_cache_key", return_value="key"), \
+         patch("zktls.checks._run_probe", return_value=dict(PROBE_OK)) as mock_probe:
+        assert ensure_environment()["node"] == "v18.0.0"
+        assert ensure_environment()["node"] == "v18.0.0"
+    assert mock_probe.call_count == 1
+
+def test_probe_persisted_on_disk(isolated_cache, monkeypatch):
+    """Test a new process reuses the probe result from the cache directory."""
+    with patch("zktls.checks._probe_cache_key", return_value="key"), \
+         patch("zktls.checks._run_probe", return_value=dict(PROBE_OK)) as mock_probe:
+        ensure_environment()
+        monkeypatch.setattr(checks, "_probe_results", {})
+        ensure_environment()
+    assert mock_probe.call_count == 1
+    assert (isolated_cache / "probe-key.json").exists()
+
+def test_failed_probe_not_cached():
+    """Test a failing probe raises and is retried next time."""
+    failed = dict(PROBE_OK, sdk=False, sdkError="Cannot find module")
+    with patch("zktls.checks._probe_cache_key", return_value="key"), \
+         patch("zktls.checks._run_probe", return_value=failed) as mock_probe:
+        with pytest.raises(InstallationError, match="SDK check failed"):
+            ensure_environment()
+        with pytest.raises(InstallationError):
+            ensure_environment()
+    assert mock_probe.call_count == 2
+
+def test_old_npm_rejected():
+    """Test the npm version reported by the probe is checked."""
+    with patch("zktls.checks._probe_cache_key", return_value="key"), \
+         patch("zktls.checks._run_probe", return_value=dict(PROBE_OK, npm="5.1.0")):
+        with pytest.raises(InstallationError, match="npm version 5.1.0 is too old"):
+            ensure_environment()
+
+def test_cache_key_tracks_sdk_version(tmp_path, monkeypatch):
+    """Test upgrading the SDK invalidates the cached probe."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("NODE_PATH", raising=False)
+    with patch("zktls.checks.shutil.which", return_value=sys.executable):
+        assert checks._probe_cache_key() is None
+
+        write_sdk_package(tmp_path, "0.1.1")
+        first = checks._probe_cache_key()
+        write_sdk_package(tmp_path, "0.1.2")
+        second = checks._probe_cache_key()
+
+    assert first is not None
+    assert first != second
+
+def test_find_sdk_package_in_parent(tmp_path, monkeypatch):
+    """Test the SDK is found in a parent directory's node_modules."""
+    write_sdk_package(tmp_path, "0.1.1")
+    nested = tmp_path / "app" / "src"
+    nested.mkdir(parents=True)
+    monkeypatch.delenv("NODE_PATH", raising=False)
+    found = checks.find_sdk_package(str(nested))
+    assert found == os.path.join(str(tmp_path), "node_modules", "@primuslabs", "zktls-core-sdk", "package.json")
+
+def test_wrapper_script_materialized_once(isolated_cache, monkeypatch):
+    """Test the wrapper script is copied to the cache directory only when missing or changed."""
+    path = checks.materialize_wrapper_script()
+    assert os.path.dirname(path) == str(isolated_cache)
+    with open(path, "rb") as f, open(checks.WRAPPER_SCRIPT, "rb") as packaged:
+        assert f.read() == packaged.read()
+
+    monkeypatch.setattr(checks, "_wrapper_scripts", {})
+    mtime = os.stat(path).st_mtime_ns
+    with patch("zktls.checks.tempfile.mkstemp") as mock_mkstemp:
+        assert checks.materialize_wrapper_script() == path
+    mock_mkstemp.assert_not_called()
+    assert os.stat(path).st_mtime_ns == mtime
+
+def test_wrapper_script_named_by_content(isolated_cache, tmp_path, monkeypatch):
+    """Test a changed wrapper script gets a new cache file."""
+    old_path = checks.materialize_wrapper_script()
+    script = tmp_path / "wrapper.js"
+    script.write_text("// upgraded\n")
+    monkeypatch.setattr(checks, "WRAPPER_SCRIPT", str(script))
+    monkeypatch.setattr(checks, "_wrapper_scripts", {})
+
+    new_path = checks.materialize_wrapper_script()
+    assert new_path != old_path
+    assert open(new_path).read() == "// upgraded\n"
+    assert os.path.exists(old_path)
+
+def test_wrapper_script_unwritable_cache(tmp_path):
+    """Test the packaged script is used when the cache directory cannot be written."""
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    assert checks.materialize_wrapper_script(str(blocker / "cache")) == checks.WRAPPER_SCRIPT
@@ -0,0 +1,128 @@
+"""
+Unit tests for the python -m zktls command line.
+"""
+
+import gzip
+import json
+import pytest
+from zktls.cli import main
+from tests.fixtures import SIGNED, TEST_ATTESTOR
+
+LINES = [
+    json.dumps(SIGNED),
+    json.dumps(dict(SIGNED, data="tampered")),
+    "",
+    "{not json",
+    json.dumps(SIGNED),
+    json.dumps([1, 2]),
+    json.dumps(SIGNED),
+]
+EXPECTED = [
+    {"line": 1, "valid": True},
+    {"line": 2, "valid": False},
+    {"line": 4, "valid": False, "error": "not an attestation"},
+    {"line": 5, "valid": True},
+    {"line": 6, "valid": False, "error": "not an attestation"},
+    {"line": 7, "valid": True},
+]
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "archive.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(LINES) + "\n")
+    return path
+
+def verify(archive, output, *extra):
+    return main([
+        "verify", str(archive), "-o", str(output), "--attestor", TEST_ATTESTOR,
+        "--chunk-size", "2", *extra
+    ])
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+@pytest.mark.parametrize("workers", ["0", "1"])
+def test_verify_archive(archive, tmp_path, capsys, workers):
+    """Test each line gets a result, in input order, and the summary adds them up."""
+    output = tmp_path / "results.jsonl"
+    assert verify(archive, output, "-j", workers) == 1
+
+    assert read_results(output) == EXPECTED
+    summary = json.loads((tmp_path / "results.jsonl.summary.json").read_text())
+    assert summary["lines"] == 7
+    assert (summary["valid"], summary["invalid"], summary["malformed"]) == (3, 1, 2)
+    assert summary["finished"] is True
+    assert summary["output_size"] == output.stat().st_size
+    assert "3 valid, 1 invalid, 2 malformed" in capsys.readouterr().err
+
+def test_failures_only_and_clean_exit(tmp_path):
+    """Test --failures-only skips valid lines and an all-valid archive exits with 0."""
+    archive = tmp_path / "valid.jsonl"
+    archive.write_text(json.dumps(SIGNED) + "\n" + json.dumps(SIGNED) + "\n")
+    output = tmp_path / "results.jsonl"
+    assert verify(archive, output, "-j", "0", "--failures-only") == 0
+    assert output.read_text() == ""
+
+def test_dev_attestor_opt_in(monkeypatch, tmp_path):
+    """Test the development attestor is only trusted with --dev-attestor."""
+    monkeypatch.setattr("zktls.cli.DEVELOPMENT_ATTESTOR", TEST_ATTESTOR.lower())
+    archive = tmp_path / "valid.jsonl"
+    archive.write_text(json.dumps(SIGNED) + "\n")
+    output = tmp_path / "results.jsonl"
+    assert main(["verify", str(archive), "-o", str(output), "-j", "0"]) == 1
+    assert main(["verify", str(archive), "-o", str(output), "-j", "0", "--dev-attestor"]) == 0
+    assert read_results(output) == [{"line": 1, "valid": True}]
+
+def test_resume_from_summary(archive, tmp_path):
+    """Test a resumed run continues after the last saved summary and drops later output."""
+    full = tmp_path / "full.jsonl"
+    verify(archive, full, "-j", "0")
+
+    # As if the run died after saving the summary at line 4 and writing a bit more
+    output = tmp_path / "results.jsonl"
+    done = read_results(full)[:3]
+    written = "".join(json.dumps(result, separators=(",", ":")) + "\n" for result in done)
+    output.write_text(written + '{"line":5,"va')
+    offset = sum(len(line) + 1 for line in LINES[:4])
+    (tmp_path / "results.jsonl.summary.json").write_text(json.dumps({
+        "input": str(archive), "offset": offset, "lines": 4, "valid": 1, "invalid": 1,
+        "malformed": 1, "output_size": len(written), "elapsed": 1.0, "finished": False,
+    }))
+
+    assert verify(archive, output, "-j", "0", "--resume") == 1
+    assert output.read_text() == full.read_text()
+    summary = json.loads((tmp_path / "results.jsonl.summary.json").read_text())
+    assert (summary["valid"], summary["invalid"], summary["malformed"]) == (3, 1, 2)
+
+def test_resume_without_output(archive, tmp_path):
+    """Test a resumed run whose output file was deleted starts over."""
+    full = tmp_path / "full.jsonl"
+    verify(archive, full, "-j", "0")
+
+    output = tmp_path / "results.jsonl"
+    (tmp_path / "results.jsonl.summary.json").write_text(json.dumps({
+        "input": str(archive), "offset": 10, "lines": 1, "valid": 1, "invalid": 0,
+        "malformed": 0, "output_size": 30, "elapsed": 1.0, "finished": False,
+    }))
+
+    assert verify(archive, output, "-j", "0", "--resume") == 1
+    assert output.read_text() == full.read_text()
+    summary = json.loads((tmp_path / "results.jsonl.summary.json").read_text())
+    assert (summary["valid"], summary["invalid"], summary["malformed"]) == (3, 1, 2)
+
+def test_resume_checks_input(archive, tmp_path):
+    """Test a summary of another input is not resumed from."""
+    output = tmp_path / "results.jsonl"
+    (tmp_path / "results.jsonl.summary.json").write_text(json.dumps({"input": "other.jsonl"}))
+    with pytest.raises(SystemExit, match="other.jsonl"):
+        verify(archive, output, "-j", "0", "--resume")
+
+def test_daemon_options_checked(tmp_path):
+    """Test the daemon command rejects bad options before starting anything."""
+    socket = str(tmp_path / "zktls.sock")
+    for extra in (["--workers", "0"], ["--max-tenants", "0"], ["--oob-threshold", "-1"]):
+        with pytest.raises(SystemExit) as error:
+            main(["daemon", "--socket", socket, *extra])
+        assert error.value.code == 2
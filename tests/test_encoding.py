@@ -0,0 +1,123 @@
+"""
+Unit tests for the pure-Python SDK encodings.
+
+Outputs are checked against pinned hashes of the shared fixtures, against an
+independent packed encoding built with eth_abi, against the SDK's hashes of the
+fixtures recorded in tests/sdk_vectors.json and, when Node.js and
+@primuslabs/zktls-core-sdk are installed, against the SDK's dist/utils live.
+"""
+
+import shutil
+import pytest
+from eth_abi.packed import encode_packed
+from eth_utils import keccak
+from zktls.checks import find_sdk_package
+from zktls.encoding import (
+    EncodingError,
+    encode_attestation,
+    encode_attestations,
+    encode_request,
+    encode_requests,
+    encode_response,
+)
+from tests.fixtures import ATTESTATION, REQUEST, RESPONSE_RESOLVES, load_sdk_vectors, sdk_encodings
+
+# Pinned hashes of REQUEST, RESPONSE_RESOLVES and ATTESTATION. They were computed
+# in Python from the byte layout SDK 0.1.1's dist/utils hashes, so they catch
+# regressions but not a divergence from the SDK: test_recorded_sdk_vectors checks
+# them against the SDK's own output once it is recorded in tests/sdk_vectors.json.
+EXPECTED_REQUEST = "0x9e4d63b5e8e5c2e698424fe95d406ef38fd7361fbb0b536eb6a6b542112aca28"
+EXPECTED_RESPONSE = "0xf9bd7d89995fbfe160ffc4395929ea8d834612e37e80db1c497d76ebb5e976ed"
+EXPECTED_ATTESTATION = "0x06ee5ad4235ed910299b5efbf74982d408dd4387738bb75056c4d203266f4b72"
+
+SDK_VECTORS = load_sdk_vectors()
+
+def reference_request(request):
+    return "0x" + keccak(encode_packed(
+        ["string"] * 4, [request["url"], request["header"], request["method"], request["body"]]
+    )).hex()
+
+def reference_response(resolves):
+    data = b""
+    for resolve in resolves:
+        data = encode_packed(
+            ["bytes", "string", "string", "string"],
+            [data, resolve["keyName"], resolve["parseType"], resolve["parsePath"]]
+        )
+    return "0x" + keccak(data).hex()
+
+def reference_attestation(attestation):
+    return "0x" + keccak(encode_packed(
+        ["address", "bytes32", "bytes32", "string", "string", "uint64", "string"],
+        [
+            attestation["recipient"],
+            bytes.fromhex(reference_request(attestation["request"])[2:]),
+            bytes.fromhex(reference_response(attestation["reponseResolve"])[2:]),
+            attestation["data"],
+            attestation["attConditions"],
+            attestation["timestamp"],
+            attestation["additionParams"],
+        ]
+    )).hex()
+
+def test_encode_request():
+    """Test request encoding matches the pinned hash and the packed reference."""
+    assert encode_request(REQUEST) == EXPECTED_REQUEST
+    assert encode_request(REQUEST) == reference_request(REQUEST)
+
+def test_encode_response():
+    """Test response encoding matches the pinned hash and the packed reference."""
+    assert encode_response(RESPONSE_RESOLVES) == EXPECTED_RESPONSE
+    assert encode_response(RESPONSE_RESOLVES) == reference_response(RESPONSE_RESOLVES)
+
+def test_encode_empty_response():
+    """Test an empty response list hashes the empty byte string."""
+    assert encode_response([]) == "0xc5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+
+def test_encode_attestation():
+    """Test attestation encoding matches the pinned hash and the packed reference."""
+    assert encode_attestation(ATTESTATION) == EXPECTED_ATTESTATION
+    assert encode_attestation(ATTESTATION) == reference_attestation(ATTESTATION)
+
+def test_encode_attestation_string_timestamp():
+    """Test numeric string timestamps encode like integers."""
+    attestation = dict(ATTESTATION, timestamp=str(ATTESTATION["timestamp"]))
+    assert encode_attestation(attestation) == encode_attestation(ATTESTATION)
+
+def test_vectorized_encoders():
+    """Test list encoders match the single-item ones."""
+    other = dict(REQUEST, url="https://example.com/")
+    assert encode_requests([REQUEST, other]) == [encode_request(REQUEST), encode_request(other)]
+    assert encode_attestations([ATTESTATION] * 2) == [encode_attestation(ATTESTATION)] * 2
+
+@pytest.mark.parametrize("attestation, message", [
+    (dict(ATTESTATION, recipient="0x1234"), "20 bytes"),
+    (dict(ATTESTATION, timestamp=-1), "unsigned 64-bit"),
+    (dict(ATTESTATION, data=None), "'data' must be a string"),
+    ({k: v for k, v in ATTESTATION.items() if k != "request"}, "missing field 'request'"),
+])
+def test_encode_attestation_invalid(attestation, message):
+    """Test malformed attestations raise EncodingError."""
+    with pytest.raises(EncodingError, match=message):
+        encode_attestation(attestation)
+
+@pytest.mark.skipif(
+    SDK_VECTORS is None,
+    reason="SDK vectors not recorded; run python -m tests.fixtures with the SDK installed"
+)
+def test_recorded_sdk_vectors():
+    """Test the Python encodings match the hashes recorded from the SDK."""
+    assert SDK_VECTORS["request"] == EXPECTED_REQUEST == encode_request(REQUEST)
+    assert SDK_VECTORS["response"] == EXPECTED_RESPONSE == encode_response(RESPONSE_RESOLVES)
+    assert SDK_VECTORS["attestation"] == EXPECTED_ATTESTATION == encode_attestation(ATTESTATION)
+
+@pytest.mark.skipif(
+    shutil.which("node") is None or find_sdk_package() is None,
+    reason="Node.js and @primuslabs/zktls-core-sdk are required for the parity check"
+)
+def test_parity_with_node_sdk():
+    """Test the Python encodings match the installed Node.js SDK."""
+    expected = sdk_encodings()
+    assert expected["request"] == encode_request(REQUEST)
+    assert expected["response"] == encode_response(RESPONSE_RESOLVES)
+    assert expected["attestation"] == encode_attestation(ATTESTATION)
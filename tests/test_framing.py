@@ -0,0 +1,116 @@
+"""
+Unit tests for the Python <-> Node.js message framings.
+"""
+
+import asyncio
+import os
+import pytest
+from zktls import framing as framing_module
+from zktls.framing import JSON_LINES, LENGTH_PREFIXED, LengthPrefixedFraming, LineFraming, get_framing
+
+MESSAGES = [
+    {"id": 1, "result": True},
+    {"id": 2, "result": {"data": "line\nbreak", "unicode": "é✓"}},
+    {"id": 3, "result": {"big": 2 ** 70}},
+]
+
+def feed(data, eof=True):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    if eof:
+        reader.feed_eof()
+    return reader
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", [JSON_LINES, LENGTH_PREFIXED])
+async def test_round_trip(name):
+    """Test messages survive encode/read, then read returns None at EOF."""
+    framing = get_framing(name)
+    reader = feed(b"".join(framing.encode(message) for message in MESSAGES))
+    assert [await framing.read(reader) for _ in MESSAGES] == MESSAGES
+    assert await framing.read(reader) is None
+
+@pytest.mark.asyncio
+async def test_round_trip_without_orjson(monkeypatch):
+    """Test the json module fallback produces the same frames."""
+    framing = LengthPrefixedFraming()
+    with_fast = [framing.encode(message) for message in MESSAGES]
+    monkeypatch.setattr(framing_module, "orjson", None)
+    assert [framing.encode(message) for message in MESSAGES] == with_fast
+    reader = feed(b"".join(with_fast))
+    assert [await framing.read(reader) for _ in MESSAGES] == MESSAGES
+
+def test_length_prefix():
+    """Test the frame header is the 4-byte big-endian body length."""
+    frame = LengthPrefixedFraming().encode({"a": 1})
+    assert frame == b"\x00\x00\x00\x07" + b'{"a":1}'
+
+@pytest.mark.asyncio
+async def test_truncated_frame_raises():
+    """Test a stream ending mid-frame is an error, not a clean EOF."""
+    frame = LengthPrefixedFraming().encode({"a": 1})
+    with pytest.raises(asyncio.IncompleteReadError):
+        await LengthPrefixedFraming().read(feed(frame[:-2]))
+
+def test_line_framing_is_newline_terminated():
+    """Test json-lines frames are single lines."""
+    frame = LineFraming().encode({"data": "a\nb"})
+    assert frame.endswith(b"\n") and frame.count(b"\n") == 1
+
+def test_unknown_framing():
+    """Test unknown framing names are rejected."""
+    with pytest.raises(ValueError, match="Unknown framing"):
+        get_framing("msgpack")
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_raw_json_spliced(monkeypatch, fast):
+    """Test RawJSON bytes are spliced into the message unchanged, with either backend."""
+    if not fast:
+        monkeypatch.setattr(framing_module, "orjson", None)
+    message = {"id": 1, "params": {"attestations": [
+        framing_module.RawJSON(b'{"b":1,"a":"x"}'), {"c": 2 ** 70}, framing_module.RawJSON(b"[]")
+    ]}}
+    assert framing_module.dumps(message) == (
+        b'{"id":1,"params":{"attestations":[{"b":1,"a":"x"},{"c":1180591620717411303424},[]]}}'
+    )
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_payload_file_round_trip(monkeypatch, tmp_path, fast):
+    """Test a payload file yields its message and size once, then is gone."""
+    if not fast:
+        monkeypatch.setattr(framing_module, "orjson", None)
+    data = framing_module.dumps(MESSAGES[1])
+    path = framing_module.write_payload_file(str(tmp_path), data)
+    assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+    assert framing_module.read_payload_file(str(tmp_path), path) == (MESSAGES[1], len(data))
+    assert not os.path.exists(path)
+
+    # Files a dead wrapper.js process left behind are named after its pid
+    (tmp_path / "zktls-123-1.json").write_bytes(data)
+    (tmp_path / "zktls-1234-1.json").write_bytes(data)
+    framing_module.remove_payload_files(str(tmp_path), 123)
+    assert [path.name for path in tmp_path.iterdir()] == ["zktls-1234-1.json"]
+
+def test_payload_file_outside_directory_refused(tmp_path):
+    """Test a path outside the payload directory is neither read nor removed."""
+    payloads = tmp_path / "payloads"
+    payloads.mkdir()
+    data = framing_module.dumps(MESSAGES[1])
+    outside = tmp_path / "zktls-1-1.json"
+    outside.write_bytes(data)
+    misnamed = payloads / "secrets.json"
+    misnamed.write_bytes(data)
+    link = payloads / "zktls-1-2.json"
+    link.symlink_to(outside)
+
+    for path in (outside, payloads / ".." / outside.name, misnamed):
+        with pytest.raises(ValueError, match="Not a payload file"):
+            framing_module.read_payload_file(str(payloads), str(path))
+        with pytest.raises(ValueError, match="Not a payload file"):
+            framing_module.remove_payload_file(str(payloads), str(path))
+    assert outside.exists() and misnamed.exists()
+
+    # A symlink in the directory is removed but not followed
+    with pytest.raises(OSError):
+        framing_module.read_payload_file(str(payloads), str(link))
+    assert outside.exists() and not os.path.lexists(link)
@@ -0,0 +1,70 @@
+"""
+Unit tests for the NodeWrapper instrumentation registry.
+"""
+
+import json
+from zktls.metrics import Histogram, Timer, WrapperMetrics
+
+def test_histogram_buckets():
+    """Test observations land in cumulative buckets with +Inf last."""
+    histogram = Histogram([1, 10])
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.cumulative() == [("1", 2), ("10", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 56.5
+
+def test_command_metrics():
+    """Test a finished command records phases, sizes, in-flight and errors."""
+    metrics = WrapperMetrics()
+    timer = Timer()
+    timer.mark("serialize")
+    metrics.command_started("verifyAttestation", 120)
+    assert metrics.in_flight["verifyAttestation"] == 1
+
+    metrics.command_finished("verifyAttestation", timer, response_bytes=40, error="reply")
+    snapshot = metrics.snapshot()["commands"]["verifyAttestation"]
+    assert snapshot["in_flight"] == 0
+    assert set(snapshot["seconds"]) == {"serialize", "total"}
+    assert snapshot["request_bytes"]["sum"] == 120
+    assert snapshot["response_bytes"]["sum"] == 40
+    assert snapshot["errors"] == {"reply": 1}
+
+def test_snapshot_is_json():
+    """Test the dict snapshot can be serialized as-is."""
+    metrics = WrapperMetrics()
+    metrics.startup_finished(Timer())
+    metrics.record_event("spawn")
+    snapshot = json.loads(json.dumps(metrics.snapshot()))
+    assert snapshot["events"] == {"spawn": 1}
+    assert snapshot["startup_seconds"]["total"]["count"] == 1
+
+def test_prometheus_export():
+    """Test the Prometheus text export."""
+    metrics = WrapperMetrics(latency_buckets=[0.1])
+    timer = Timer()
+    metrics.command_started("init", 10)
+    metrics.command_finished("init", timer)
+    metrics.record_error("init", "transport")
+    metrics.record_event("respawn")
+
+    text = metrics.to_prometheus()
+    assert "# TYPE zktls_command_duration_seconds histogram" in text
+    assert 'zktls_command_duration_seconds_bucket{method="init",phase="total",le="+Inf"} 1' in text
+    assert 'zktls_command_duration_seconds_count{method="init",phase="total"} 1' in text
+    assert 'zktls_commands_in_flight{method="init"} 0' in text
+    assert 'zktls_command_errors_total{method="init",kind="transport"} 1' in text
+    assert 'zktls_process_events_total{event="respawn"} 1' in text
+    assert WrapperMetrics().to_prometheus() == ""
+
+def test_listeners():
+    """Test listeners receive each observation."""
+    metrics = WrapperMetrics()
+    seen = []
+    metrics.add_listener(lambda name, labels, value: seen.append((name, labels, value)))
+    metrics.command_started("init", 10)
+    metrics.record_event("spawn")
+    assert seen == [
+        ("command_request_bytes", {"method": "init"}, 10),
+        ("process_events", {"event": "spawn"}, 1),
+    ]
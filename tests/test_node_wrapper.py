@@ -9,9 +9,18 @@ import os
 import json
 import pytest
 import asyncio
-from unittest.mock import Mock, patch, MagicMock
-from zktls.node_wrapper import NodeWrapper
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
+from zktls.node_wrapper import CommandTimeoutError, NodeWrapper, attestation_key, stream_bounded
 from zktls.checks import InstallationError
+from zktls.encoding import encode_request
+from zktls.metrics import WrapperMetrics
+from zktls.framing import (
+    LENGTH_PREFIXED, LengthPrefixedFraming, LineFraming, RawJSON, dumps, get_framing,
+    read_payload_file
+)
+from zktls.template import AttestationTemplate
+from zktls.tenant import Tenant
+from zktls.store import AttestationStore
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -39,11 +48,101 @@ TEST_APP_ID = get_env('PRIMUS_APP_ID')
 TEST_APP_SECRET = get_env('PRIMUS_APP_SECRET')
 TEST_URL = "https://catfact.ninja/fact"
 
+class FakeStdin:
+    """Stand-in for the Node.js process stdin StreamWriter"""
+
+    def __init__(self, process):
+        self.process = process
+        self.buffer = b""
+
+    def write(self, data):
+        self.buffer += data
+        while True:
+            if isinstance(self.process.framing, LengthPrefixedFraming):
+                header = LengthPrefixedFraming.HEADER
+                if len(self.buffer) < header.size:
+                    return
+                (length,) = header.unpack(self.buffer[:header.size])
+                if len(self.buffer) < header.size + length:
+                    return
+                frame = self.buffer[header.size:header.size + length]
+                self.buffer = self.buffer[header.size + length:]
+            else:
+                if b"\n" not in self.buffer:
+                    return
+                frame, self.buffer = self.buffer.split(b"\n", 1)
+            self.process.handle_command(json.loads(frame))
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+class FakeProcess:
+    """Stand-in for an asyncio Node.js subprocess answering from a response queue"""
+
+    def __init__(self, responses, returncode=None, stderr=""):
+        self.responses = list(responses)
+        self.commands = []
+        self.returncode = returncode
+        self.pid = 4242
+        self.framing = LineFraming()
+        self.stdin = FakeStdin(self)
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_data(stderr.encode())
+        self.stderr.feed_eof()
+        self.terminate = MagicMock(side_effect=self._exit)
+        self.kill = MagicMock(side_effect=self._exit)
+        # The ready signal is written as soon as the process starts
+        self._respond()
+
+    def _respond(self, command=None):
+        # A None response leaves the command unanswered, like a hung request
+        if self.responses:
+            response = self.responses.pop(0)
+            if response is not None:
+                self.reply(command, json.loads(response))
+
+    def reply(self, command, response):
+        """Write a response line, tagged with the command's request id"""
+        if command is not None:
+            response = {"id": command["id"], **response}
+            if command.get("timing"):
+                response["elapsedMs"] = 0.5
+        self.stdout.feed_data(self.framing.encode(response))
+
+    def _exit(self):
+        self.returncode = -15
+        self.stdout.feed_eof()
+
+    def handle_command(self, command):
+        if "messageFile" in command:
+            # Like wrapper.js, which checks the file is in its --oob-dir
+            path = command["messageFile"]
+            command, _ = read_payload_file(os.path.dirname(path), path)
+        self.commands.append(command)
+        if command["method"] == "cancel":
+            return  # Notification only, wrapper.js does not reply
+        if command["method"] == "setFraming":
+            # Like wrapper.js: acknowledge in the old framing, then switch
+            framing = command["params"]["framing"]
+            self.reply(command, {"result": framing})
+            self.framing = get_framing(framing)
+            return
+        self._respond(command)
+
+    async def wait(self):
+        return self.returncode
+
+
 def create_mock_process(extra_responses=None):
     """Helper to create a mock process with default responses"""
-    mock_process = MagicMock()
-    mock_process.poll.return_value = None
-    
     # Queue up responses for initialization and health check
     responses = [
         json.dumps({"ready": True}) + "\n",
@@ -53,31 +152,35 @@ def create_mock_process(extra_responses=None):
     if extra_responses:
         responses.extend(extra_responses)
         
-    mock_process.stdout.readline.side_effect = responses
-    return mock_process
+    return FakeProcess(responses)
+
+def patch_environment_checks():
+    """Patch the installation checks NodeWrapper runs on construction"""
+    return patch.multiple(
+        "zktls.node_wrapper",
+        ensure_environment=Mock(return_value={"node": "v18.0.0", "npm": "9.0.0", "sdk": True}),
+        check_runtime_environment=Mock(return_value=None),
+        materialize_wrapper_script=Mock(return_value="wrapper.js"),
+    )
 
 @pytest.fixture
 async def wrapper():
     """Create a NodeWrapper instance for testing."""
     os.environ["NODE_TLS_REJECT_UNAUTHORIZED"] = "0"
-    wrapper = NodeWrapper()
+    with patch_environment_checks():
+        wrapper = NodeWrapper()
     yield wrapper
-    if wrapper.node_process:
-        wrapper.node_process.terminate()
+    await wrapper.aclose()
 
 @pytest.mark.asyncio
 async def test_initialization():
     """Test NodeWrapper initialization."""
-    with patch("zktls.checks.check_node_version") as mock_node_check, \
-         patch("zktls.checks.check_npm_version") as mock_npm_check, \
-         patch("zktls.checks.check_sdk_installation") as mock_sdk_check, \
-         patch("zktls.checks.check_runtime_environment") as mock_runtime_check, \
+    with patch("zktls.node_wrapper.ensure_environment") as mock_environment_check, \
+         patch("zktls.node_wrapper.check_runtime_environment") as mock_runtime_check, \
          patch("zktls.node_wrapper.NodeWrapper._setup_node_environment") as mock_setup:
         
         # Mock all checks to return success
-        mock_node_check.return_value = (True, "")
-        mock_npm_check.return_value = (True, "")
-        mock_sdk_check.return_value = (True, "")
+        mock_environment_check.return_value = {"node": "v18.0.0", "npm": "9.0.0", "sdk": True}
         mock_runtime_check.return_value = None
         mock_setup.return_value = None
         
@@ -86,14 +189,22 @@ async def test_initialization():
         assert wrapper.app_id is None
         assert wrapper.app_secret is None
 
+@pytest.mark.asyncio
+async def test_create_runs_checks_off_loop():
+    """Test the async factory builds a wrapper."""
+    with patch_environment_checks():
+        wrapper = await NodeWrapper.create()
+    assert isinstance(wrapper, NodeWrapper)
+    assert wrapper.node_process is None
+
 @pytest.mark.asyncio
 async def test_init_success(wrapper):
     """Test successful SDK initialization."""
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"result": True}) + "\n"  # Init response
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
 
         await wrapper.init(TEST_APP_ID, TEST_APP_SECRET)
         assert wrapper.app_id == TEST_APP_ID
@@ -102,34 +213,30 @@ async def test_init_success(wrapper):
 @pytest.mark.asyncio
 async def test_init_failure(wrapper):
     """Test SDK initialization failure."""
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"error": "Init failed"}) + "\n"
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         with pytest.raises(RuntimeError):
             await wrapper.init("invalid_id", "invalid_secret")
 
 @pytest.mark.asyncio
 async def test_encode_request(wrapper):
-    """Test request encoding."""
+    """Test request encoding runs without a Node.js process."""
     request = {
         "url": TEST_URL,
-        "header": {"Accept": "application/json"},
+        "header": "",
         "method": "GET",
         "body": ""
     }
     
-    with patch("subprocess.Popen") as mock_popen:
-        mock_process = create_mock_process([
-            json.dumps({"result": "0x1234567890"}) + "\n"
-        ])
-        mock_popen.return_value = mock_process
-        
-        await wrapper._start_node_process()
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         encoded = await wrapper.encode_request(request)
-        assert encoded == "0x1234567890"
+        assert encoded == encode_request(request)
+        assert not mock_spawn.called
+    assert wrapper.node_process is None
 
 @pytest.mark.asyncio
 async def test_start_attestation_default_params(wrapper):
@@ -146,7 +253,7 @@ async def test_start_attestation_default_params(wrapper):
         {"keyName": "length", "parseType": "number", "parsePath": "$.length"}
     ]
     
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"result": True}) + "\n",  # Init response
             json.dumps({
@@ -157,7 +264,7 @@ async def test_start_attestation_default_params(wrapper):
                 }
             }) + "\n"
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         await wrapper._start_node_process()
         await wrapper.init(TEST_APP_ID, TEST_APP_SECRET)
@@ -180,7 +287,7 @@ async def test_start_attestation_custom_template(wrapper):
         {"keyName": "fact", "parseType": "string", "parsePath": "$.fact"}
     ]
     
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"result": True}) + "\n",  # Init response
             json.dumps({
@@ -191,7 +298,7 @@ async def test_start_attestation_custom_template(wrapper):
                 }
             }) + "\n"
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         await wrapper._start_node_process()
         await wrapper.init(TEST_APP_ID, TEST_APP_SECRET)
@@ -220,7 +327,7 @@ async def test_start_attestation_custom_user(wrapper):
     
     test_address = "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb"
     
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"result": True}) + "\n",  # Init response
             json.dumps({
@@ -231,7 +338,7 @@ async def test_start_attestation_custom_user(wrapper):
                 }
             }) + "\n"
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         await wrapper._start_node_process()
         await wrapper.init(TEST_APP_ID, TEST_APP_SECRET)
@@ -244,6 +351,150 @@ async def test_start_attestation_custom_user(wrapper):
         assert attestation["data"] == "test_data"
         assert attestation["signatures"] == ["0x1234"]
 
+@pytest.mark.asyncio
+async def test_start_attestations_per_item_results(wrapper):
+    """Test a batch returns ordered results with failures in place."""
+    request = {"url": TEST_URL, "header": {}, "method": "GET", "body": ""}
+    items = [
+        (request, []),
+        (request, [], {"user_address": "0xbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbb"}),
+        (request, [], {"template_id": "custom-template"}),
+    ]
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process([
+            json.dumps({"result": True}) + "\n",  # Init response
+            json.dumps({"result": {"data": "first"}}) + "\n",
+            json.dumps({"error": "Attestation failed"}) + "\n",
+            json.dumps({"result": {"data": "third"}}) + "\n"
+        ])
+        mock_spawn.return_value = mock_process
+
+        await wrapper.init("app-id", "app-secret")
+        results = await wrapper.start_attestations(items, max_concurrency=2)
+
+    assert results[0] == {"data": "first"}
+    assert isinstance(results[1], RuntimeError)
+    assert results[2] == {"data": "third"}
+
+    commands = [c for c in mock_process.commands if c["method"] == "startAttestation"]
+    assert commands[1]["params"]["attConditions"]["user"]["address"] == items[1][2]["user_address"]
+    assert commands[2]["params"]["attConditions"]["templateId"] == "custom-template"
+    assert commands[0]["params"]["attConditions"]["host"] == "catfact.ninja"
+
+@pytest.mark.asyncio
+async def test_start_attestations_bounded_concurrency(wrapper):
+    """Test a batch never has more than max_concurrency attestations in flight."""
+    request = {"url": TEST_URL, "header": {}, "method": "GET", "body": ""}
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process([json.dumps({"result": True}) + "\n"])
+        mock_spawn.return_value = mock_process
+        await wrapper.init("app-id", "app-secret")
+
+        batch = asyncio.ensure_future(
+            wrapper.start_attestations([(request, [])] * 5, max_concurrency=2)
+        )
+        answered = 0
+        while answered < 5:
+            for _ in range(10):
+                await asyncio.sleep(0)
+            commands = [c for c in mock_process.commands if c["method"] == "startAttestation"]
+            assert len(commands) - answered <= 2
+            mock_process.reply(commands[answered], {"result": {"data": answered}})
+            answered += 1
+
+        results = await batch
+    assert [result["data"] for result in results] == [0, 1, 2, 3, 4]
+
+async def delayed(value):
+    """Return value after value hundredths of a second"""
+    await asyncio.sleep(value / 100)
+    return value
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered, expected", [(False, [1, 2, 3]), (True, [3, 1, 2])])
+async def test_stream_bounded_order(ordered, expected):
+    """Test results stream in completion order, or input order on request."""
+    pairs = [pair async for pair in stream_bounded(delayed, [3, 1, 2], 3, ordered=ordered)]
+    assert [item for item, _ in pairs] == expected
+    assert all(item == result for item, result in pairs)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [False, True])
+async def test_stream_bounded_backpressure(ordered):
+    """Test items are pulled from the source only when there is room."""
+    pulled = 0
+    yielded = 0
+
+    async def source():
+        nonlocal pulled
+        for value in [5, 1, 1, 1, 1, 1, 1, 1, 5, 1]:
+            pulled += 1
+            assert pulled - yielded <= 2
+            yield value
+
+    async for _ in stream_bounded(delayed, source(), 2, ordered=ordered):
+        yielded += 1
+    assert yielded == pulled == 10
+
+@pytest.mark.asyncio
+async def test_stream_bounded_close_cancels():
+    """Test leaving the stream early cancels the calls still running."""
+    cancelled = []
+
+    async def slow(value):
+        try:
+            await asyncio.sleep(value)
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+        return value
+
+    stream = stream_bounded(slow, [0.05, 10, 10], 3)
+    async for item, result in stream:
+        assert item == result == 0.05
+        break
+    await stream.aclose()
+    assert cancelled == [10, 10]
+
+@pytest.mark.asyncio
+async def test_stream_bounded_cancelled_call():
+    """Test a call cancelled on its own yields CancelledError in place of its result."""
+    async def maybe_cancelled(value):
+        if value is None:
+            asyncio.current_task().cancel()
+            await asyncio.sleep(0)
+        return value
+
+    pairs = [pair async for pair in stream_bounded(maybe_cancelled, [1, None, 2], 3, ordered=True)]
+    assert [item for item, _ in pairs] == [1, None, 2]
+    assert isinstance(pairs[1][1], asyncio.CancelledError)
+    assert [pairs[0][1], pairs[2][1]] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_stream_attestations(wrapper):
+    """Test streamed attestations pair each input with its result or error."""
+    wrapper.app_id, wrapper.app_secret = "test_id", "test_secret"
+    request = {"url": TEST_URL, "method": "GET", "header": {}, "body": ""}
+
+    async def items():
+        yield (request, [])
+        yield (request, [], {"template_id": "other"})
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process([
+            json.dumps({"result": {"attestation": "a"}}),
+            json.dumps({"error": "Attestation failed"}),
+        ])
+        stream = wrapper.stream_attestations(items(), concurrency=1, ordered=True)
+        pairs = [pair async for pair in stream]
+
+    assert pairs[0] == ((request, []), {"attestation": "a"})
+    assert isinstance(pairs[1][1], RuntimeError)
+    commands = [c for c in process.commands if c["method"] == "startAttestation"]
+    assert [c["params"]["attConditions"]["templateId"] for c in commands] == ["test-template", "other"]
+
 @pytest.mark.asyncio
 async def test_verify_attestation(wrapper):
     """Test attestation verification."""
@@ -253,50 +504,720 @@ async def test_verify_attestation(wrapper):
         "signatures": ["0x1234"]
     }
     
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process([
             json.dumps({"result": True}) + "\n"
         ])
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         await wrapper._start_node_process()
         is_verified = await wrapper.verify_attestation(attestation)
         assert is_verified is True
 
+@pytest.mark.asyncio
+async def test_verify_attestations_in_chunks(wrapper):
+    """Test bulk verification sends one message per chunk."""
+    attestations = [{"data": str(i)} for i in range(5)]
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process([
+            json.dumps({"result": [True, False]}) + "\n",
+            json.dumps({"result": [True, True]}) + "\n",
+            json.dumps({"result": [False]}) + "\n"
+        ])
+        mock_spawn.return_value = mock_process
+
+        verified = await wrapper.verify_attestations(attestations, chunk_size=2, max_concurrency=1)
+
+    assert verified == [True, False, True, True, False]
+    commands = [c for c in mock_process.commands if c["method"] == "verifyAttestations"]
+    assert [c["params"]["attestations"] for c in commands] == [
+        attestations[0:2], attestations[2:4], attestations[4:5]
+    ]
+
+@pytest.mark.asyncio
+async def test_verify_attestations_chunk_failure(wrapper):
+    """Test a failed chunk fails bulk verification."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = create_mock_process([
+            json.dumps({"error": "Not initialized"}) + "\n"
+        ])
+        with pytest.raises(RuntimeError, match="Not initialized"):
+            await wrapper.verify_attestations([{"data": "test_data"}])
+
+@pytest.mark.asyncio
+async def test_verify_cache_hits_skip_node():
+    """Test a cached verification result is returned without IPC."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(verify_cache_size=10)
+    attestation = {"data": "test_data", "signatures": ["0x1234"]}
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process([
+            json.dumps({"result": True}) + "\n",
+            json.dumps({"result": [False]}) + "\n"
+        ])
+        mock_spawn.return_value = mock_process
+
+        assert await wrapper.verify_attestation(attestation) is True
+        # Same content, different key order
+        assert await wrapper.verify_attestation({"signatures": ["0x1234"], "data": "test_data"}) is True
+        assert await wrapper.verify_attestations([attestation, {"data": "other"}]) == [True, False]
+
+    methods = [c["method"] for c in mock_process.commands]
+    assert methods.count("verifyAttestation") == 1
+    bulk = [c for c in mock_process.commands if c["method"] == "verifyAttestations"]
+    assert bulk[0]["params"]["attestations"] == [{"data": "other"}]
+    assert wrapper.verify_cache_stats["hits"] == 2
+    assert wrapper.verify_cache_stats["misses"] == 2
+    await wrapper.aclose()
+
+@pytest.mark.asyncio
+async def test_verify_store_refs(tmp_path):
+    """Test stored attestations are verified from their bytes and share cache entries with dicts."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(verify_cache_size=10)
+    stored = {"data": "stored", "signatures": ["0x1234"]}
+    async with AttestationStore(str(tmp_path)) as store:
+        ref = await store.append(stored)
+        other = await store.append({"data": "other"})
+        process = create_mock_process([json.dumps({"result": True}), json.dumps({"result": [False]})])
+        with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+            assert await wrapper.verify_attestation(ref) is True
+            assert await wrapper.verify_attestation(dict(stored)) is True
+            assert await wrapper.verify_attestations([ref, other]) == [True, False]
+
+    assert process.commands[1]["params"] == {"attestation": stored}
+    assert process.commands[2]["params"] == {"attestations": [{"data": "other"}]}
+    assert wrapper.verify_cache_stats["hits"] == 2
+    await wrapper.aclose()
+
+@pytest.mark.asyncio
+async def test_verify_raw_json():
+    """Test serialized attestations are sent as is and share cache entries with dicts."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(verify_cache_size=10)
+    raw = RawJSON(b'{"signatures": ["0x1234"], "data": "raw"}')
+    process = create_mock_process([json.dumps({"result": [True]})])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        assert await wrapper.verify_attestations([raw]) == [True]
+        assert await wrapper.verify_attestation({"data": "raw", "signatures": ["0x1234"]}) is True
+
+    assert process.commands[1]["params"] == {"attestations": [{"signatures": ["0x1234"], "data": "raw"}]}
+    assert wrapper.verify_cache_stats["hits"] == 1
+    await wrapper.aclose()
+
+@pytest.mark.asyncio
+async def test_verify_cache_disabled_by_default(wrapper):
+    """Test the verification cache is opt-in."""
+    assert wrapper.verify_cache is None
+    assert wrapper.verify_cache_stats is None
+
 @pytest.mark.asyncio
 async def test_process_restart_on_error(wrapper):
     """Test Node.js process restart on error."""
-    with patch("subprocess.Popen") as mock_popen:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         # First process fails
-        failed_process = MagicMock()
-        failed_process.poll.return_value = 1
-        failed_process.stdout.readline.return_value = json.dumps({"ready": False}) + "\n"
-        failed_process.stderr.read.return_value = "Process failed"
+        failed_process = FakeProcess(
+            [json.dumps({"ready": False}) + "\n"], returncode=1, stderr="Process failed"
+        )
         
         # Second process succeeds
         success_process = create_mock_process()
         
-        mock_popen.side_effect = [failed_process, success_process]
+        mock_spawn.side_effect = [failed_process, success_process]
         
         # This should trigger a restart
         with pytest.raises(RuntimeError, match="Node.js process failed to start: Process failed"):
             await wrapper._start_node_process()
 
+@pytest.mark.asyncio
+async def test_crash_error_includes_stderr_tail(wrapper):
+    """Test commands lost to a crash report what the process last wrote to stderr."""
+    crashed = FakeProcess(
+        [json.dumps({"ready": True}) + "\n", json.dumps({"result": True}) + "\n", None],
+        stderr="RangeError: WebAssembly.Memory(): could not allocate memory\n"
+    )
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=crashed)):
+        await wrapper._start_node_process()
+        await asyncio.sleep(0)
+        call = asyncio.ensure_future(wrapper.verify_attestation({"data": "lost"}))
+        await asyncio.sleep(0)
+        crashed.stdout.feed_eof()
+        with pytest.raises(RuntimeError, match="(?s)exited unexpectedly.*stderr: RangeError"):
+            await call
+
+@pytest.mark.asyncio
+async def test_respawn_replays_init(wrapper):
+    """Test a crashed process is respawned in the background with init replayed."""
+    crashed = create_mock_process([json.dumps({"result": {"ok": True}})])
+    respawned = create_mock_process([
+        json.dumps({"result": {"ok": True}}),
+        json.dumps({"result": True}),
+    ])
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.side_effect = [crashed, respawned]
+        await wrapper.init("test_id", "test_secret")
+
+        crashed._exit()
+        # The respawn starts without waiting for the next command
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert mock_spawn.call_count == 2
+
+        assert await wrapper.verify_attestation({"data": "test"}) is True
+
+    assert [c["method"] for c in respawned.commands] == ["healthCheck", "init", "verifyAttestation"]
+    assert respawned.commands[1]["params"] == {"appId": "test_id", "appSecret": "test_secret"}
+
+@pytest.mark.asyncio
+async def test_template_registered_once_then_deltas_only(wrapper):
+    """Test a template is registered on first use and later calls send only their deltas."""
+    template = AttestationTemplate(
+        {"url": "https://api.example.com/users/{user}?fields=id", "header": "", "method": "GET", "body": ""},
+        [{"keyName": "id", "parseType": "string", "parsePath": "$.id"}],
+        att_conditions={"sslCipher": "custom-cipher"},
+        template_id="user-template"
+    )
+    attestation = json.dumps({"result": {"data": "attested"}})
+    process = create_mock_process([json.dumps({"result": True}), attestation, attestation])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        wrapper.app_id, wrapper.app_secret = "test_id", "test_secret"
+        assert await wrapper.start_template_attestation(
+            template, url_params={"user": 7}, user_address="0xabc"
+        ) == {"data": "attested"}
+        assert await wrapper.start_template_attestation(template, request_id="req-2") == {"data": "attested"}
+
+    methods = [command["method"] for command in process.commands]
+    assert methods == ["healthCheck", "registerTemplate", "startTemplateAttestation", "startTemplateAttestation"]
+    registered = process.commands[1]["params"]
+    assert registered["id"] == template.id
+    assert registered["request"]["url"] == "https://api.example.com/users/{user}?fields=id"
+    assert registered["attMode"] == {"algorithmType": "proxytls", "resultType": "web"}
+    conditions = registered["attConditions"]
+    assert conditions["host"] == "api.example.com"
+    assert conditions["templateId"] == "user-template"
+    assert conditions["sslCipher"] == "custom-cipher"
+    assert conditions["appParameters"]["appId"] == "test_id"
+    assert process.commands[2]["params"] == {
+        "template": template.id, "urlParams": {"user": 7}, "userAddress": "0xabc"
+    }
+    assert process.commands[3]["params"] == {"template": template.id, "requestId": "req-2"}
+
+@pytest.mark.asyncio
+async def test_templates_registered_again_after_respawn(wrapper):
+    """Test a respawned process gets the templates back after init."""
+    template = AttestationTemplate({"url": "https://example.com/{path}"}, [])
+    crashed = create_mock_process([json.dumps({"result": True})] * 2)
+    respawned = create_mock_process([json.dumps({"result": True})] * 2 + [json.dumps({"result": {"ok": 1}})])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=[crashed, respawned])):
+        await wrapper.init("test_id", "test_secret")
+        await wrapper.register_template(template)
+
+        crashed._exit()
+        assert await wrapper.start_template_attestation(template, url_params={"path": "a"}) == {"ok": 1}
+
+    methods = [command["method"] for command in respawned.commands]
+    assert methods == ["healthCheck", "init", "registerTemplate", "startTemplateAttestation"]
+
+@pytest.mark.asyncio
+async def test_tenant_secret_sent_until_live(wrapper):
+    """Test a tenant's first command carries its secret and runs under its app id."""
+    tenant = Tenant("tenant_id", "tenant_secret")
+    process = create_mock_process([json.dumps({"result": {"ok": 1}}), json.dumps({"result": True})])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        assert await wrapper.start_attestation(
+            {"url": "https://example.com/api"}, [], tenant=tenant
+        ) == {"ok": 1}
+        assert await wrapper.verify_attestation({"data": "x"}, tenant=tenant) is True
+
+    first, second = process.commands[1]["params"], process.commands[2]["params"]
+    assert first["tenant"] == "tenant_id"
+    assert first["tenantSecret"] == "tenant_secret"
+    assert first["attConditions"]["appParameters"]["appId"] == "tenant_id"
+    assert second == {"attestation": {"data": "x"}, "tenant": "tenant_id"}
+
+@pytest.mark.asyncio
+async def test_evicted_tenant_sent_again_with_secret(wrapper):
+    """Test a command for a tenant Node.js evicted is retried with the tenant's secret."""
+    tenant = Tenant("tenant_id", "tenant_secret")
+    evicted = json.dumps({"error": "Unknown tenant: tenant_id", "code": "UNKNOWN_TENANT"})
+    process = create_mock_process([json.dumps({"result": True}), evicted, json.dumps({"result": True})])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        assert await wrapper.verify_attestation({"data": "x"}, tenant=tenant) is True
+        assert await wrapper.verify_attestation({"data": "y"}, tenant=tenant) is True
+
+    sent_secret = [
+        "tenantSecret" in command["params"] for command in process.commands
+        if command["method"] == "verifyAttestation"
+    ]
+    assert sent_secret == [True, False, True]
+
+@pytest.mark.asyncio
+async def test_tenant_templates_registered_per_tenant(wrapper):
+    """Test a template gets one registration per tenant, carrying that tenant's credentials."""
+    template = AttestationTemplate({"url": "https://example.com/{path}"}, [])
+    tenant = Tenant("tenant_id", "tenant_secret")
+    attestation = json.dumps({"result": {"ok": 1}})
+    registered = json.dumps({"result": True})
+    process = create_mock_process([registered, attestation, registered, attestation])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        wrapper.app_id, wrapper.app_secret = "test_id", "test_secret"
+        assert await wrapper.start_template_attestation(template, url_params={"path": "a"}) == {"ok": 1}
+        assert await wrapper.start_template_attestation(
+            template, url_params={"path": "a"}, tenant=tenant
+        ) == {"ok": 1}
+
+    registrations = [c["params"] for c in process.commands if c["method"] == "registerTemplate"]
+    assert [r["id"] for r in registrations] == [template.id, f"{template.id}@tenant_id"]
+    assert registrations[1]["attConditions"]["appParameters"]["appId"] == "tenant_id"
+    assert process.commands[-1]["params"]["template"] == f"{template.id}@tenant_id"
+    assert template.id in wrapper._templates and len(wrapper._templates) == 1
+
+def test_template_host_must_be_fixed():
+    """Test URL placeholders are rejected in the host, which sets the host condition."""
+    with pytest.raises(ValueError, match="path and query"):
+        AttestationTemplate({"url": "https://{tenant}.example.com/api"}, [])
+    first = AttestationTemplate({"url": "https://example.com/api"}, [])
+    second = AttestationTemplate({"url": "https://example.com/api"}, [])
+    assert first.id != second.id
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_respawn(wrapper):
+    """Test callers arriving during a respawn wait for it instead of spawning again."""
+    crashed = create_mock_process([json.dumps({"result": {"ok": True}})])
+    respawned = create_mock_process(
+        [json.dumps({"result": {"ok": True}})] + [json.dumps({"result": True})] * 3
+    )
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.side_effect = [crashed, respawned]
+        await wrapper.init("test_id", "test_secret")
+
+        crashed._exit()
+        results = await asyncio.gather(*(
+            wrapper.verify_attestation({"data": str(i)}) for i in range(3)
+        ))
+
+    assert results == [True] * 3
+    assert mock_spawn.call_count == 2
+    assert [c["method"] for c in respawned.commands].count("init") == 1
+
+@pytest.mark.asyncio
+async def test_no_background_respawn_before_init(wrapper):
+    """Test a process without a session is only restarted on demand."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process()
+        await wrapper._start_node_process()
+        process._exit()
+        for _ in range(10):
+            await asyncio.sleep(0)
+    assert mock_spawn.call_count == 1
+    assert wrapper.node_process is None
+
+@pytest.mark.asyncio
+async def test_metrics_recorded():
+    """Test commands and startup are measured when a metrics registry is given."""
+    metrics = WrapperMetrics()
+    with patch_environment_checks():
+        wrapper = NodeWrapper(metrics=metrics)
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = create_mock_process([
+            json.dumps({"result": True}),
+            json.dumps({"error": "Invalid attestation"}),
+        ])
+        assert await wrapper.verify_attestation({"data": "test"}) is True
+        with pytest.raises(RuntimeError, match="Invalid attestation"):
+            await wrapper.verify_attestation({"data": "bad"})
+        await wrapper.aclose()
+
+    commands = metrics.snapshot()["commands"]
+    verify = commands["verifyAttestation"]
+    assert set(verify["seconds"]) == {"serialize", "write", "pipe", "node", "total"}
+    assert verify["seconds"]["node"]["sum"] == pytest.approx(0.001)
+    assert verify["seconds"]["total"]["count"] == 2
+    assert verify["request_bytes"]["count"] == 2
+    assert verify["response_bytes"]["count"] == 2
+    assert verify["in_flight"] == 0
+    assert verify["errors"] == {"reply": 1}
+    assert "healthCheck" in commands
+    assert metrics.events == {"spawn": 1}
+    assert {"spawn", "ready", "health_check", "total"} <= set(metrics.startup_seconds)
+
+@pytest.mark.asyncio
+async def test_metrics_disabled_by_default(wrapper):
+    """Test no timing is requested from Node.js without a registry."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process([json.dumps({"result": True})])
+        await wrapper.verify_attestation({"data": "test"})
+    assert wrapper.metrics is None
+    assert not any("timing" in command for command in process.commands)
+    assert wrapper._response_sizes == {}
+
+@pytest.mark.asyncio
+async def test_command_timeout_keeps_process(wrapper):
+    """Test a timed-out command is cancelled in Node.js and the process stays up."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process([
+            None,  # The attestation hangs
+            json.dumps({"result": True}),
+            json.dumps({"result": True}),
+        ])
+        with pytest.raises(CommandTimeoutError, match="verifyAttestation timed out"):
+            await wrapper.verify_attestation({"data": "slow"}, timeout=0.01)
+        hung, cancel = process.commands[-2:]
+        assert cancel == {"method": "cancel", "params": {"id": hung["id"]}}
+        assert await wrapper.verify_attestation({"data": "fast"}) is True
+        await asyncio.sleep(0.01)  # Let the background healthCheck finish
+
+        assert wrapper.node_process is process
+        process.terminate.assert_not_called()
+    await wrapper.aclose()
+
+@pytest.mark.asyncio
+async def test_default_command_timeout():
+    """Test command_timeout applies to calls without their own timeout."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(command_timeout=0.01)
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = create_mock_process([None, json.dumps({"result": True})])
+        with pytest.raises(asyncio.TimeoutError):
+            await wrapper.verify_attestation({"data": "slow"})
+        await wrapper.aclose()
+
+@pytest.mark.asyncio
+async def test_cancelled_command_notifies_node(wrapper):
+    """Test cancelling a caller abandons only its own command."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process([None])
+        await wrapper._start_node_process()
+        task = asyncio.ensure_future(wrapper.verify_attestation({"data": "slow"}))
+        await asyncio.sleep(0)
+        request_id = process.commands[-1]["id"]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert process.commands[-1] == {"method": "cancel", "params": {"id": request_id}}
+    assert wrapper.node_process is process
+    assert wrapper._pending == {}
+
+@pytest.mark.asyncio
+async def test_unresponsive_process_replaced_after_timeout(wrapper):
+    """Test a process that also misses the follow-up healthCheck is discarded."""
+    wrapper.HEALTH_CHECK_TIMEOUT = 0.01
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_spawn.return_value = process = create_mock_process([None, None])
+        with pytest.raises(CommandTimeoutError):
+            await wrapper.verify_attestation({"data": "slow"}, timeout=0.01)
+        await asyncio.sleep(0.05)
+
+    assert wrapper.node_process is None
+    process.terminate.assert_called_once()
+
 @pytest.mark.asyncio
 async def test_cleanup():
     """Test proper cleanup of Node.js process."""
-    wrapper = NodeWrapper()
-    with patch("subprocess.Popen") as mock_popen:
+    with patch_environment_checks():
+        wrapper = NodeWrapper()
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
         mock_process = create_mock_process()
-        mock_popen.return_value = mock_process
+        mock_spawn.return_value = mock_process
         
         await wrapper._start_node_process()
         assert wrapper.node_process is not None
         
         # Cleanup
-        wrapper.__del__()
+        await wrapper.aclose()
         assert mock_process.terminate.called
+        assert wrapper.node_process is None
+
+@pytest.mark.asyncio
+async def test_command_does_not_block_event_loop(wrapper):
+    """Test other coroutines keep running while a command is pending."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process()
+        mock_spawn.return_value = mock_process
+
+        await wrapper._start_node_process()
+        pending = asyncio.ensure_future(wrapper.verify_attestation({"data": "test_data"}))
+
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert mock_process.commands[-1]["method"] == "verifyAttestation"
+        assert not pending.done()
+
+        mock_process.reply(mock_process.commands[-1], {"result": True})
+        assert await pending is True
+
+@pytest.mark.asyncio
+async def test_concurrent_commands_routed_by_id(wrapper):
+    """Test responses arriving out of order reach the right caller."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process()
+        mock_spawn.return_value = mock_process
+
+        await wrapper._start_node_process()
+        first = asyncio.ensure_future(wrapper.verify_attestation({"data": "first"}))
+        second = asyncio.ensure_future(wrapper.verify_attestation({"data": "second"}))
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        first_command, second_command = mock_process.commands[-2:]
+        assert first_command["id"] != second_command["id"]
+        mock_process.reply(second_command, {"result": False})
+        mock_process.reply(first_command, {"result": True})
+
+        assert await first is True
+        assert await second is False
+
+@pytest.mark.asyncio
+async def test_process_exit_fails_in_flight_commands(wrapper):
+    """Test in-flight commands fail when the Node.js process dies."""
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_spawn:
+        mock_process = create_mock_process()
+        mock_spawn.return_value = mock_process
+
+        await wrapper._start_node_process()
+        pending = asyncio.ensure_future(wrapper.verify_attestation({"data": "test_data"}))
+        await asyncio.sleep(0)
+        mock_process.stdout.feed_eof()
+
+        with pytest.raises(RuntimeError, match="exited unexpectedly"):
+            await pending
+        assert wrapper.node_process is None
+
+@pytest.mark.asyncio
+async def test_length_prefixed_framing_negotiated():
+    """Test the binary framing is negotiated when wrapper.js offers it."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(framing=LENGTH_PREFIXED)
+    responses = [
+        json.dumps({"ready": True, "framings": ["json-lines", LENGTH_PREFIXED]}),
+        json.dumps({"result": True}),
+        json.dumps({"result": {"verified": True}}),
+    ]
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = process = FakeProcess(responses)
+        assert await wrapper._send_command("verifyAttestation", {"attestation": {}})
+        await wrapper.aclose()
+
+    assert [command["method"] for command in process.commands] == [
+        "setFraming", "healthCheck", "verifyAttestation"
+    ]
+    assert isinstance(process.framing, LengthPrefixedFraming)
+
+@pytest.mark.asyncio
+async def test_framing_falls_back_to_json_lines(wrapper):
+    """Test an older wrapper.js without framing support keeps newline JSON."""
+    wrapper.framing = LENGTH_PREFIXED
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = process = create_mock_process()
+        await wrapper._start_node_process()
+
+    assert [command["method"] for command in process.commands] == ["healthCheck"]
+    assert isinstance(wrapper._framing, LineFraming)
+
+@pytest.mark.asyncio
+async def test_large_messages_sent_out_of_band(tmp_path):
+    """Test messages over oob_threshold travel in payload files that both sides remove."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(oob_threshold=1000, oob_dir=str(tmp_path))
+    attestation = {"data": "x" * 5000}
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = process = create_mock_process([
+            json.dumps({"result": True}),
+            json.dumps({"result": attestation}),
+        ])
+        assert await wrapper._send_command("verifyAttestation", {"attestation": attestation})
+        assert process.commands[-1]["params"] == {"attestation": attestation}
+
+        # A large reply arrives as a frame naming its payload file
+        def reply(command, response):
+            path = tmp_path / "zktls-4242-1.json"
+            path.write_bytes(dumps({"id": command["id"], **response}))
+            process.stdout.feed_data(process.framing.encode(
+                {"id": command["id"], "messageFile": str(path)}
+            ))
+        process.reply = reply
+        assert await wrapper._send_command("healthCheck", {}) == attestation
+        await wrapper.aclose()
+
+    assert "--oob-threshold=1000" in mock_exec.call_args[0]
+    assert list(tmp_path.iterdir()) == []
+
+    with patch_environment_checks(), pytest.raises(ValueError):
+        NodeWrapper(oob_threshold=0)
+
+@pytest.mark.asyncio
+async def test_reply_payload_file_outside_oob_dir_refused(tmp_path):
+    """Test a reply naming a file outside oob_dir fails without the file being read or removed."""
+    payloads = tmp_path / "payloads"
+    payloads.mkdir()
+    outside = tmp_path / "zktls-4242-1.json"
+    outside.write_bytes(dumps({"result": "secret"}))
+    with patch_environment_checks():
+        wrapper = NodeWrapper(oob_threshold=1000, oob_dir=str(payloads))
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = process = create_mock_process()
+        process.reply = lambda command, response: process.stdout.feed_data(process.framing.encode(
+            {"id": command["id"], "messageFile": str(outside)}
+        ))
+        with pytest.raises(RuntimeError, match="Lost reply: Not a payload file"):
+            await wrapper._send_command("healthCheck", {})
+        await wrapper.aclose()
+
+    assert outside.exists()
+
+@pytest.mark.asyncio
+async def test_socket_connection_reused_and_remade(tmp_path):
+    """Test a daemon connection serves every command and is made again, init replayed, if it drops."""
+    received = []  # (connection number, method)
+    connections = []
+
+    async def serve(reader, writer):
+        connections.append(writer)
+        number = len(connections)
+        writer.write(b'{"ready": true}\n')
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = json.loads(line)
+            received.append((number, command["method"]))
+            writer.write(json.dumps({"id": command["id"], "result": True}).encode() + b"\n")
+
+    path = str(tmp_path / "zktls.sock")
+    server = await asyncio.start_unix_server(serve, path)
+    wrapper = NodeWrapper(socket_path=path)  # No installation checks to patch
+    await wrapper.init(TEST_APP_ID, TEST_APP_SECRET)
+    await wrapper._send_command("healthCheck", {})
+    connections[0].close()
+    await asyncio.sleep(0.1)  # The reader notices and reconnects in the background
+    await wrapper._send_command("healthCheck", {})
+    await wrapper.aclose()
+    server.close()
+    await server.wait_closed()
+
+    assert received == [
+        (1, "healthCheck"), (1, "init"), (1, "healthCheck"),
+        (2, "healthCheck"), (2, "init"), (2, "healthCheck"),
+    ]
+    with pytest.raises(RuntimeError, match="daemon"):
+        wrapper.node_command()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("announce", [True, False])
+async def test_socket_client_uses_daemon_payload_files(tmp_path, announce):
+    """Test a daemon client sends payload files to the directory the daemon announces, if any."""
+    daemon_dir = tmp_path / "daemon"
+    daemon_dir.mkdir()
+    received = []
+
+    async def serve(reader, writer):
+        oob = {"threshold": 1000, "dir": str(daemon_dir)} if announce else None
+        writer.write(json.dumps({"ready": True, "oob": oob}).encode() + b"\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = json.loads(line)
+            if "messageFile" in command:
+                command, _ = read_payload_file(str(daemon_dir), command["messageFile"])
+                received.append("file")
+            else:
+                received.append("socket")
+            writer.write(json.dumps({"id": command["id"], "result": True}).encode() + b"\n")
+
+    path = str(tmp_path / "zktls.sock")
+    server = await asyncio.start_unix_server(serve, path)
+    wrapper = NodeWrapper(socket_path=path, oob_threshold=10, oob_dir=str(tmp_path))
+    attestation = {"data": "x" * 5000}
+    assert await wrapper._send_command("verifyAttestation", {"attestation": attestation})
+    await wrapper.aclose()
+    server.close()
+    await server.wait_closed()
+
+    assert received == ["socket", "file" if announce else "socket"]
+    assert list(daemon_dir.iterdir()) == []
+
+def test_unknown_framing_rejected():
+    """Test an unknown framing name fails at construction."""
+    with patch_environment_checks(), pytest.raises(ValueError, match="Unknown framing"):
+        NodeWrapper(framing="msgpack")
 
 def test_environment_check():
     """Test environment variable setting."""
     assert os.environ.get("NODE_TLS_REJECT_UNAUTHORIZED") == "0"
+
+@pytest.mark.asyncio
+async def test_max_old_space_size_passed_to_node():
+    """Test the V8 heap cap is passed on the Node.js command line."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(max_old_space_size=512)
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=create_mock_process())) as mock_exec:
+        await wrapper._start_node_process()
+    args = mock_exec.call_args[0]
+    assert "--max-old-space-size=512" in args
+    assert args.index("--max-old-space-size=512") < args.index("wrapper.js")
+    await wrapper.aclose()
+
+    with patch_environment_checks(), pytest.raises(ValueError):
+        NodeWrapper(max_old_space_size=0)
+
+@pytest.mark.asyncio
+async def test_stats_counts_requests_per_process(wrapper):
+    """Test stats reports Node.js memory use and the requests served by the current process."""
+    memory = {"rss": 50_000_000, "heapTotal": 20_000_000, "heapUsed": 10_000_000, "uptime": 3.5}
+    first = create_mock_process([json.dumps({"result": True}) + "\n"] * 2 + [json.dumps({"result": memory}) + "\n"])
+    second = create_mock_process()
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=[first, second])):
+        await wrapper.verify_attestation({"data": "1"})
+        await wrapper.verify_attestation({"data": "2"})
+        stats = await wrapper.stats()
+        assert stats == dict(memory, pid=4242, requests_served=2)
+
+        # A new process starts counting from zero
+        first.stdout.feed_eof()
+        await asyncio.sleep(0)
+        await wrapper._start_node_process()
+        assert wrapper.requests_served == 0
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_identical_attestations():
+    """Test concurrent identical attestations share one Node.js command."""
+    with patch_environment_checks():
+        wrapper = NodeWrapper(single_flight=True)
+    wrapper.app_id, wrapper.app_secret = "test_id", "test_secret"
+    request = {"url": "https://example.com/api", "header": "", "method": "GET", "body": ""}
+    process = create_mock_process([None, None])
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        await wrapper._start_node_process()
+        calls = [asyncio.ensure_future(wrapper.start_attestation(request, [])) for _ in range(3)]
+        calls.append(asyncio.ensure_future(wrapper.start_attestation(request, [], user_address="0xabc")))
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        commands = [c for c in process.commands if c["method"] == "startAttestation"]
+        assert len(commands) == 2
+        for command in commands:
+            process.reply(command, {"result": {"recipient": command["params"]["userAddress"]}})
+        results = await asyncio.gather(*calls)
+
+    assert [result["recipient"][-3:] for result in results] == ["000", "000", "000", "abc"]
+    assert wrapper.single_flight_stats == {"calls": 2, "shared": 2, "in_flight": 0}
+    await wrapper.aclose()
+
+def test_attestation_key_ignores_per_call_fields():
+    """Test the default single-flight key ignores request ids and request times only."""
+    params = {
+        "request": {"url": "https://example.com"},
+        "attConditions": {"requestid": "test-1", "getdatatime": "1000", "host": "example.com"},
+    }
+    later = {
+        "request": {"url": "https://example.com"},
+        "attConditions": {"requestid": "test-2", "getdatatime": "2000", "host": "example.com"},
+    }
+    assert attestation_key(params) == attestation_key(later)
+    assert attestation_key({"template": "t", "requestId": "a"}) == attestation_key({"template": "t"})
+    other_host = dict(later, attConditions=dict(later["attConditions"], host="other.com"))
+    assert attestation_key(params) != attestation_key(other_host)
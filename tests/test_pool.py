@@ -0,0 +1,217 @@
+"""
+Unit tests for the NodeWorkerPool.
+
+The Node.js processes are replaced with the fakes from test_node_wrapper.
+"""
+
+import json
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from zktls.metrics import WrapperMetrics
+from zktls.pool import NodeWorkerPool
+from zktls.tenant import Tenant
+from tests.test_node_wrapper import create_mock_process, patch_environment_checks
+
+
+def create_pool(size, **kwargs):
+    with patch_environment_checks():
+        return NodeWorkerPool(size, **kwargs)
+
+@pytest.mark.asyncio
+async def test_default_size_is_cpu_count():
+    """Test the pool defaults to one worker per CPU."""
+    with patch("os.cpu_count", return_value=3):
+        pool = create_pool(None)
+    assert pool.size == 3
+    assert len(pool.workers) == 3
+
+def test_invalid_size():
+    """Test a pool needs at least one worker."""
+    with pytest.raises(ValueError):
+        create_pool(0)
+
+@pytest.mark.asyncio
+async def test_init_runs_on_every_worker():
+    """Test init is sent to all workers."""
+    pool = create_pool(2)
+    processes = [
+        create_mock_process([json.dumps({"result": True}) + "\n"]) for _ in range(2)
+    ]
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=processes)):
+        assert await pool.init("app-id", "app-secret") is True
+
+    for process in processes:
+        assert process.commands[-1]["method"] == "init"
+        assert process.commands[-1]["params"] == {"appId": "app-id", "appSecret": "app-secret"}
+    assert all(worker.app_id == "app-id" for worker in pool.workers)
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_init_failure():
+    """Test a failing worker makes init fail."""
+    pool = create_pool(2)
+    processes = [
+        create_mock_process([json.dumps({"result": True}) + "\n"]),
+        create_mock_process([json.dumps({"error": "Init failed"}) + "\n"]),
+    ]
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=processes)):
+        with pytest.raises(RuntimeError, match="1 of 2 workers"):
+            await pool.init("app-id", "app-secret")
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_dispatch_to_least_loaded_worker():
+    """Test concurrent calls spread over the workers."""
+    pool = create_pool(2)
+    processes = [create_mock_process() for _ in range(2)]
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=processes)):
+        for worker in pool.workers:
+            await worker._start_node_process()
+
+        calls = [
+            asyncio.ensure_future(pool.verify_attestation({"data": str(i)})) for i in range(4)
+        ]
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        for process in processes:
+            verify_commands = [c for c in process.commands if c["method"] == "verifyAttestation"]
+            assert len(verify_commands) == 2
+            for command in verify_commands:
+                process.reply(command, {"result": True})
+
+        assert await asyncio.gather(*calls) == [True] * 4
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_dead_worker_is_skipped():
+    """Test a worker whose process died is taken out of rotation."""
+    pool = create_pool(2)
+    processes = [create_mock_process() for _ in range(2)]
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=processes)):
+        for worker in pool.workers:
+            await worker._start_node_process()
+
+        failing = asyncio.ensure_future(pool.verify_attestation({"data": "lost"}))
+        await asyncio.sleep(0)
+        dead = next(p for p in processes if p.commands[-1]["method"] == "verifyAttestation")
+        dead.stdout.feed_eof()
+        with pytest.raises(RuntimeError):
+            await failing
+
+        alive = next(p for p in processes if p is not dead)
+        calls = [asyncio.ensure_future(pool.verify_attestation({"data": str(i)})) for i in range(3)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        verify_commands = [c for c in alive.commands if c["method"] == "verifyAttestation"]
+        assert len(verify_commands) == 3
+        for command in verify_commands:
+            alive.reply(command, {"result": True})
+        assert await asyncio.gather(*calls) == [True] * 3
+    await pool.aclose()
+
+def test_supervisor_options_validated():
+    """Test recycling thresholds need sensible values."""
+    with pytest.raises(ValueError):
+        create_pool(1, max_requests=0)
+    with pytest.raises(ValueError):
+        create_pool(1, health_check_interval=0)
+    with pytest.raises(ValueError, match="health_check_interval"):
+        create_pool(1, max_memory_mb=512)
+
+@pytest.mark.asyncio
+async def test_worker_recycled_after_max_requests():
+    """Test a worker is replaced once it has served max_requests, the replacement starting first."""
+    pool = create_pool(1, max_requests=2)
+    old = create_mock_process([json.dumps({"result": True}) + "\n"] * 2)
+    new = create_mock_process([json.dumps({"result": True}) + "\n"])
+    with patch_environment_checks(), \
+         patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=[old, new])):
+        old_wrapper = pool.workers[0]
+        assert await pool.verify_attestation({"data": "1"}) is True
+        assert not pool._recycle_tasks
+        assert await pool.verify_attestation({"data": "2"}) is True
+        await asyncio.wait(pool._recycle_tasks)
+
+        assert pool.workers[0] is not old_wrapper
+        assert pool.workers[0].node_process is new
+        old.terminate.assert_called_once()
+        assert await pool.verify_attestation({"data": "3"}) is True
+        assert new.commands[-1]["method"] == "verifyAttestation"
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_supervisor_recycles_worker_over_memory_cap():
+    """Test the supervisor records worker stats and recycles a worker using too much memory."""
+    metrics = WrapperMetrics()
+    pool = create_pool(1, max_memory_mb=100, health_check_interval=0.01, metrics=metrics)
+    init = json.dumps({"result": True}) + "\n"
+    bloated = json.dumps({"result": {"rss": 200 * 1024 * 1024, "heapUsed": 1}}) + "\n"
+    lean = json.dumps({"result": {"rss": 50 * 1024 * 1024, "heapUsed": 1}}) + "\n"
+    old = create_mock_process([init, bloated])
+    new = create_mock_process([init] + [lean] * 100)
+    with patch_environment_checks(), \
+         patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=[old, new])):
+        await pool.init("app-id", "app-secret")
+        for _ in range(100):
+            if pool.workers[0].node_process is new and pool.worker_stats()[0].get("rss"):
+                break
+            await asyncio.sleep(0.01)
+
+        assert new.commands[1]["method"] == "init"
+        assert new.commands[1]["params"] == {"appId": "app-id", "appSecret": "app-secret"}
+        old.terminate.assert_called_once()
+        stats = pool.worker_stats()[0]
+        assert stats["rss"] == 50 * 1024 * 1024
+        assert stats["pid"] == 4242 and stats["load"] == 0
+        assert metrics.events["recycle"] == 1
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_single_flight_spans_workers():
+    """Test identical attestations coalesce even though they would go to different workers."""
+    pool = create_pool(2, single_flight=True)
+    processes = [create_mock_process() for _ in range(2)]
+    request = {"url": "https://example.com/api", "header": "", "method": "GET", "body": ""}
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(side_effect=processes)):
+        for worker in pool.workers:
+            worker.app_id, worker.app_secret = "app-id", "app-secret"
+            await worker._start_node_process()
+
+        calls = [asyncio.ensure_future(pool.start_attestation(request, [])) for _ in range(4)]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        commands = [
+            (process, command) for process in processes for command in process.commands
+            if command["method"] == "startAttestation"
+        ]
+        assert len(commands) == 1
+        process, command = commands[0]
+        process.reply(command, {"result": {"data": "shared"}})
+        assert await asyncio.gather(*calls) == [{"data": "shared"}] * 4
+    assert pool.single_flight_stats["shared"] == 3
+    await pool.aclose()
+
+@pytest.mark.asyncio
+async def test_tenants_do_not_share_attestations():
+    """Test single-flight keeps identical attestations of different tenants apart."""
+    pool = create_pool(1, single_flight=True)
+    process = create_mock_process()
+    request = {"url": "https://example.com/api", "header": "", "method": "GET", "body": ""}
+    tenants = [Tenant("first", "secret"), Tenant("second", "secret")]
+    with patch("asyncio.create_subprocess_exec", new=AsyncMock(return_value=process)):
+        calls = [
+            asyncio.ensure_future(pool.start_attestation(request, [], tenant=tenant))
+            for tenant in tenants for _ in range(2)
+        ]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        for command in [c for c in process.commands if c["method"] == "startAttestation"]:
+            process.reply(command, {"result": {"data": "attested"}})
+
+        assert await asyncio.gather(*calls) == [{"data": "attested"}] * 4
+    attested = [c["params"]["tenant"] for c in process.commands if c["method"] == "startAttestation"]
+    assert sorted(attested) == ["first", "second"]
+    assert pool.single_flight_stats["shared"] == 2
+    await pool.aclose()
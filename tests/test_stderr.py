@@ -0,0 +1,62 @@
+"""
+Unit tests for the Node.js stderr drain.
+"""
+
+import asyncio
+import logging
+import pytest
+from zktls.stderr import StderrDrain
+
+def feed(*chunks, eof=True):
+    reader = asyncio.StreamReader()
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    if eof:
+        reader.feed_eof()
+    return reader
+
+@pytest.mark.asyncio
+async def test_ring_buffer_keeps_recent_lines():
+    """Test lines split across chunks are joined and only the newest are kept."""
+    drain = StderrDrain(max_lines=3)
+    drain.start(feed(b"one\ntw", b"o\nthree\n\nfour\nfi", b"ve"))
+    assert await drain.finish(1.0) == "three\nfour\nfive"
+    assert drain.tail(2) == "four\nfive"
+
+@pytest.mark.asyncio
+async def test_long_lines_truncated():
+    """Test an overlong line is cut without buffering it whole."""
+    drain = StderrDrain(max_line_length=10)
+    drain.CHUNK_SIZE = 8
+    drain.start(feed(b"x" * 45 + b"\nshort\n" + b"y" * 12 + b"\n"))
+    await drain.finish(1.0)
+    assert list(drain.lines) == ["x" * 10 + "...", "short", "y" * 10 + "..."]
+
+@pytest.mark.asyncio
+async def test_logging_rate_limited(caplog):
+    """Test lines beyond the burst are counted instead of logged."""
+    drain = StderrDrain(pid=7, rate=0.0, burst=2)
+    with caplog.at_level(logging.WARNING, logger="zktls.node"):
+        drain.start(feed(b"a\nb\nc\nd\ne\n"))
+        await drain.finish(1.0)
+        assert [record.getMessage() for record in caplog.records] == [
+            "Node.js[7] stderr: a", "Node.js[7] stderr: b"
+        ]
+        assert drain.suppressed == 3
+        assert len(drain.lines) == 5
+
+        drain._tokens = 1.0
+        drain._add(b"f")
+        assert caplog.records[-2].getMessage() == "Node.js[7] stderr: 3 lines not logged (rate limited)"
+        assert caplog.records[-1].getMessage() == "Node.js[7] stderr: f"
+        assert drain.suppressed == 0
+
+@pytest.mark.asyncio
+async def test_finish_does_not_wait_for_open_stream():
+    """Test the error path returns the tail even if stderr stays open."""
+    drain = StderrDrain()
+    drain.start(feed(b"partial output\n", eof=False))
+    await asyncio.sleep(0)
+    assert await drain.finish(0.01) == "partial output"
+    await drain.aclose(0.01)
+    assert drain.task.done()
@@ -0,0 +1,114 @@
+"""
+Unit tests for the on-disk attestation store.
+"""
+
+import asyncio
+import json
+import os
+import pytest
+from zktls.cache import canonical_digest
+from zktls.store import AttestationStore, attestation_keys
+
+def make_attestation(i, host="api.example.com", template="user-template"):
+    return {
+        "recipient": f"0xAbC{i % 4:037d}",
+        "request": {"url": f"https://{host}/users/{i}", "header": "", "method": "GET", "body": ""},
+        "reponseResolve": [],
+        "data": json.dumps({"id": i}),
+        "attConditions": json.dumps({"requestid": f"req-{i}", "templateId": template}),
+        "timestamp": 1_700_000_000_000 + i,
+        "additionParams": "",
+        "attestors": [],
+        "signatures": ["0x00"],
+    }
+
+def test_attestation_keys():
+    """Test index keys come from the conditions, URL, recipient and timestamp."""
+    assert attestation_keys(make_attestation(5)) == {
+        "request_id": "req-5",
+        "host": "api.example.com",
+        "template_id": "user-template",
+        "user_address": f"0xabc{1:037d}",
+        "time": 1_700_000_000_005,
+    }
+    assert attestation_keys({"attConditions": "not json"})["request_id"] is None
+
+@pytest.mark.asyncio
+async def test_append_and_find(tmp_path):
+    """Test lookups by each key, combinations and time ranges return the stored attestations."""
+    async with AttestationStore(str(tmp_path)) as store:
+        refs = await store.append_many([
+            make_attestation(i, host="a.example.com" if i % 2 else "b.example.com") for i in range(20)
+        ])
+        assert len(store) == 20
+        assert store.get(refs[3]) == make_attestation(3, host="a.example.com")
+
+        assert store.find(request_id="req-7") == [refs[7]]
+        assert store.find(host="a.example.com") == refs[1::2]
+        assert store.find(user_address=f"0xABC{2:037d}") == refs[2::4]
+        assert store.find(host="b.example.com", user_address=f"0xabc{2:037d}") == refs[2::4]
+        assert store.find(template_id="other") == []
+        assert store.find(since=1_700_000_000_005, until=1_700_000_000_008) == refs[5:8]
+        assert store.find(host="a.example.com", since=1_700_000_000_010) == refs[11::2]
+        assert store.find(limit=3) == refs[:3]
+
+@pytest.mark.asyncio
+async def test_ref_bytes_are_canonical(tmp_path):
+    """Test a ref's digest matches canonical_digest, so verify caches share keys."""
+    async with AttestationStore(str(tmp_path)) as store:
+        attestation = make_attestation(1)
+        ref = await store.append(attestation, keys={"request_id": "override"})
+        assert ref.digest() == canonical_digest(attestation)
+        assert store.find(request_id="override") == [ref]
+
+@pytest.mark.asyncio
+async def test_segments_and_reopen(tmp_path):
+    """Test records roll over into new segments and are found again after reopening."""
+    store = AttestationStore(str(tmp_path), segment_size=2000)
+    refs = await store.append_many([make_attestation(i) for i in range(10)])
+    await store.aclose()
+    assert len({ref.segment for ref in refs}) > 1
+    assert all(os.path.exists(tmp_path / f"{ref.segment:08d}.idx") for ref in refs)
+
+    async with AttestationStore(str(tmp_path), segment_size=2000) as store:
+        assert len(store) == 10
+        assert store.get(store.find(request_id="req-9")[0]) == make_attestation(9)
+        ref = await store.append(make_attestation(10))
+        assert store.find(since=1_700_000_000_009) == [store.find(request_id="req-9")[0], ref]
+
+@pytest.mark.asyncio
+async def test_unindexed_tail_scanned_and_torn_record_cut(tmp_path):
+    """Test records without an index are scanned on open and a partial last record is dropped."""
+    store = AttestationStore(str(tmp_path))
+    await store.append_many([make_attestation(i) for i in range(3)])
+    # No aclose(), as after a crash: the active segment has no index yet
+    store._file.close()
+    log = tmp_path / "00000001.log"
+    size = log.stat().st_size
+    with open(log, "ab") as f:
+        f.write(b"\x00\x00\x01\x00{\"recipient\"")
+
+    async with AttestationStore(str(tmp_path)) as store:
+        assert len(store) == 3
+        assert log.stat().st_size == size
+        ref = await store.append(make_attestation(3))
+        assert store.get(ref) == make_attestation(3)
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_share_fsyncs(tmp_path, monkeypatch):
+    """Test appends arriving while a batch syncs are committed together."""
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or real_fsync(fd))
+    async with AttestationStore(str(tmp_path)) as store:
+        refs = await asyncio.gather(*(store.append(make_attestation(i)) for i in range(200)))
+        assert [store.get(ref)["timestamp"] for ref in refs] == [1_700_000_000_000 + i for i in range(200)]
+        assert len(fsyncs) < 10
+
+@pytest.mark.asyncio
+async def test_closed_store_rejects_appends(tmp_path):
+    """Test append fails once the store is closed."""
+    store = AttestationStore(str(tmp_path))
+    await store.aclose()
+    with pytest.raises(RuntimeError, match="closed"):
+        await store.append(make_attestation(0))
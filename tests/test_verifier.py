@@ -0,0 +1,138 @@
+"""
+Unit tests for the pure-Python attestation verifier.
+
+Attestations are signed with the fixtures' throwaway key. VERIFY_CASES records each
+fixture's signer, its verdict with that key trusted and the verdict
+PrimusCoreTLS.verifyAttestation gives it; when Node.js and the SDK are
+installed, the cross-check asks the SDK for those verdicts again.
+"""
+
+import json
+import shutil
+import subprocess
+import pytest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from zktls.checks import find_sdk_package
+from zktls.encoding import encode_attestation
+from zktls.verifier import (
+    DEFAULT_ATTESTORS, DEVELOPMENT_ATTESTOR, PRODUCTION_ATTESTOR, recover_signer, verify_attestation,
+    verify_attestations
+)
+from tests.fixtures import ATTESTATION, SIGNED, TEST_ATTESTOR
+
+SIGNATURE = (
+    "0x04c7dabc72736cda96c65bb14971fa580d0e4dee36887983338f0f42a8b8ab3c"
+    "451b1141d06d31a609f804a68ab4540080aa62f41fdb898b37761dea2f446ae81c"
+)
+
+# (attestation, recovered signer, verified with TEST_ATTESTOR trusted, SDK verdict)
+# The SDK only trusts its own attestors, so it rejects every fixture here
+VERIFY_CASES = [
+    (dict(ATTESTATION, signatures=[SIGNATURE]), TEST_ATTESTOR, True, False),
+    (dict(ATTESTATION, signatures=[SIGNATURE[:-2] + "01"]), TEST_ATTESTOR, True, False),
+    (
+        dict(ATTESTATION, data="tampered", signatures=[SIGNATURE]),
+        "0x651923970d05386d88571aFf7bEaf7ca0595f57D", False, False
+    ),
+    (dict(ATTESTATION, signatures=["0x1234"]), None, False, False),
+]
+
+def test_signature_fixture():
+    """Test signing is deterministic and reproduces the recorded signature."""
+    assert SIGNED["signatures"] == [SIGNATURE]
+
+@pytest.mark.parametrize("attestation,signer,trusted,sdk_verified", VERIFY_CASES)
+def test_verify_cases(attestation, signer, trusted, sdk_verified):
+    """Test the Python verifier agrees with each recorded verdict."""
+    if signer is not None:
+        digest = bytes.fromhex(encode_attestation(attestation)[2:])
+        assert recover_signer(digest, attestation["signatures"][0]) == signer
+    assert verify_attestation(attestation, attestors=[TEST_ATTESTOR]) is trusted
+    assert verify_attestation(attestation) is sdk_verified
+
+def test_recover_signer():
+    """Test the signer of an attestation is recovered."""
+    digest = bytes.fromhex(encode_attestation(SIGNED)[2:])
+    assert recover_signer(digest, SIGNED["signatures"][0]) == TEST_ATTESTOR
+
+def test_recover_signer_zero_based_v():
+    """Test v may be 0/1 as well as 27/28."""
+    digest = bytes.fromhex(encode_attestation(SIGNED)[2:])
+    raw = bytes.fromhex(SIGNED["signatures"][0][2:])
+    signature = "0x" + (raw[:64] + bytes([raw[64] - 27])).hex()
+    assert recover_signer(digest, signature) == TEST_ATTESTOR
+
+def test_verify_trusted_attestor():
+    """Test an attestation signed by a trusted attestor verifies."""
+    assert verify_attestation(SIGNED, attestors=[TEST_ATTESTOR]) is True
+    assert verify_attestation(SIGNED, attestors=[TEST_ATTESTOR.lower()]) is True
+
+def test_verify_untrusted_attestor():
+    """Test the default attestor set rejects other signers."""
+    assert TEST_ATTESTOR.lower() not in DEFAULT_ATTESTORS
+    assert verify_attestation(SIGNED) is False
+
+def test_default_attestors_production_only():
+    """Test only the production attestor is trusted by default, as the SDK does."""
+    assert DEFAULT_ATTESTORS == {PRODUCTION_ATTESTOR}
+    assert DEVELOPMENT_ATTESTOR not in DEFAULT_ATTESTORS
+
+@pytest.mark.parametrize("attestation", [
+    dict(SIGNED, data="tampered"),
+    dict(SIGNED, signatures=[]),
+    dict(SIGNED, signatures=["0x1234"]),
+    dict(SIGNED, recipient="not-an-address"),
+])
+def test_verify_invalid(attestation):
+    """Test tampered or malformed attestations verify as False."""
+    assert verify_attestation(attestation, attestors=[TEST_ATTESTOR]) is False
+
+@pytest.mark.parametrize("executor_class", [None, ThreadPoolExecutor, ProcessPoolExecutor])
+def test_verify_attestations(executor_class):
+    """Test batch verification, in the caller or on an executor."""
+    attestations = [SIGNED, dict(SIGNED, data="tampered")] * 3
+    if executor_class is None:
+        verified = verify_attestations(attestations, attestors=[TEST_ATTESTOR])
+    else:
+        with executor_class(max_workers=2) as executor:
+            verified = verify_attestations(
+                attestations, attestors=[TEST_ATTESTOR], executor=executor, chunk_size=2
+            )
+    assert verified == [True, False] * 3
+
+NODE_SCRIPT = """
+const { ethers } = require('ethers');
+const { PrimusCoreTLS } = require('@primuslabs/zktls-core-sdk');
+const { encodeAttestation } = require('@primuslabs/zktls-core-sdk/dist/utils');
+const attestations = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const tls = new PrimusCoreTLS();
+const attempt = (fn, fallback) => { try { return fn(); } catch (e) { return fallback; } };
+const results = attestations.map((attestation) => ({
+    verified: attempt(() => tls.verifyAttestation(attestation), false),
+    signer: attempt(() => ethers.utils.recoverAddress(
+        encodeAttestation(attestation), attestation.signatures[0]
+    ), null)
+}));
+process.stdout.write('\\n' + JSON.stringify(results) + '\\n');
+"""
+
+@pytest.mark.skipif(
+    shutil.which("node") is None or find_sdk_package() is None,
+    reason="Node.js and @primuslabs/zktls-core-sdk are required for the cross-check"
+)
+def test_cross_check_with_node_sdk():
+    """Test the SDK's verifyAttestation and signer recovery match the recorded cases."""
+    result = subprocess.run(
+        ["node", "-e", NODE_SCRIPT],
+        input=json.dumps([case[0] for case in VERIFY_CASES]),
+        capture_output=True,
+        text=True,
+        timeout=30,
+        check=True
+    )
+    # The SDK may log while verifying; the results are the last line
+    results = json.loads(result.stdout.strip().splitlines()[-1])
+    for (attestation, signer, _, sdk_verified), sdk in zip(VERIFY_CASES, results):
+        assert sdk["verified"] is sdk_verified
+        assert sdk["verified"] is verify_attestation(attestation)
+        assert sdk["signer"] == signer